@@ -0,0 +1,108 @@
+"""
+Benchmark resizing of long animated GIFs.
+
+Compares frame streaming resize against collecting all resized frames before
+encoding. Every run happens in a fresh process so peak RSS is comparable.
+
+    python -m benchmarks.animated_resize --frames 300 --width 800 --height 600
+"""
+import argparse
+import io
+import resource
+import subprocess  # Noqa: S404
+import sys
+import tempfile
+import time
+
+from PIL import Image as PILImage
+from PIL import ImageSequence
+
+MODES = ('streaming', 'collected')
+
+
+def make_gif(path, frames, size):
+    """
+    Write a noisy animated GIF, so frames do not compress into nothing.
+
+    Args:
+        path(str): Destination path.
+        frames(int): Frames count.
+        size(tuple): Frame width and height.
+    """
+    first = PILImage.effect_noise(size, 64).convert('P')
+    rest = (PILImage.effect_noise(size, 64 + index % 32).convert('P') for index in range(frames - 1))
+    first.save(path, 'GIF', save_all=True, append_images=rest, duration=40, loop=0)
+
+
+def resize_collected(image, size, output):
+    """
+    Resize all frames into memory, then encode them at once.
+
+    Args:
+        image(PIL.Image.Image): Opened animation.
+        size(tuple): Target width and height.
+        output(file): File object to write into.
+    """
+    frames = [frame.convert('RGBA').resize(size) for frame in ImageSequence.Iterator(image)]
+    frames[0].save(output, image.format, save_all=True, append_images=frames[1:], loop=0)
+
+
+def run_single(mode, path, size):
+    """
+    Resize the animation once and print elapsed seconds and peak RSS in KiB.
+
+    Args:
+        mode(str): One of MODES.
+        path(str): Animation path.
+        size(tuple): Target width and height.
+    """
+    from images.animation import save_animated  # Noqa: WPS433
+
+    resize = save_animated if mode == 'streaming' else resize_collected
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    with PILImage.open(path) as image:
+        resize(image, size, io.BytesIO())
+    elapsed = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    sys.stdout.write('{0} {1}\n'.format(elapsed, rss_after - rss_before))
+
+
+def main():
+    """Generate the animation and run every mode in a separate process."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--scale', type=float, default=0.5)
+    parser.add_argument('--single', choices=MODES)
+    parser.add_argument('--path')
+    arguments = parser.parse_args()
+    size = (int(arguments.width * arguments.scale), int(arguments.height * arguments.scale))
+    if arguments.single:
+        run_single(arguments.single, arguments.path, size)
+        return
+    with tempfile.NamedTemporaryFile(suffix='.gif') as animation:
+        make_gif(animation.name, arguments.frames, (arguments.width, arguments.height))
+        for mode in MODES:
+            completed = subprocess.run(  # Noqa: S603
+                [
+                    sys.executable, '-m', 'benchmarks.animated_resize',
+                    '--single', mode,
+                    '--path', animation.name,
+                    '--width', str(arguments.width),
+                    '--height', str(arguments.height),
+                    '--scale', str(arguments.scale),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            elapsed, peak_rss = completed.stdout.split()
+            sys.stdout.write('{0:<10} {1:>8.2f} s {2:>10} KiB peak RSS growth\n'.format(
+                mode, float(elapsed), peak_rss,
+            ))
+
+
+if __name__ == '__main__':
+    main()
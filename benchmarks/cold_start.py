@@ -0,0 +1,103 @@
+"""
+Benchmark worker cold start.
+
+Every sample runs in a fresh interpreter and measures Django boot with URL
+configuration import, the first image open, the first open of a file no
+whitelisted plugin accepts, and the first API view call. Samples are taken with
+all Pillow plugins and with the IMAGES_PIL_FORMATS whitelist.
+
+    python -m benchmarks.cold_start --runs 10 --formats JPEG,PNG,GIF,WEBP
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess  # Noqa: S404
+import sys
+
+SAMPLE = '''
+import io
+import json
+import time
+
+started = time.perf_counter()
+import django
+django.setup()
+import config.urls
+booted = time.perf_counter()
+
+from images.imaging import open_image
+from PIL import Image, UnidentifiedImageError
+jpeg = io.BytesIO()
+Image.new('RGB', (64, 64)).save(jpeg, 'JPEG')
+opened_started = time.perf_counter()
+open_image(jpeg).load()
+opened = time.perf_counter()
+try:
+    open_image(io.BytesIO(b'definitely not an image'))
+except UnidentifiedImageError:
+    pass
+rejected = time.perf_counter()
+
+from django.test import RequestFactory
+from images.views import ImagesViewSet
+metrics_view = ImagesViewSet.as_view({'get': 'process_metrics'})
+metrics_view(RequestFactory().get('/api/images/metrics/')).render()
+requested = time.perf_counter()
+print(json.dumps({
+    'boot': booted - started,
+    'first_open': opened - opened_started,
+    'first_reject': rejected - opened,
+    'first_request': requested - rejected,
+}))
+'''
+MEASURES = ('boot', 'first_open', 'first_reject', 'first_request')
+
+
+def run_sample(formats):
+    """
+    Measure a single cold start.
+
+    Args:
+        formats(str): Value of IMAGES_PIL_FORMATS, empty for all plugins.
+
+    Returns:
+        timings(dict): Seconds per measure.
+    """
+    environment = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='config.settings',
+        DEBUG='False',
+        IMAGES_PIL_FORMATS=formats,
+    )
+    completed = subprocess.run(  # Noqa: S603
+        [sys.executable, '-c', SAMPLE],
+        env=environment,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def main():
+    """Run samples for both modes and print median timings."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--formats', default='JPEG,PNG,GIF,WEBP')
+    arguments = parser.parse_args()
+    sys.stdout.write('{0:<14}{1}\n'.format('mode', ''.join(
+        '{0:>16}'.format(measure) for measure in MEASURES
+    )))
+    for mode, formats in (('all plugins', ''), ('whitelist', arguments.formats)):
+        samples = [run_sample(formats) for _ in range(arguments.runs)]
+        sys.stdout.write('{0:<14}{1}\n'.format(mode, ''.join(
+            '{0:>13.1f} ms'.format(statistics.median(
+                sample[measure] for sample in samples
+            ) * 1000)
+            for measure in MEASURES
+        )))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Load test a locally running service.
+
+Starts a local origin stub serving generated images and drives `create`,
+`resize`, `list` and `retrieve` with configurable concurrency, then reports
+throughput and p50/p95/p99 latency per endpoint.
+
+    python3 manage.py runserver --noreload 127.0.0.1:8000
+    python -m benchmarks.loadtest --base-url http://127.0.0.1:8000 --concurrency 16
+"""
+import argparse
+import itertools
+import math
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from images.tests.origin_stub import OriginStub
+
+ENDPOINTS = ('create', 'resize', 'list', 'retrieve')
+PERCENTILES = (50, 95, 99)
+SUCCESS_STATUSES = frozenset((200, 201))
+
+
+def percentile(sorted_samples, rank):
+    """
+    Pick nearest-rank percentile.
+
+    Args:
+        sorted_samples(list): Sorted samples.
+        rank(int): Percentile rank from 1 to 100.
+
+    Returns:
+        sample(float): Percentile value.
+    """
+    index = max(math.ceil(rank / 100 * len(sorted_samples)) - 1, 0)
+    return sorted_samples[index]
+
+
+class LoadTest(object):
+    """Drive the images API and collect latencies per endpoint."""
+
+    def __init__(self, base_url, origin, image_sizes):
+        self.api_url = '{0}/api/images/'.format(base_url.rstrip('/'))
+        self.origin = origin
+        self.image_sizes = image_sizes
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.image_ids = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """
+        Get the HTTP session of the current thread.
+
+        Returns:
+            session(requests.Session): Thread local session.
+        """
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def call(self, endpoint):
+        """
+        Send a single request to `endpoint` and record its latency.
+
+        Args:
+            endpoint(str): One of ENDPOINTS.
+        """
+        method, url, payload = self.build_request(endpoint)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, json=payload, timeout=60)
+        except requests.RequestException:
+            response = None
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            if response is None or response.status_code not in SUCCESS_STATUSES:
+                self.errors[endpoint] += 1
+            elif endpoint == 'create':
+                self.image_ids.append(response.json()['id'])
+
+    def build_request(self, endpoint):
+        """
+        Build method, url and payload of a request to `endpoint`.
+
+        Args:
+            endpoint(str): One of ENDPOINTS.
+
+        Returns:
+            request(tuple): HTTP method, url and JSON payload.
+        """
+        if endpoint == 'create':
+            width, height = random.choice(self.image_sizes)  # Noqa: S311
+            image_url = self.origin.url('/images/{0}x{1}.jpg'.format(width, height))
+            return 'POST', self.api_url, {'url': image_url}
+        if endpoint == 'list':
+            return 'GET', self.api_url, None
+        image_id = random.choice(self.image_ids)  # Noqa: S311
+        detail_url = '{0}{1}/'.format(self.api_url, image_id)
+        if endpoint == 'retrieve':
+            return 'GET', detail_url, None
+        payload = {
+            'width': random.randint(16, 320),  # Noqa: S311
+            'height': random.randint(16, 320),  # Noqa: S311
+        }
+        return 'POST', '{0}resize/'.format(detail_url), payload
+
+    def run(self, endpoints, requests_count, concurrency):
+        """
+        Send `requests_count` requests evenly spread over `endpoints`.
+
+        Args:
+            endpoints(list): Endpoints to drive.
+            requests_count(int): Total number of requests.
+            concurrency(int): Number of concurrent clients.
+
+        Returns:
+            elapsed(float): Wall time of the run in seconds.
+
+        Raises:
+            RuntimeError: If no image could be created to drive the other endpoints.
+        """
+        for _ in range(concurrency):
+            self.call('create')
+        if not self.image_ids:
+            raise RuntimeError(
+                'No image could be created through {0}, is the API running and '
+                'able to reach the origin?'.format(self.api_url),
+            )
+        self.latencies.clear()
+        self.errors.clear()
+        schedule = list(itertools.islice(itertools.cycle(endpoints), requests_count))
+        random.shuffle(schedule)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(self.call, schedule))
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        """
+        Write per endpoint throughput and latency percentiles.
+
+        Args:
+            elapsed(float): Wall time of the run in seconds.
+        """
+        sys.stdout.write('{0:<10}{1:>8}{2:>8}{3:>10}{4:>10}{5:>10}{6:>10}\n'.format(
+            'endpoint', 'count', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms',
+        ))
+        for endpoint, samples in sorted(self.latencies.items()):
+            sorted_samples = sorted(samples)
+            sys.stdout.write('{0:<10}{1:>8}{2:>8}{3:>10.1f}{4}\n'.format(
+                endpoint,
+                len(samples),
+                self.errors[endpoint],
+                len(samples) / elapsed,
+                ''.join(
+                    '{0:>10.1f}'.format(percentile(sorted_samples, rank) * 1000)
+                    for rank in PERCENTILES
+                ),
+            ))
+
+
+def main():
+    """Parse arguments, run the load test and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--origin-host', default='127.0.0.1')
+    parser.add_argument('--image-sizes', default='640x480,1920x1080')
+    arguments = parser.parse_args()
+    image_sizes = [
+        tuple(int(side) for side in size.split('x'))
+        for size in arguments.image_sizes.split(',')
+    ]
+    origin = OriginStub(host=arguments.origin_host).start()
+    try:
+        load_test = LoadTest(arguments.base_url, origin, image_sizes)
+        elapsed = load_test.run(
+            arguments.endpoints.split(','), arguments.requests, arguments.concurrency,
+        )
+    except RuntimeError as error:
+        parser.exit(1, '{0}\n'.format(error))
+    finally:
+        origin.stop()
+    load_test.report(elapsed)
+
+
+if __name__ == '__main__':
+    main()
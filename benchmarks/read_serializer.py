@@ -0,0 +1,106 @@
+"""
+Benchmark image list serialization.
+
+Renders the same page of images with `ImageSerializer` over model instances
+and with `ImageRowSerializer` over `values()` rows. Runs against a throwaway
+test database and media directory.
+
+    python -m benchmarks.read_serializer --rows 1000 --repeat 5
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import django
+
+
+def populate(rows):
+    """
+    Create `rows` images, each with its own small picture file.
+
+    Args:
+        rows(int): Images count.
+    """
+    from django.core.files.base import ContentFile  # Noqa: WPS433
+    from images.models import Image  # Noqa: WPS433
+    from PIL import Image as PILImage  # Noqa: WPS433
+
+    png = io.BytesIO()
+    PILImage.new('RGB', (64, 48)).save(png, 'PNG')
+    for index in range(rows):
+        image = Image(url='https://example.com/{0}.png'.format(index))
+        image.picture.save('bench_{0}.png'.format(index), ContentFile(png.getvalue()), save=False)
+        image.save()
+
+
+def measure(render, repeat):
+    """
+    Time `render` and keep the best run.
+
+    Args:
+        render(callable): Callable producing the response body.
+        repeat(int): Runs count.
+
+    Returns:
+        timing(tuple): Best seconds and body size.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = render()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+def main():
+    """Populate a test database and compare both serializers."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    arguments = parser.parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    os.environ.setdefault('DEBUG', 'False')
+    django.setup()
+
+    from django.conf import settings  # Noqa: WPS433
+    from django.db import connection  # Noqa: WPS433
+    from django.test import RequestFactory  # Noqa: WPS433
+    from images.models import Image  # Noqa: WPS433
+    from images.serializers import (  # Noqa: WPS433
+        IMAGE_ROW_FIELDS,
+        ImageRowSerializer,
+        ImageSerializer,
+    )
+    from rest_framework.renderers import JSONRenderer  # Noqa: WPS433
+
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    database_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        populate(arguments.rows)
+        context = {'request': RequestFactory().get('/api/images/')}
+        renderer = JSONRenderer()
+        modes = (
+            ('ImageSerializer', lambda: renderer.render(
+                ImageSerializer(Image.objects.all(), many=True, context=context).data,
+            )),
+            ('ImageRowSerializer', lambda: renderer.render(ImageRowSerializer(
+                Image.objects.values(*IMAGE_ROW_FIELDS), many=True, context=context,
+            ).data)),
+        )
+        for mode, render in modes:
+            elapsed, size = measure(render, arguments.repeat)
+            sys.stdout.write('{0:<20} {1:>10.1f} ms {2:>10} bytes\n'.format(
+                mode, elapsed * 1000, size,
+            ))
+    finally:
+        connection.creation.destroy_test_db(database_name, verbosity=0)
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
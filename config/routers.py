@@ -1,5 +1,6 @@
-from images.views import ImagesViewSet
+from images.views import ImagesViewSet, UploadsViewSet
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
 router.register('images', ImagesViewSet, basename='images')
+router.register('uploads', UploadsViewSet, basename='uploads')
@@ -41,6 +41,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.contrib.sites.middleware.CurrentSiteMiddleware',
+    'images.profiling.ProfilingMiddleware',
 ]
 
 if DEBUG:
@@ -88,6 +89,14 @@ DATABASES = {
         'NAME': 'database',
     }
 }
+DATABASE_REPLICAS = [alias for alias in os.getenv('DATABASE_REPLICAS', '').split(',') if alias]
+for replica_alias in DATABASE_REPLICAS:
+    DATABASES[replica_alias] = dict(DATABASES['default'], NAME=os.getenv(
+        'DATABASE_{0}_NAME'.format(replica_alias.upper()), 'database_{0}'.format(replica_alias),
+    ))
+if TESTING:
+    DATABASES.setdefault('replica', dict(DATABASES['default'], NAME='database_replica'))
+DATABASE_ROUTERS = ['images.routing.ReplicaRouter']
 
 
 # Password validation
@@ -123,6 +132,67 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o755
 FILE_UPLOAD_PERMISSIONS = 0o644
 
+# Images
+IMAGES_SOURCE_CACHE_ENABLED = os.getenv('IMAGES_SOURCE_CACHE_ENABLED', 'False') == 'True'
+IMAGES_SOURCE_CACHE_MAX_BYTES = int(os.getenv('IMAGES_SOURCE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+IMAGES_SOURCE_CACHE_PREREDUCE = os.getenv('IMAGES_SOURCE_CACHE_PREREDUCE', 'False') == 'True'
+IMAGES_ANIMATION_MAX_FRAMES = int(os.getenv('IMAGES_ANIMATION_MAX_FRAMES', 1000))
+IMAGES_ANIMATION_MAX_PIXELS = int(os.getenv('IMAGES_ANIMATION_MAX_PIXELS', 500 * 1000 * 1000))
+IMAGES_PROFILING_ENABLED = os.getenv('IMAGES_PROFILING_ENABLED', 'False') == 'True'
+IMAGES_PROFILING_DIR = os.getenv('IMAGES_PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+IMAGES_PROFILING_KEEP = int(os.getenv('IMAGES_PROFILING_KEEP', 50))
+IMAGES_PROFILING_TOKEN_MAX_AGE = int(os.getenv('IMAGES_PROFILING_TOKEN_MAX_AGE', 60 * 60))
+IMAGES_MEMORY_ACCOUNTING_ENABLED = os.getenv('IMAGES_MEMORY_ACCOUNTING_ENABLED', 'False') == 'True'
+IMAGES_MEMORY_SAMPLE_INTERVAL = float(os.getenv('IMAGES_MEMORY_SAMPLE_INTERVAL', 0.005))
+IMAGES_MEMORY_WARNING_BYTES = int(os.getenv('IMAGES_MEMORY_WARNING_BYTES', 512 * 1024 * 1024))
+IMAGES_ADMISSION_MAX_MEGAPIXELS = int(os.getenv('IMAGES_ADMISSION_MAX_MEGAPIXELS', 256))
+IMAGES_ADMISSION_QUEUE_SIZE = int(os.getenv('IMAGES_ADMISSION_QUEUE_SIZE', 16))
+IMAGES_ADMISSION_QUEUE_TIMEOUT = float(os.getenv('IMAGES_ADMISSION_QUEUE_TIMEOUT', 2))
+IMAGES_ADMISSION_RETRY_AFTER = int(os.getenv('IMAGES_ADMISSION_RETRY_AFTER', 5))
+IMAGES_PIL_FORMATS = tuple(filter(None, os.getenv('IMAGES_PIL_FORMATS', '').split(',')))
+IMAGES_INGEST_PIPELINED = os.getenv('IMAGES_INGEST_PIPELINED', 'False') == 'True'
+IMAGES_ORIGIN_CACHE_ENABLED = os.getenv('IMAGES_ORIGIN_CACHE_ENABLED', 'False') == 'True'
+IMAGES_ORIGIN_CACHE_TTL = int(os.getenv('IMAGES_ORIGIN_CACHE_TTL', 24 * 60 * 60))
+IMAGES_TILES_DIR = os.getenv('IMAGES_TILES_DIR', os.path.join(BASE_DIR, 'tiles'))
+IMAGES_TILES_SIZE = int(os.getenv('IMAGES_TILES_SIZE', 254))
+IMAGES_TILES_OVERLAP = int(os.getenv('IMAGES_TILES_OVERLAP', 1))
+IMAGES_TILES_JPEG_QUALITY = int(os.getenv('IMAGES_TILES_JPEG_QUALITY', 85))
+IMAGES_TILES_WORKERS = int(os.getenv('IMAGES_TILES_WORKERS', 1))
+IMAGES_TILES_CACHE_MAX_AGE = int(os.getenv('IMAGES_TILES_CACHE_MAX_AGE', 365 * 24 * 60 * 60))
+IMAGES_VARIANT_DISK_BUDGET = int(os.getenv('IMAGES_VARIANT_DISK_BUDGET', 0))
+IMAGES_VARIANT_TOUCH_INTERVAL = int(os.getenv('IMAGES_VARIANT_TOUCH_INTERVAL', 60))
+IMAGES_RENDER_LOCK_TTL = int(os.getenv('IMAGES_RENDER_LOCK_TTL', 60))
+IMAGES_RENDER_LOCK_WAIT = float(os.getenv('IMAGES_RENDER_LOCK_WAIT', 10))
+IMAGES_RENDER_LOCK_POLL_INTERVAL = float(os.getenv('IMAGES_RENDER_LOCK_POLL_INTERVAL', 0.05))
+IMAGES_BUDGET_MIN_QUALITY = int(os.getenv('IMAGES_BUDGET_MIN_QUALITY', 20))
+IMAGES_BUDGET_MAX_QUALITY = int(os.getenv('IMAGES_BUDGET_MAX_QUALITY', 95))
+IMAGES_OPTIMIZE_BYTES_PER_SECOND = int(
+    os.getenv('IMAGES_OPTIMIZE_BYTES_PER_SECOND', 8 * 1024 * 1024),
+)
+IMAGES_EXPORT_CHUNK_SIZE = int(os.getenv('IMAGES_EXPORT_CHUNK_SIZE', 2000))
+IMAGES_DOWNLOAD_CHUNK_SIZE = int(os.getenv('IMAGES_DOWNLOAD_CHUNK_SIZE', 256 * 1024))
+IMAGES_DOWNLOAD_MAX_IMAGES = int(os.getenv('IMAGES_DOWNLOAD_MAX_IMAGES', 1000))
+IMAGES_SPRITE_MAX_IMAGES = int(os.getenv('IMAGES_SPRITE_MAX_IMAGES', 256))
+IMAGES_SPRITE_CELL_SIZE = int(os.getenv('IMAGES_SPRITE_CELL_SIZE', 128))
+IMAGES_SPRITE_MAX_CELL_SIZE = int(os.getenv('IMAGES_SPRITE_MAX_CELL_SIZE', 256))
+IMAGES_SPRITE_JPEG_QUALITY = int(os.getenv('IMAGES_SPRITE_JPEG_QUALITY', 85))
+IMAGES_SPRITE_CACHE_TTL = int(os.getenv('IMAGES_SPRITE_CACHE_TTL', 24 * 60 * 60))
+IMAGES_SPRITE_CACHE_MAX_AGE = int(os.getenv('IMAGES_SPRITE_CACHE_MAX_AGE', 365 * 24 * 60 * 60))
+IMAGES_REPLICA_PIN_SECONDS = int(os.getenv('IMAGES_REPLICA_PIN_SECONDS', 5))
+IMAGES_UPLOAD_SESSION_DIR = os.getenv(
+    'IMAGES_UPLOAD_SESSION_DIR', os.path.join(BASE_DIR, 'uploads'),
+)
+IMAGES_UPLOAD_SPOOL_DIR = os.getenv('IMAGES_UPLOAD_SPOOL_DIR', os.path.join(BASE_DIR, 'spool'))
+IMAGES_UPLOAD_SESSION_TTL = int(os.getenv('IMAGES_UPLOAD_SESSION_TTL', 24 * 60 * 60))
+IMAGES_UPLOAD_MAX_SIZE = int(os.getenv('IMAGES_UPLOAD_MAX_SIZE', 200 * 1024 * 1024))
+IMAGES_UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('IMAGES_UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024))
+IMAGES_UPLOAD_FORMAT_MAX_SIZES = {
+    'GIF': int(os.getenv('IMAGES_UPLOAD_GIF_MAX_SIZE', 20 * 1024 * 1024)),
+    'JPEG': int(os.getenv('IMAGES_UPLOAD_JPEG_MAX_SIZE', 50 * 1024 * 1024)),
+    'PNG': int(os.getenv('IMAGES_UPLOAD_PNG_MAX_SIZE', 100 * 1024 * 1024)),
+    'WEBP': int(os.getenv('IMAGES_UPLOAD_WEBP_MAX_SIZE', 50 * 1024 * 1024)),
+}
+
 # Debug Toolbar
 def show_toolbar_callback(_):
     return DEBUG
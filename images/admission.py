@@ -0,0 +1,126 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from images import metrics
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+MEGAPIXEL = 1000 * 1000
+
+
+class ServiceOverloaded(APIException):
+    """Request rejected by admission control, DRF adds `Retry-After` from `wait`."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Service is overloaded, try again later.'
+    default_code = 'service_overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+
+
+class PixelBudget(object):
+    """
+    Cap the total decoded pixels of requests in flight within the process.
+
+    Requests over the budget wait in a short queue and are rejected once the
+    queue is full or the wait times out. A request bigger than the whole
+    budget is admitted when nothing else is in flight.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def admit(self, pixels):
+        """
+        Hold `pixels` of the budget for the duration of the block.
+
+        Args:
+            pixels(int): Decoded pixels of the request.
+
+        Yields:
+            None when admitted.
+        """
+        if not settings.IMAGES_ADMISSION_MAX_MEGAPIXELS:
+            yield
+            return
+        self.acquire(pixels)
+        try:
+            yield
+        finally:
+            self.release(pixels)
+
+    def acquire(self, pixels):
+        """
+        Take `pixels` of the budget, waiting in the queue if needed.
+
+        Args:
+            pixels(int): Decoded pixels of the request.
+
+        Raises:
+            ServiceOverloaded: If the queue is full or the wait timed out.
+        """
+        with self._condition:
+            if not self.fits(pixels):
+                if self.waiting >= settings.IMAGES_ADMISSION_QUEUE_SIZE:
+                    self.reject('queue_full')
+                self.waiting += 1
+                metrics.increment('admission.queued')
+                started = time.monotonic()
+                try:
+                    admitted = self._condition.wait_for(
+                        lambda: self.fits(pixels), timeout=settings.IMAGES_ADMISSION_QUEUE_TIMEOUT,
+                    )
+                finally:
+                    self.waiting -= 1
+                metrics.observe('admission.wait_seconds', time.monotonic() - started)
+                if not admitted:
+                    self.reject('timeout')
+            self.in_flight += pixels
+
+    def release(self, pixels):
+        """
+        Return `pixels` to the budget and wake up waiting requests.
+
+        Args:
+            pixels(int): Decoded pixels of the request.
+        """
+        with self._condition:
+            self.in_flight -= pixels
+            self._condition.notify_all()
+
+    def fits(self, pixels):
+        """
+        Check that `pixels` fit into the remaining budget.
+
+        Args:
+            pixels(int): Decoded pixels of the request.
+
+        Returns:
+            fits(bool): Whether the request may start now.
+        """
+        max_pixels = settings.IMAGES_ADMISSION_MAX_MEGAPIXELS * MEGAPIXEL
+        return not self.in_flight or self.in_flight + pixels <= max_pixels
+
+    def reject(self, reason):
+        """
+        Count the rejection and raise.
+
+        Args:
+            reason(str): Rejection reason.
+
+        Raises:
+            ServiceOverloaded: Always.
+        """
+        metrics.increment('admission.rejected')
+        metrics.increment('admission.rejected.{0}'.format(reason))
+        raise ServiceOverloaded(wait=settings.IMAGES_ADMISSION_RETRY_AFTER)
+
+
+pixel_budget = PixelBudget()
@@ -0,0 +1,141 @@
+from PIL import GifImagePlugin
+from PIL import Image as PILImage
+from PIL import ImageSequence
+
+STREAMED_FORMATS = frozenset(('GIF', 'WEBP'))
+OPAQUE_THRESHOLD = 128
+PALETTE_SIZE = 256
+TRANSPARENT_INDEX = PALETTE_SIZE - 1
+DISPOSAL_NONE = 1
+DISPOSAL_BACKGROUND = 2
+
+
+def is_animated(image):
+    """
+    Check that `image` is an animation which can be resized frame by frame.
+
+    Args:
+        image(PIL.Image.Image): Opened image.
+
+    Returns:
+        is_animated(bool): Whether `image` has several frames.
+    """
+    return image.format in STREAMED_FORMATS and getattr(image, 'is_animated', False)
+
+
+def save_animated(image, size, output):
+    """
+    Resize all frames of `image` and encode them into `output` one at a time.
+
+    GIF frames are written as soon as they are resized, WebP frames are kept
+    at the target size until the encoder gets them all. Frame durations and
+    loop settings are preserved.
+
+    Args:
+        image(PIL.Image.Image): Opened animated image.
+        size(tuple): Target width and height.
+        output(file): File object to write into.
+    """
+    if image.format == 'GIF':
+        write_gif(image, size, output)
+    else:
+        write_webp(image, size, output)
+
+
+def resize_frame(frame, size):
+    """
+    Resize a single frame in RGBA to avoid palette nearest-neighbour resampling.
+
+    Args:
+        frame(PIL.Image.Image): Source frame.
+        size(tuple): Target width and height.
+
+    Returns:
+        frame(PIL.Image.Image): Resized frame.
+    """
+    return frame.convert('RGBA').resize(size)
+
+
+def write_gif(image, size, output):
+    """
+    Write resized frames of a GIF image as they are produced.
+
+    Every frame is written in full with its own color table.
+
+    Args:
+        image(PIL.Image.Image): Opened animated GIF image.
+        size(tuple): Target width and height.
+        output(file): File object to write into.
+    """
+    header_written = False
+    for frame in ImageSequence.Iterator(image):
+        paletted, transparency = to_paletted(resize_frame(frame, size))
+        frame_params = {
+            'duration': frame.info.get('duration', 0),
+            'disposal': DISPOSAL_NONE if transparency is None else DISPOSAL_BACKGROUND,
+            'include_color_table': True,
+        }
+        if transparency is not None:
+            frame_params['transparency'] = transparency
+        if not header_written:
+            header_info = {'duration': frame_params['duration']}
+            if image.info.get('loop') is not None:
+                header_info['loop'] = image.info['loop']
+            header, _ = GifImagePlugin.getheader(paletted, info=header_info)
+            output.write(b''.join(header))
+            header_written = True
+        for chunk in GifImagePlugin.getdata(paletted, **frame_params):
+            output.write(chunk)
+    output.write(b';')
+
+
+def to_paletted(frame):
+    """
+    Convert RGBA frame to a 256 colors palette, reserving the last index for transparency.
+
+    Args:
+        frame(PIL.Image.Image): RGBA frame.
+
+    Returns:
+        paletted(tuple): Paletted frame and its transparent index or None.
+    """
+    alpha = frame.getchannel('A')
+    is_opaque = alpha.getextrema()[0] >= OPAQUE_THRESHOLD
+    colors = PALETTE_SIZE if is_opaque else PALETTE_SIZE - 1
+    paletted = frame.convert('RGB').quantize(colors=colors, method=PILImage.FASTOCTREE)
+    palette = paletted.getpalette()
+    paletted.putpalette(palette + [0] * (PALETTE_SIZE * 3 - len(palette)))
+    if is_opaque:
+        return paletted, None
+    paletted.paste(
+        TRANSPARENT_INDEX,
+        mask=alpha.point(lambda opacity: 255 if opacity < OPAQUE_THRESHOLD else 0),
+    )
+    return paletted, TRANSPARENT_INDEX
+
+
+def write_webp(image, size, output):
+    """
+    Write resized frames of a WebP image through Pillow's animation encoder.
+
+    The encoder needs all frames at once, so frames are resized as they are
+    decoded and only the resized copies are kept until the image is written.
+
+    Args:
+        image(PIL.Image.Image): Opened animated WebP image.
+        size(tuple): Target width and height.
+        output(file): File object to write into.
+    """
+    frames = []
+    durations = []
+    for frame in ImageSequence.Iterator(image):
+        frames.append(resize_frame(frame, size))
+        durations.append(frame.info.get('duration', 0))
+    frames[0].save(
+        output,
+        'WEBP',
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=image.info.get('loop', 0),
+    )
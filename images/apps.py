@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from images.imaging import preload_formats
 
 
 class ImagesConfig(AppConfig):  # Noqa: D101
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'images'
+
+    def ready(self):
+        """Preselect Pillow plugins before the first request."""
+        preload_formats()
@@ -0,0 +1,131 @@
+import functools
+import logging
+import zipfile
+
+from django.conf import settings
+from django.utils import timezone
+from images import metrics
+
+logger = logging.getLogger(__name__)
+
+ZIP_CONTENT_TYPE = 'application/zip'
+STORED_CONTENT_TYPES = frozenset(('image/jpeg', 'image/webp', 'image/png', 'image/gif'))
+
+
+class StreamBuffer(object):
+    """
+    Unseekable file object collecting what `zipfile` writes until it is taken.
+
+    Without `seek` the archive is written with data descriptors, so no entry
+    has to be rewritten once its size is known.
+    """
+
+    def __init__(self):
+        """Start with an empty buffer."""
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        """
+        Collect written data.
+
+        Args:
+            data(bytes): Written data.
+
+        Returns:
+            written(int): Count of bytes written.
+        """
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        """
+        Report the count of bytes written so far.
+
+        Returns:
+            offset(int): Stream position.
+        """
+        return self.offset
+
+    def flush(self):
+        """Nothing to flush, data is taken by `take`."""
+
+    def take(self):
+        """
+        Take the data collected since the last call.
+
+        Returns:
+            data(bytes): Collected data.
+        """
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def archive_entry(image_object):
+    """
+    Describe the archive entry of an image.
+
+    JPEG, WebP, PNG and GIF are compressed already and are stored as is.
+
+    Args:
+        image_object(models.Image): Archived image.
+
+    Returns:
+        entry(zipfile.ZipInfo): Entry header.
+    """
+    modified = timezone.localtime(timezone.now()).timetuple()[:6]
+    entry = zipfile.ZipInfo(image_object.picture.name, date_time=modified)
+    entry.file_size = image_object.picture_size or 0
+    if image_object.content_type in STORED_CONTENT_TYPES:
+        entry.compress_type = zipfile.ZIP_STORED
+    else:
+        entry.compress_type = zipfile.ZIP_DEFLATED
+    return entry
+
+
+def write_archive(images):
+    """
+    Build a ZIP archive of image files piece by piece.
+
+    Files are read in `IMAGES_DOWNLOAD_CHUNK_SIZE` pieces and every piece
+    is passed on as soon as it is compressed, so neither the archive nor a
+    whole file is ever held in memory or on disk. Missing files are skipped.
+
+    Args:
+        images(iterable): Image objects to archive.
+
+    Yields:
+        data(bytes): Next part of the archive, possibly empty.
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for image_object in images:
+            try:
+                source = image_object.picture.open('rb')
+            except FileNotFoundError:
+                logger.warning('Image %s has no file, not archived', image_object.pk)
+                metrics.increment('download.missing')
+                continue
+            with source, archive.open(archive_entry(image_object), 'w') as target:
+                read = functools.partial(source.read, settings.IMAGES_DOWNLOAD_CHUNK_SIZE)
+                for chunk in iter(read, b''):
+                    target.write(chunk)
+                    yield buffer.take()
+            metrics.increment('download.files')
+            yield buffer.take()
+    yield buffer.take()
+
+
+def zip_chunks(images):
+    """
+    Stream a ZIP archive of image files.
+
+    Args:
+        images(iterable): Image objects to archive.
+
+    Returns:
+        chunks(iterator): Non empty parts of the archive.
+    """
+    return filter(None, write_archive(images))
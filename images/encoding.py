@@ -0,0 +1,89 @@
+import io
+
+from django.conf import settings
+from images import metrics
+
+BUDGET_FORMATS = frozenset(('JPEG', 'WEBP'))
+
+
+class BudgetMissed(ValueError):
+    """No encoder quality fits the size ceiling."""
+
+    def __init__(self, max_bytes, smallest_size):
+        super().__init__('Smallest encoding takes {0} bytes, over the {1} bytes ceiling.'.format(
+            smallest_size, max_bytes,
+        ))
+        self.smallest_size = smallest_size
+
+
+def encode(image, image_format, quality):
+    """
+    Encode `image` in memory.
+
+    Args:
+        image(PIL.Image.Image): Decoded image.
+        image_format(str): Output format.
+        quality(int): Encoder quality.
+
+    Returns:
+        content(bytes): Encoded image.
+    """
+    output = io.BytesIO()
+    image.save(output, image_format, quality=quality)
+    return output.getvalue()
+
+
+def encode_within_budget(image, image_format, max_bytes):
+    """
+    Encode `image` with the highest quality which fits into `max_bytes`.
+
+    The maximum quality is tried first, as small variants usually fit right
+    away, then the quality is binary searched. The same decoded pixels are
+    encoded on every attempt.
+
+    Args:
+        image(PIL.Image.Image): Decoded image.
+        image_format(str): Output format, one of `BUDGET_FORMATS`.
+        max_bytes(int): Size ceiling.
+
+    Returns:
+        content(bytes): Encoded image.
+
+    Raises:
+        BudgetMissed: If even the minimum quality doesn't fit.
+    """
+    quality = settings.IMAGES_BUDGET_MAX_QUALITY
+    best = encode(image, image_format, quality)
+    attempts = 1
+    if len(best) > max_bytes:
+        smallest_size = len(best)
+        best = None
+        low = settings.IMAGES_BUDGET_MIN_QUALITY
+        high = quality - 1
+        while low <= high:
+            middle = (low + high) // 2
+            content = encode(image, image_format, middle)
+            attempts += 1
+            if len(content) <= max_bytes:
+                best, quality = content, middle
+                low = middle + 1
+            else:
+                smallest_size = min(smallest_size, len(content))
+                high = middle - 1
+    metrics.observe('encode.budget_attempts', attempts)
+    if best is None:
+        metrics.increment('encode.budget_missed')
+        raise BudgetMissed(max_bytes, smallest_size)
+    metrics.observe('encode.budget_quality', quality)
+    return best
+
+
+def write_content(content, output):
+    """
+    Write already encoded `content` into `output`.
+
+    Args:
+        content(bytes): Encoded image.
+        output(file): Destination file object.
+    """
+    output.write(content)
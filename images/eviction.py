@@ -0,0 +1,55 @@
+from django.db.models import F, Sum
+from images import metrics
+from images.models import Image
+
+EVICTION_BATCH_SIZE = 100
+
+
+def variants_disk_usage():
+    """
+    Sum up file sizes of derived variants.
+
+    Returns:
+        size(int): Size in bytes.
+    """
+    usage = Image.objects.filter(parent_picture__isnull=False).aggregate(size=Sum('picture_size'))
+    return usage['size'] or 0
+
+
+def evict_variants(budget):
+    """
+    Delete least recently used variants until they fit into `budget`.
+
+    Only leaf variants are evicted, so no variant loses its parent and
+    originals are never touched. A parent becomes a candidate once all of
+    its children are gone. Variants created before access tracking existed
+    have no access time and go first.
+
+    Args:
+        budget(int): Disk budget of variants in bytes.
+
+    Returns:
+        evicted(tuple): Count and total size of evicted variants.
+    """
+    usage = variants_disk_usage()
+    evicted_count = 0
+    evicted_size = 0
+    while usage > budget:
+        candidates = list(
+            Image.objects.filter(
+                parent_picture__isnull=False, image__isnull=True,
+            ).order_by(F('last_accessed').asc(nulls_first=True), 'pk')[:EVICTION_BATCH_SIZE],
+        )
+        if not candidates:
+            break
+        for variant in candidates:
+            if usage <= budget:
+                break
+            size = variant.picture_size or 0
+            variant.delete()
+            usage -= size
+            evicted_count += 1
+            evicted_size += size
+    metrics.increment('variants.evicted', evicted_count)
+    metrics.increment('variants.evicted_bytes', evicted_size)
+    return evicted_count, evicted_size
@@ -0,0 +1,39 @@
+from django.conf import settings
+from images.models import Image
+from images.serializers import IMAGE_ROW_FIELDS
+from rest_framework.renderers import JSONRenderer
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def export_rows(after=0):
+    """
+    Iterate over stored columns of all images in id order.
+
+    Rows are fetched in chunks of `IMAGES_EXPORT_CHUNK_SIZE`, so memory use
+    does not grow with the table.
+
+    Args:
+        after(int): Export images with a greater id only, to resume an export.
+
+    Returns:
+        rows(iterator): Values of `IMAGE_ROW_FIELDS`.
+    """
+    rows = Image.objects.filter(pk__gt=after).order_by('pk').values(*IMAGE_ROW_FIELDS)
+    return rows.iterator(chunk_size=settings.IMAGES_EXPORT_CHUNK_SIZE)
+
+
+def ndjson_lines(rows, serializer):
+    """
+    Render rows one JSON document per line.
+
+    Args:
+        rows(iterable): Image rows.
+        serializer(serializers.ImageRowSerializer): Row serializer.
+
+    Yields:
+        line(bytes): Rendered image followed by a newline.
+    """
+    renderer = JSONRenderer()
+    for row in rows:
+        yield renderer.render(serializer.to_representation(row)) + b'\n'
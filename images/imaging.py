@@ -0,0 +1,137 @@
+import importlib
+import struct
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from PIL import Image as PILImage
+
+PLUGINS = {
+    'BMP': 'BmpImagePlugin',
+    'GIF': 'GifImagePlugin',
+    'ICO': 'IcoImagePlugin',
+    'JPEG': 'JpegImagePlugin',
+    'MPO': 'MpoImagePlugin',
+    'PNG': 'PngImagePlugin',
+    'PPM': 'PpmImagePlugin',
+    'TIFF': 'TiffImagePlugin',
+    'WEBP': 'WebPImagePlugin',
+}
+WRITTEN_FORMATS = ('JPEG', 'PNG')
+REDUCING_GAP = 3
+SNIFF_BYTES = 16
+ALPHA_MODES = frozenset(('RGBA', 'LA', 'PA'))
+
+
+def preload_formats():
+    """
+    Import the whitelisted Pillow plugins before the first request.
+
+    Pillow imports all of its plugins on the first file it can't identify.
+    `open_image` only tries the whitelisted formats, so with their plugins
+    already registered it never needs the others.
+    """
+    image_formats = whitelisted_formats()
+    if image_formats is None:
+        return
+    for image_format in image_formats:
+        importlib.import_module('PIL.{0}'.format(PLUGINS[image_format]))
+
+
+def whitelisted_formats():
+    """
+    Read `IMAGES_PIL_FORMATS` as upper case Pillow format names.
+
+    Returns:
+        image_formats(tuple): Whitelisted formats or None if every format is allowed.
+
+    Raises:
+        ImproperlyConfigured: If a name is not one of `PLUGINS` or a format
+            tiles and sprites are written in is missing.
+    """
+    image_formats = tuple(
+        image_format.strip().upper()
+        for image_format in settings.IMAGES_PIL_FORMATS
+        if image_format.strip()
+    )
+    if not image_formats:
+        return None
+    unknown_formats = sorted(set(image_formats) - PLUGINS.keys())
+    if unknown_formats:
+        raise ImproperlyConfigured('Unknown IMAGES_PIL_FORMATS {0}, valid names are {1}.'.format(
+            ', '.join(unknown_formats), ', '.join(sorted(PLUGINS)),
+        ))
+    missing_formats = sorted(set(WRITTEN_FORMATS) - set(image_formats))
+    if missing_formats:
+        raise ImproperlyConfigured(
+            'IMAGES_PIL_FORMATS must include {0}, tiles and sprites are written in them.'.format(
+                ', '.join(missing_formats),
+            ),
+        )
+    return image_formats
+
+
+def open_image(image_file):
+    """
+    Open `image_file`, trying only the whitelisted formats when a whitelist is set.
+
+    Args:
+        image_file(file): File object or path.
+
+    Returns:
+        image(PIL.Image.Image): Opened image.
+    """
+    return PILImage.open(image_file, formats=whitelisted_formats())
+
+
+def has_alpha(image):
+    """
+    Check whether `image` has transparent pixels to keep.
+
+    Args:
+        image(PIL.Image.Image): Opened image.
+
+    Returns:
+        has_alpha(bool): True for alpha modes and images with a transparency key.
+    """
+    return image.mode in ALPHA_MODES or 'transparency' in image.info
+
+
+def sniff_format(prefix):
+    """
+    Identify the image format from the first bytes of a file.
+
+    Only whitelisted formats whose Pillow plugin is registered and declares
+    a magic number check are recognised.
+
+    Args:
+        prefix(bytes): Leading bytes of the file, at least `SNIFF_BYTES` long when available.
+
+    Returns:
+        image_format(str): Pillow format name or None if nothing matches.
+    """
+    image_formats = whitelisted_formats()
+    if image_formats is None:
+        PILImage.init()
+    for image_format, (_, accept) in PILImage.OPEN.items():
+        if image_formats is not None and image_format not in image_formats:
+            continue
+        if accept is not None and accepts(accept, prefix):
+            return image_format
+    return None
+
+
+def accepts(accept, prefix):
+    """
+    Run a plugin magic number check, treating too short prefixes as a mismatch.
+
+    Args:
+        accept(callable): Plugin check.
+        prefix(bytes): Leading bytes of the file.
+
+    Returns:
+        accepted(bool): Whether the plugin recognises the prefix.
+    """
+    try:
+        return bool(accept(prefix))
+    except (IndexError, struct.error):
+        return False
@@ -0,0 +1,102 @@
+from django.conf import settings
+from images import metrics
+from images.admission import pixel_budget
+from images.imaging import SNIFF_BYTES, sniff_format
+from images.memory import account_decoded
+from images.source_cache import pixel_bytes
+from PIL import Image as PILImage
+from PIL import ImageFile
+from rest_framework.exceptions import ValidationError
+
+INVALID_IMAGE = 'Upload a valid image. The uploaded file is not an image or is corrupted.'
+
+
+class IncrementalDecoder(object):
+    """
+    Decode an image from chunks while they are being downloaded.
+
+    The format is sniffed from the first bytes and the pixel budget is
+    acquired as soon as Pillow has parsed the header, so non-images and
+    oversized images are refused before the rest of the body arrives. The
+    budget is held until the block exits.
+    """
+
+    def __init__(self):
+        self.parser = ImageFile.Parser()
+        self.prefix = b''
+        self.image_format = None
+        self.size = None
+        self.received = 0
+        self.admitted_pixels = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.admitted_pixels:
+            pixel_budget.release(self.admitted_pixels)
+            self.admitted_pixels = 0
+
+    def feed(self, chunk):
+        """
+        Parse and decode the next chunk.
+
+        Args:
+            chunk(bytes): Downloaded chunk.
+
+        Raises:
+            ValidationError: If the data is not an image.
+        """
+        self.received += len(chunk)
+        if self.image_format is None:
+            self.prefix += chunk[:SNIFF_BYTES - len(self.prefix)]
+            if len(self.prefix) == SNIFF_BYTES:
+                self.identify()
+        try:
+            self.parser.feed(chunk)
+        except (OSError, PILImage.DecompressionBombError):
+            raise ValidationError({'error': [INVALID_IMAGE]})
+        if self.size is None and self.parser.image is not None:
+            self.size = self.parser.image.size
+            metrics.observe('ingest.header_bytes', self.received)
+            self.admit()
+
+    def close(self):
+        """
+        Finish decoding.
+
+        Returns:
+            image(PIL.Image.Image): Decoded image.
+
+        Raises:
+            ValidationError: If the data is not a complete image.
+        """
+        if self.image_format is None:
+            self.identify()
+        try:
+            image = self.parser.close()
+        except (OSError, PILImage.DecompressionBombError):
+            raise ValidationError({'error': [INVALID_IMAGE]})
+        if self.size is None:
+            self.size = image.size
+            self.admit()
+        account_decoded(pixel_bytes(image))
+        return image
+
+    def identify(self):
+        """
+        Sniff the image format.
+
+        Raises:
+            ValidationError: If the prefix doesn't belong to any known image format.
+        """
+        self.image_format = sniff_format(self.prefix)
+        if self.image_format is None:
+            raise ValidationError({'error': [INVALID_IMAGE]})
+
+    def admit(self):
+        """Acquire the pixel budget for the decoded image."""
+        if settings.IMAGES_ADMISSION_MAX_MEGAPIXELS:
+            pixels = self.size[0] * self.size[1]
+            pixel_budget.acquire(pixels)
+            self.admitted_pixels = pixels
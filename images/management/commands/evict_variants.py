@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from images.eviction import evict_variants, variants_disk_usage
+
+
+class Command(BaseCommand):
+    """Enforce the disk budget of derived variants."""
+
+    help = 'Evict least recently used variants over the disk budget.'  # Noqa: WPS125
+
+    def add_arguments(self, parser):
+        """
+        Add command arguments.
+
+        Args:
+            parser(ArgumentParser): Command parser.
+        """
+        parser.add_argument(
+            '--budget',
+            type=int,
+            default=settings.IMAGES_VARIANT_DISK_BUDGET,
+            help='Disk budget in bytes, IMAGES_VARIANT_DISK_BUDGET by default.',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Run the command.
+
+        Args:
+            args: Positional arguments.
+            options: Command options.
+
+        Raises:
+            CommandError: If no budget is configured.
+        """
+        if options['budget'] <= 0:
+            raise CommandError('Set IMAGES_VARIANT_DISK_BUDGET or pass --budget.')
+        evicted_count, evicted_size = evict_variants(options['budget'])
+        self.stdout.write('Evicted {0} variants, {1} bytes. Variants use {2} bytes.'.format(
+            evicted_count, evicted_size, variants_disk_usage(),
+        ))
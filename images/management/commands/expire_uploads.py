@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from images.upload_handlers import expire_spool
+from images.uploads import expire_sessions
+
+
+class Command(BaseCommand):
+    """Clean up abandoned upload sessions."""
+
+    help = (  # Noqa: WPS125
+        'Delete upload sessions and spooled files idle for longer than IMAGES_UPLOAD_SESSION_TTL.'
+    )
+
+    def handle(self, *args, **options):
+        """
+        Run the command.
+
+        Args:
+            args: Positional arguments.
+            options: Command options.
+        """
+        self.stdout.write('Expired {0} upload sessions.'.format(expire_sessions()))
+        self.stdout.write('Removed {0} stale spooled files.'.format(expire_spool()))
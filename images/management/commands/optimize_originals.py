@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from images.optimization import optimize_originals
+
+
+class Command(BaseCommand):
+    """Losslessly shrink stored originals."""
+
+    help = 'Strip metadata and recompress originals which were not optimized yet.'  # Noqa: WPS125
+
+    def add_arguments(self, parser):
+        """
+        Add command arguments.
+
+        Args:
+            parser(ArgumentParser): Command parser.
+        """
+        parser.add_argument(
+            '--bytes-per-second',
+            type=int,
+            default=settings.IMAGES_OPTIMIZE_BYTES_PER_SECOND,
+            help='I/O rate limit, IMAGES_OPTIMIZE_BYTES_PER_SECOND by default, 0 for none.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Maximum count of images to process in this run.',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Run the command.
+
+        Args:
+            args: Positional arguments.
+            options: Command options.
+        """
+        processed, saved = optimize_originals(options['bytes_per_second'], options['limit'])
+        self.stdout.write('Optimized {0} originals, saved {1} bytes.'.format(processed, saved))
@@ -0,0 +1,59 @@
+import io
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from images.profiling import list_profiles, make_token, summarize_profile
+
+
+class Command(BaseCommand):
+    """List and summarize captured request profiles."""
+
+    help = 'List captured create/resize profiles or summarize one of them.'  # Noqa: WPS125
+
+    def add_arguments(self, parser):
+        """
+        Add command arguments.
+
+        Args:
+            parser(ArgumentParser): Command parser.
+        """
+        parser.add_argument('name', nargs='?', help='Profile to summarize.')
+        parser.add_argument('--limit', type=int, default=25, help='Functions to show.')
+        parser.add_argument('--sort', default='cumulative', help='pstats sort key.')
+        parser.add_argument(
+            '--token', action='store_true', help='Print a value for the X-Profile header.',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Run the command.
+
+        Args:
+            args: Positional arguments.
+            options: Command options.
+
+        Raises:
+            CommandError: If the requested profile doesn't exist.
+        """
+        if options['token']:
+            self.stdout.write(make_token())
+            return
+        directory = settings.IMAGES_PROFILING_DIR
+        profiles = dict(list_profiles(directory))
+        if options['name']:
+            if options['name'] not in profiles:
+                raise CommandError('Profile {0} does not exist.'.format(options['name']))
+            summary = io.StringIO()
+            summarize_profile(
+                directory, options['name'], summary, options['limit'], options['sort'],
+            )
+            self.stdout.write(summary.getvalue(), ending='')
+            return
+        for name, metadata in profiles.items():
+            self.stdout.write('{0}  {1} {2}  {3}  {4:.1f} ms'.format(
+                name,
+                metadata['method'],
+                metadata['path'],
+                metadata['status_code'],
+                metadata['duration'] * 1000,
+            ))
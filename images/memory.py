@@ -0,0 +1,160 @@
+import contextvars
+import functools
+import logging
+import os
+import resource
+import threading
+
+from django.conf import settings
+from images import metrics
+from images.source_cache import pixel_bytes
+
+logger = logging.getLogger(__name__)
+
+_current_accounting = contextvars.ContextVar('memory_accounting', default=None)
+PROC_STATM = '/proc/self/statm'
+KIBIBYTE = 1024
+
+
+def current_rss():
+    """
+    Read resident set size of the process.
+
+    Falls back to the peak RSS where /proc is not available.
+
+    Returns:
+        rss(int): Size in bytes.
+    """
+    try:
+        with open(PROC_STATM) as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * KIBIBYTE
+
+
+class MemoryAccounting(object):
+    """
+    Peak RSS growth and Pillow buffer sizes of a single request.
+
+    RSS is sampled by a background thread, so in a multithreaded worker the
+    delta also includes allocations of concurrent requests.
+    """
+
+    def __init__(self, action):
+        self.action = action
+        self.decoded_bytes = 0
+        self.output_bytes = 0
+        self.baseline_rss = 0
+        self.peak_rss = 0
+        self._token = None
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        """
+        Start sampling RSS and collecting buffer sizes.
+
+        Returns:
+            accounting(MemoryAccounting): Started accounting.
+        """
+        self.baseline_rss = current_rss()
+        self.peak_rss = self.baseline_rss
+        self._token = _current_accounting.set(self)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Stop sampling and report the request.
+
+        Args:
+            exc_info: Exception information.
+        """
+        self._stopped.set()
+        self._sampler.join()
+        self.peak_rss = max(self.peak_rss, current_rss())
+        _current_accounting.reset(self._token)
+        self.report()
+
+    @property
+    def peak_rss_delta(self):
+        """
+        Define RSS growth over the request.
+
+        Returns:
+            delta(int): Size in bytes.
+        """
+        return self.peak_rss - self.baseline_rss
+
+    def _sample(self):
+        while not self._stopped.wait(settings.IMAGES_MEMORY_SAMPLE_INTERVAL):
+            self.peak_rss = max(self.peak_rss, current_rss())
+
+    def report(self):
+        """Export the request figures as metrics and warn about heavy requests."""
+        prefix = 'memory.{0}'.format(self.action)
+        metrics.observe('{0}.peak_rss_delta'.format(prefix), self.peak_rss_delta)
+        metrics.observe('{0}.decoded_bytes'.format(prefix), self.decoded_bytes)
+        metrics.observe('{0}.output_bytes'.format(prefix), self.output_bytes)
+        heaviest = max(self.peak_rss_delta, self.decoded_bytes)
+        if heaviest > settings.IMAGES_MEMORY_WARNING_BYTES:
+            metrics.increment('{0}.over_threshold'.format(prefix))
+            logger.warning(
+                '%s request took %d bytes of RSS and decoded %d bytes of pixels.',
+                self.action,
+                self.peak_rss_delta,
+                self.decoded_bytes,
+            )
+
+
+def account_pixels(*images):
+    """
+    Add pixel buffers of `images` to the current request accounting.
+
+    Args:
+        images(PIL.Image.Image): Decoded images.
+    """
+    account_decoded(sum(pixel_bytes(image) for image in images))
+
+
+def account_decoded(size):
+    """
+    Add decoded pixels size to the current request accounting.
+
+    Args:
+        size(int): Pixel buffers size in bytes.
+    """
+    accounting = _current_accounting.get()
+    if accounting is not None:
+        accounting.decoded_bytes += size
+
+
+def account_output(size):
+    """
+    Add encoded output size to the current request accounting.
+
+    Args:
+        size(int): Output size in bytes, None when unknown.
+    """
+    accounting = _current_accounting.get()
+    if accounting is not None and size is not None:
+        accounting.output_bytes += size
+
+
+def track_memory(view_method):
+    """
+    Account memory of a viewset action when memory accounting is enabled.
+
+    Args:
+        view_method(callable): Viewset action.
+
+    Returns:
+        wrapper(callable): Wrapped action.
+    """
+    @functools.wraps(view_method)
+    def wrapper(viewset, request, *args, **kwargs):
+        if not settings.IMAGES_MEMORY_ACCOUNTING_ENABLED:
+            return view_method(viewset, request, *args, **kwargs)
+        with MemoryAccounting(viewset.action):
+            return view_method(viewset, request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,55 @@
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_observations = {}
+
+
+def increment(name, amount=1):
+    """
+    Increase counter `name` by `amount`.
+
+    Args:
+        name(str): Counter name.
+        amount(int): Increment value.
+    """
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name, value_to_observe):
+    """
+    Record a sample of `name`, keeping its count, sum and max.
+
+    Args:
+        name(str): Observation name.
+        value_to_observe(float): Sample value.
+    """
+    with _lock:
+        observation = _observations.setdefault(name, {'count': 0, 'sum': 0, 'max': None})
+        observation['count'] += 1
+        observation['sum'] += value_to_observe
+        if observation['max'] is None or value_to_observe > observation['max']:
+            observation['max'] = value_to_observe
+
+
+def snapshot():
+    """
+    Collect current values of the process metrics.
+
+    Returns:
+        metrics(dict): Counters and observations.
+    """
+    with _lock:
+        return {
+            'counters': dict(_counters),
+            'observations': {name: dict(obs) for name, obs in _observations.items()},
+        }
+
+
+def reset():
+    """Forget all recorded metrics."""
+    with _lock:
+        _counters.clear()
+        _observations.clear()
@@ -0,0 +1,36 @@
+# Generated by Django 3.1.6 on 2026-10-19 02:28
+
+from django.db import migrations, models
+from PIL import Image as PILImage
+
+
+def fill_picture_dimensions(apps, schema_editor):
+    image_model = apps.get_model('images', 'Image')
+    for image in image_model.objects.filter(picture_width__isnull=True).iterator():
+        try:
+            with image.picture.open('rb') as picture_file, PILImage.open(picture_file) as picture:
+                image.picture_width, image.picture_height = picture.size
+        except (OSError, ValueError):
+            continue
+        image.save(update_fields=['picture_width', 'picture_height'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0022_auto_20220207_2339'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='picture_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='picture_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_picture_dimensions, migrations.RunPython.noop),
+    ]
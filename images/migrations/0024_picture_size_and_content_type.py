@@ -0,0 +1,37 @@
+# Generated by Django 3.1.6 on 2026-10-19 02:30
+
+import mimetypes
+
+from django.db import migrations, models
+
+
+def fill_picture_size_and_content_type(apps, schema_editor):
+    image_model = apps.get_model('images', 'Image')
+    for image in image_model.objects.filter(picture_size__isnull=True).iterator():
+        try:
+            image.picture_size = image.picture.size
+        except (OSError, ValueError):
+            continue
+        image.content_type = mimetypes.guess_type(image.picture.name)[0] or ''
+        image.save(update_fields=['picture_size', 'content_type'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0023_picture_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='content_type',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='picture_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_picture_size_and_content_type, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.1.6 on 2026-10-19 02:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0026_remote_origin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TilePyramid',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('building', 'Building'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('tile_size', models.PositiveIntegerField()),
+                ('overlap', models.PositiveIntegerField()),
+                ('tile_format', models.CharField(blank=True, max_length=8)),
+                ('width', models.PositiveIntegerField(default=0)),
+                ('height', models.PositiveIntegerField(default=0)),
+                ('levels_total', models.PositiveIntegerField(default=0)),
+                ('levels_done', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tile_pyramid', to='images.image')),
+            ],
+        ),
+    ]
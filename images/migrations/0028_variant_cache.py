@@ -0,0 +1,27 @@
+# Generated by Django 3.1.6 on 2026-10-19 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0027_tile_pyramid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='last_accessed',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='variant_key',
+            field=models.CharField(blank=True, editable=False, max_length=128),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['parent_picture', 'variant_key'], name='images_imag_parent__3361a2_idx'),
+        ),
+    ]
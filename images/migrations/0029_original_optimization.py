@@ -0,0 +1,23 @@
+# Generated by Django 3.1.6 on 2026-10-19 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0028_variant_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='bytes_saved',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='optimized_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
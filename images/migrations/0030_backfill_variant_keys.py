@@ -0,0 +1,31 @@
+from django.db import migrations
+
+CROP_NAME_MARK = '_crop_'
+
+
+def backfill_variant_keys(apps, schema_editor):
+    """
+    Key variants rendered before keys were recorded.
+
+    Crops are recognised by their file name and never serve as resize
+    sources. Other variants of that time are plain resizes.
+    """
+    Image = apps.get_model('images', 'Image')
+    variants = Image.objects.filter(parent_picture__isnull=False, variant_key='')
+    for variant in variants.iterator():
+        if CROP_NAME_MARK in variant.picture.name or not variant.picture_width:
+            variant_key = 'legacy'
+        else:
+            variant_key = 'resize:{0}x{1}'.format(variant.picture_width, variant.picture_height)
+        Image.objects.filter(pk=variant.pk).update(variant_key=variant_key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0029_original_optimization'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_variant_keys, migrations.RunPython.noop),
+    ]
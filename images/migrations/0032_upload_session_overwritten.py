@@ -0,0 +1,18 @@
+# Generated by Django 3.1.6 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0031_upload_session_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='overwritten',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
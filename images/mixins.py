@@ -1,11 +1,29 @@
+import functools
+import hashlib
+import math
 import os
 import tempfile
 from urllib.parse import urlparse
 
-import requests
-from django.core.files.uploadedfile import InMemoryUploadedFile
-from images.models import Image
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
+from django.utils import timezone
+from images import metrics
+from images.admission import pixel_budget
+from images.animation import STREAMED_FORMATS, is_animated, save_animated
+from images.encoding import BUDGET_FORMATS, BudgetMissed, encode_within_budget, write_content
+from images.imaging import REDUCING_GAP, SNIFF_BYTES, open_image, sniff_format
+from images.ingest import INVALID_IMAGE, IncrementalDecoder
+from images.memory import account_decoded, account_output, account_pixels
+from images.models import Image, RemoteOrigin
+from images.single_flight import RenderLock, single_flight
+from images.source_cache import open_source, seed
+from images.storage import save_encoded
 from PIL import Image as PILImage
+from PIL import UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+
+RGBA_BANDS = 4
 
 
 class ImageHandlerMixin(object):
@@ -24,13 +42,19 @@ class ImageHandlerMixin(object):
         with tempfile.NamedTemporaryFile() as tmp_file:
             if request_payload.get('file'):
                 image_to_save = request_payload.get('file')
+            elif settings.IMAGES_ORIGIN_CACHE_ENABLED:
+                return self.fetch_remote_image(request_payload.get('url'), tmp_file)
+            elif settings.IMAGES_INGEST_PIPELINED:
+                return self.ingest_from_url(request_payload.get('url'), tmp_file)
             else:
                 tmp_file = self.download_from_url(request_payload.get('url'), tmp_file)
                 image_to_save = tmp_file
-            return self.create_new_image_instance(
-                image_to_save,
-                url=request_payload.get('url'),
-            )
+            with pixel_budget.admit(self.measure_original(image_to_save)):
+                return self.create_new_image_instance(
+                    image_to_save,
+                    url=request_payload.get('url'),
+                    content_hash=request_payload.get('content_hash', ''),
+                )
 
     def download_from_url(self, url, tmp_file):
         """
@@ -42,6 +66,8 @@ class ImageHandlerMixin(object):
         Returns:
             tmp_file(file): Temporary file containing an image.
         """
+        import requests  # Noqa: WPS433
+
         with requests.get(url, stream=True) as downloaded_file:
             for chunk in downloaded_file.iter_content(chunk_size=8192):  # Noqa: WPS432
                 tmp_file.write(chunk)
@@ -49,6 +75,162 @@ class ImageHandlerMixin(object):
         tmp_file.name = path.split('/').pop()
         return tmp_file
 
+    def ingest_from_url(self, url, tmp_file):
+        """
+        Download image from `url`, decoding it while it arrives, and save it.
+
+        Args:
+            url(str): Image source.
+            tmp_file(file): Temporary file, where to write a downloaded image.
+
+        Returns:
+            image_object(models.Image): New instance of Image object.
+
+        Raises:
+            ValidationError: If the download fails or its body is not an image.
+        """
+        import requests  # Noqa: WPS433
+
+        with requests.get(url, stream=True) as response:
+            self.check_download_status(response)
+            with IncrementalDecoder() as decoder:
+                for chunk in response.iter_content(chunk_size=65536):  # Noqa: WPS432
+                    tmp_file.write(chunk)
+                    decoder.feed(chunk)
+                decoded = decoder.close()
+                tmp_file.name = urlparse(url).path.split('/').pop()
+                image = self.create_new_image_instance(tmp_file, url=url)
+        if decoder.image_format not in STREAMED_FORMATS:
+            seed(image, decoded, decoder.image_format)
+        return image
+
+    def fetch_remote_image(self, url, tmp_file):
+        """
+        Reuse the image previously ingested from `url` or download a new one.
+
+        A fresh origin is reused without a request. A stale one is revalidated
+        with a conditional GET and reused on 304 or when the downloaded body
+        has the same hash as before.
+
+        Args:
+            url(str): Image source.
+            tmp_file(file): Temporary file, where to write a downloaded image.
+
+        Returns:
+            image_object(models.Image): Stored or new instance of Image object.
+
+        Raises:
+            ValidationError: If the download fails or its body is not an image.
+        """
+        import requests  # Noqa: WPS433
+
+        origin = RemoteOrigin.objects.select_related('image').filter(url=url).first()
+        if origin is not None and origin.is_fresh():
+            metrics.increment('origin_cache.fresh')
+            return origin.image
+        headers = origin.conditional_headers() if origin is not None else {}
+        with requests.get(url, headers=headers, stream=True) as response:
+            if origin is not None and response.status_code == 304:  # Noqa: WPS432
+                metrics.increment('origin_cache.not_modified')
+                return origin.revalidated(response.headers)
+            content_hash = self.download_hashed(response, tmp_file)
+        if origin is not None and origin.content_hash == content_hash:
+            metrics.increment('origin_cache.same_content')
+            return origin.revalidated(response.headers)
+        metrics.increment('origin_cache.misses')
+        return self.store_remote_image(url, tmp_file, content_hash, response.headers)
+
+    def download_hashed(self, response, tmp_file):
+        """
+        Write a successful download into `tmp_file`, hashing it on the way.
+
+        Args:
+            response(requests.Response): Streamed origin response.
+            tmp_file(file): Temporary file, where to write a downloaded image.
+
+        Returns:
+            content_hash(str): SHA-256 hex digest of the body.
+
+        Raises:
+            ValidationError: If the origin did not answer with an image.
+        """
+        self.check_download_status(response)
+        hasher = hashlib.sha256()
+        for chunk in response.iter_content(chunk_size=65536):  # Noqa: WPS432
+            tmp_file.write(chunk)
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def store_remote_image(self, url, tmp_file, content_hash, headers):
+        """
+        Save a downloaded image and remember its origin for later revalidation.
+
+        Args:
+            url(str): Image source.
+            tmp_file(file): Temporary file containing the downloaded image.
+            content_hash(str): SHA-256 hex digest of the download.
+            headers(dict): Origin response headers.
+
+        Returns:
+            image_object(models.Image): New instance of Image object.
+
+        Raises:
+            ValidationError: If the download is not an image.
+        """
+        pixels = self.measure_original(tmp_file)
+        tmp_file.name = urlparse(url).path.split('/').pop()
+        with pixel_budget.admit(pixels):
+            image = self.create_new_image_instance(tmp_file, url=url, content_hash=content_hash)
+        RemoteOrigin.objects.update_or_create(url=url, defaults={
+            'etag': headers.get('ETag', ''),
+            'last_modified': headers.get('Last-Modified', ''),
+            'content_hash': content_hash,
+            'image': image,
+            'fetched_at': timezone.now(),
+        })
+        return image
+
+    def measure_original(self, image_file):
+        """
+        Read the dimensions of an original from its header and account its decoded size.
+
+        Originals are admitted against the pixel budget as if decoded, so the
+        request accounting records the same pixel buffer.
+
+        Args:
+            image_file(file): Seekable file containing the original.
+
+        Returns:
+            pixels(int): Pixel count of the original.
+
+        Raises:
+            ValidationError: If the file is not an image.
+        """
+        image_file.seek(0)
+        try:
+            with open_image(image_file) as image:
+                width, height = image.size
+                bands = len(image.getbands())
+        except UnidentifiedImageError:
+            raise ValidationError({'error': [INVALID_IMAGE]})
+        image_file.seek(0)
+        account_decoded(width * height * bands)
+        return width * height
+
+    def check_download_status(self, response):
+        """
+        Make sure the remote server returned the resource.
+
+        Args:
+            response(requests.Response): Download response.
+
+        Raises:
+            ValidationError: If the response status is an error.
+        """
+        if response.status_code >= 400:  # Noqa: WPS432
+            message = "Can't download from this url. Download request returned {0} status code."
+            raise ValidationError({'error': [message.format(response.status_code)]})
+
     def resize_image(self, request_payload, parent_object):
         """
         Resize image.
@@ -68,15 +250,372 @@ class ImageHandlerMixin(object):
             height = request_payload.get('height')
         else:
             height = parent_object.height
-        with tempfile.NamedTemporaryFile() as tmp_file:
-            with PILImage.open(parent_object.picture.file) as image:
-                resized_image = image.resize((int(width), int(height)))
-                resized_image.save(tmp_file, image.format)
-            tmp_file.name = self.define_new_name(request_payload, parent_object.picture.name)
-            return self.create_new_image_instance(
-                tmp_file,
-                parent_object=parent_object,
+        size = (int(width), int(height))
+        max_bytes = int(request_payload.get('max_bytes') or 0)
+        variant_key = 'resize:{0}x{1}'.format(*size)
+        if max_bytes:
+            variant_key = '{0}:max{1}'.format(variant_key, max_bytes)
+        variant = self.find_variant(parent_object, variant_key)
+        if variant is not None:
+            return variant
+        source_object = self.select_resize_source(parent_object, *size)
+        new_name = self.define_new_name(request_payload, parent_object.picture.name)
+        render = functools.partial(
+            self.render_resize,
+            source_object,
+            size,
+            new_name,
+            parent_object,
+            variant_key,
+            max_bytes,
+        )
+        return self.render_variant_once(parent_object, variant_key, render)
+
+    def render_resize(self, source_object, size, name, parent_object, *args):
+        """
+        Render a resize within the pixel budget.
+
+        The selected source is a cached variant which can be evicted before
+        it is decoded. The full size picture it was resized from is used then.
+
+        Args:
+            source_object(models.Image): Image selected for decoding.
+            size(tuple): Target width and height.
+            name(str): Desired file name.
+            parent_object(models.Image): Parent Image.
+            args: Variant key and byte ceiling of the new variant.
+
+        Returns:
+            image_object(models.Image): New instance of Image object.
+
+        Raises:
+            FileNotFoundError: If the full size picture itself is missing.
+        """
+        try:
+            return self.render_admitted(
+                self.count_resize_pixels(source_object, size),
+                self.render_resized_image,
+                source_object,
+                size,
+                name,
+                parent_object,
+                *args,
+            )
+        except FileNotFoundError:
+            root = parent_object.get_view_root()
+            if root.pk == source_object.pk:
+                raise
+        metrics.increment('resize.source_evicted')
+        return self.render_admitted(
+            self.count_resize_pixels(root, size),
+            self.render_resized_image,
+            root,
+            size,
+            name,
+            parent_object,
+            *args,
+        )
+
+    def render_admitted(self, pixels, render, *args):
+        """
+        Render within the pixel budget.
+
+        Args:
+            pixels(int): Decoded pixels of the rendering.
+            render(callable): Rendering method.
+            args: Arguments of `render`.
+
+        Returns:
+            image_object(models.Image): New instance of Image object.
+        """
+        with pixel_budget.admit(pixels):
+            return render(*args)
+
+    def render_variant_once(self, parent_object, variant_key, render):
+        """
+        Render a variant in a single worker while concurrent requests wait for it.
+
+        Args:
+            parent_object(models.Image): Parent Image.
+            variant_key(str): Rendering parameters.
+            render(callable): Callback rendering the variant.
+
+        Returns:
+            image_object(models.Image): Rendered or reused variant.
+        """
+        _, ext = os.path.splitext(parent_object.picture.name)
+        return single_flight(
+            RenderLock(parent_object.pk, variant_key, ext.lstrip('.').lower()),
+            render,
+            lambda: self.find_variant(parent_object, variant_key),
+        )
+
+    def find_variant(self, parent_object, variant_key):
+        """
+        Find a variant of `parent_object` rendered earlier with the same parameters.
+
+        Args:
+            parent_object(models.Image): Parent Image.
+            variant_key(str): Rendering parameters.
+
+        Returns:
+            image_object(models.Image): Touched variant or None if it was never
+                rendered or has been evicted.
+        """
+        variant = Image.objects.filter(
+            parent_picture=parent_object, variant_key=variant_key,
+        ).order_by('pk').first()
+        if variant is not None:
+            metrics.increment('variants.reused')
+            variant.touch()
+        return variant
+
+    def crop_image(self, request_payload, parent_object):
+        """
+        Crop a box of the image and scale it to the requested size.
+
+        The box is given in `parent_object` coordinates. It is decoded from the
+        smallest variant of the tree still detailed enough for the output, and
+        JPEG sources are decoded at a reduced DCT scale when possible.
+
+        Args:
+            request_payload(dict): Crop box and optional width and height of the result.
+            parent_object(models.Image): Image which need to crop.
+
+        Returns:
+            image_object(models.Image): New instance of Image object.
+
+        Raises:
+            ValidationError: If the box doesn't fit in the image.
+        """
+        box = tuple(request_payload[side] for side in ('left', 'top', 'right', 'bottom'))
+        parent_width = parent_object.picture_width or parent_object.width
+        parent_height = parent_object.picture_height or parent_object.height
+        if box[2] > parent_width or box[3] > parent_height:
+            raise ValidationError({'error': ['Crop box is out of the image bounds.']})
+        box_width, box_height = box[2] - box[0], box[3] - box[1]
+        size = (
+            int(request_payload.get('width') or box_width),
+            int(request_payload.get('height') or box_height),
+        )
+        variant_key = 'crop:{0},{1},{2},{3}:{4}x{5}'.format(*box, *size)
+        variant = self.find_variant(parent_object, variant_key)
+        if variant is not None:
+            return variant
+        source_object = self.select_crop_source(parent_object, box, size)
+        scale = (source_object.picture_width or source_object.width) / parent_width
+        source_box = tuple(side * scale for side in box)
+        new_name = self.define_crop_name(request_payload, parent_object.picture.name)
+        pixels = (box_width * box_height) * scale * scale + size[0] * size[1]
+        render = functools.partial(
+            self.render_admitted,
+            int(pixels),
+            self.render_cropped_image,
+            source_object,
+            source_box,
+            size,
+            new_name,
+            parent_object,
+            variant_key,
+        )
+        return self.render_variant_once(parent_object, variant_key, render)
+
+    def select_crop_source(self, parent_object, box, size):
+        """
+        Pick the cheapest image of the variant tree to decode for a crop.
+
+        Args:
+            parent_object(models.Image): Image which need to crop.
+            box(tuple): Crop box in `parent_object` coordinates.
+            size(tuple): Output width and height.
+
+        Returns:
+            source_object(models.Image): Image to decode.
+        """
+        root = parent_object.get_view_root()
+        if not parent_object.is_sufficient_source(root, 0, 0):
+            return parent_object
+        scale = max(size[0] / (box[2] - box[0]), size[1] / (box[3] - box[1]))
+        return self.select_resize_source(
+            parent_object,
+            math.ceil(parent_object.picture_width * scale),
+            math.ceil(parent_object.picture_height * scale),
+        )
+
+    def render_cropped_image(  # Noqa: WPS211
+        self, source_object, box, size, name, parent_object, variant_key='',
+    ):
+        """
+        Decode the box of `source_object`, scale and encode it into a new image instance.
+
+        Args:
+            source_object(models.Image): Image to decode.
+            box(tuple): Crop box in `source_object` coordinates.
+            size(tuple): Output width and height.
+            name(str): Desired file name.
+            parent_object(models.Image): Parent Image.
+            variant_key(str): Rendering parameters of the new variant.
+
+        Returns:
+            image_object(models.Image): New instance of Image object.
+
+        Raises:
+            ValidationError: If the image is animated.
+        """
+        with open_image(source_object.picture.open('rb')) as image:
+            if is_animated(image):
+                raise ValidationError({'error': ["Animated images can't be cropped."]})
+            image_format = image.format
+            full_width = image.width
+            box_scale = max(size[0] / (box[2] - box[0]), size[1] / (box[3] - box[1]))
+            image.draft(
+                image.mode,
+                (math.ceil(image.width * box_scale), math.ceil(image.height * box_scale)),
+            )
+            draft_scale = image.width / full_width
+            cropped_image = image.resize(
+                size,
+                box=tuple(side * draft_scale for side in box),
+                reducing_gap=REDUCING_GAP,
             )
+            account_pixels(image, cropped_image)
+        return self.create_encoded_image_instance(
+            lambda output: cropped_image.save(output, image_format),
+            size,
+            image_format,
+            name,
+            parent_object,
+            variant_key,
+        )
+
+    def count_resize_pixels(self, source_object, size):
+        """
+        Count pixels decoded and produced by a resize.
+
+        Args:
+            source_object(models.Image): Image to decode.
+            size(tuple): Target width and height.
+
+        Returns:
+            pixels(int): Pixels count.
+        """
+        if source_object.picture_width:
+            source_pixels = source_object.picture_width * source_object.picture_height
+        else:
+            source_pixels = source_object.width * source_object.height
+        return source_pixels + size[0] * size[1]
+
+    def render_resized_image(  # Noqa: WPS211
+        self, source_object, size, name, parent_object, variant_key='', max_bytes=0,
+    ):
+        """
+        Decode `source_object`, resize and encode it into a new image instance.
+
+        Args:
+            source_object(models.Image): Image to decode.
+            size(tuple): Target width and height.
+            name(str): Desired file name.
+            parent_object(models.Image): Parent Image.
+            variant_key(str): Rendering parameters of the new variant.
+            max_bytes(int): Size ceiling of the encoded variant, 0 for none.
+
+        Returns:
+            image_object(models.Image): New instance of Image object.
+
+        Raises:
+            ValidationError: If `max_bytes` is requested for a format without quality
+                setting or can't be met even at the lowest quality.
+        """
+        with open_image(source_object.picture.open('rb')) as image:
+            if max_bytes and (image.format not in BUDGET_FORMATS or is_animated(image)):
+                message = "'max_bytes' is supported only for still JPEG and WebP images."
+                raise ValidationError({'error': [message]})
+            if is_animated(image):
+                self.check_animation_budget(image, size)
+                account_decoded((image.width * image.height + size[0] * size[1]) * RGBA_BANDS)
+                return self.create_encoded_image_instance(
+                    lambda output: save_animated(image, size, output),
+                    size,
+                    image.format,
+                    name,
+                    parent_object,
+                    variant_key,
+                )
+        with open_source(source_object, size) as (image, image_format):
+            resized_image = image.resize(size)
+            account_pixels(image, resized_image)
+        if max_bytes:
+            try:
+                content = encode_within_budget(resized_image, image_format, max_bytes)
+            except BudgetMissed as error:
+                message = "'max_bytes' can't be met, the smallest variant takes {0} bytes.".format(
+                    error.smallest_size,
+                )
+                raise ValidationError({'error': [message]})
+            encode = functools.partial(write_content, content)
+        else:
+            encode = functools.partial(resized_image.save, format=image_format)
+        return self.create_encoded_image_instance(
+            encode,
+            size,
+            image_format,
+            name,
+            parent_object,
+            variant_key,
+        )
+
+    def check_animation_budget(self, image, size):
+        """
+        Check that resizing all frames of `image` fits the animation budget.
+
+        Args:
+            image(PIL.Image.Image): Opened animated image.
+            size(tuple): Target width and height.
+
+        Raises:
+            ValidationError: If the animation has too many frames or pixels.
+        """
+        frame_pixels = max(image.width * image.height, size[0] * size[1])
+        too_many_frames = image.n_frames > settings.IMAGES_ANIMATION_MAX_FRAMES
+        if too_many_frames or image.n_frames * frame_pixels > settings.IMAGES_ANIMATION_MAX_PIXELS:
+            raise ValidationError({'error': ['Animation is too large to resize.']})
+
+    def select_resize_source(self, parent_object, width, height):
+        """
+        Pick the cheapest image of the variant tree to decode for a resize.
+
+        The smallest variant which is still at least `width` x `height` wins.
+        When no variant is big enough, e.g. `parent_object` is an already
+        downscaled child, the full size picture it was resized from is used
+        instead. Only plain resizes are considered, since crops show a part of
+        the picture.
+
+        Args:
+            parent_object(models.Image): Image which need to resize.
+            width(int): Target width.
+            height(int): Target height.
+
+        Returns:
+            source_object(models.Image): Image to decode.
+        """
+        root = parent_object.get_view_root()
+        _, ext = os.path.splitext(parent_object.picture.name)
+        same_format = [
+            candidate
+            for candidate in [root, *root.get_resize_variants()]
+            if candidate.picture.name.endswith(ext)
+        ]
+        suitable_sources = [
+            candidate
+            for candidate in same_format
+            if candidate.is_sufficient_source(root, width, height)
+        ]
+        if not suitable_sources:
+            return root
+        return min(
+            suitable_sources,
+            key=lambda candidate: candidate.picture_width * candidate.picture_height,
+        )
 
     def define_new_name(self, request_payload, parent_name):
         """
@@ -100,10 +639,90 @@ class ImageHandlerMixin(object):
             name = '{0}_0'.format(name)
         return '{0}{1}'.format(name, ext)
 
+    def define_crop_name(self, request_payload, parent_name):
+        """
+        Define name of a cropped image.
+
+        Args:
+            request_payload(dict): Crop box and optional width and height of the result.
+            parent_name(str): Parent Image which need to crop.
+
+        Returns:
+            cropped_image_name(str): Name of cropped image.
+        """
+        name, ext = os.path.splitext(parent_name)
+        box = '_'.join(
+            str(request_payload[side]) for side in ('left', 'top', 'right', 'bottom')
+        )
+        name = '{0}_crop_{1}'.format(name, box)
+        return self.define_new_name(request_payload, '{0}{1}'.format(name, ext))
+
+    def create_encoded_image_instance(  # Noqa: WPS211
+        self, encode, size, image_format, name, parent_object, variant_key='',
+    ):
+        """
+        Encode a picture straight into the storage and create new image instance.
+
+        Args:
+            encode(callable): Callback writing encoded picture into a file object.
+            size(tuple): Picture width and height.
+            image_format(str): Output format.
+            name(str): Desired file name.
+            parent_object(models.Image): Parent Image.
+            variant_key(str): Rendering parameters of the new variant.
+
+        Returns:
+            image_object(models.Image): New instance of Image object.
+        """
+        picture_field = Image._meta.get_field('picture')
+        name, file_size = save_encoded(
+            picture_field.storage,
+            picture_field.generate_filename(None, name),
+            encode,
+        )
+        account_output(file_size)
+        image = Image(
+            url=parent_object.url,
+            picture=name,
+            picture_width=size[0],
+            picture_height=size[1],
+            picture_size=file_size,
+            content_type=PILImage.MIME.get(image_format, ''),
+            parent_picture=parent_object,
+            variant_key=variant_key,
+            last_accessed=timezone.now(),
+        )
+        try:
+            image.save()
+        except Exception:
+            picture_field.storage.delete(name)
+            raise
+        return image
+
+    def inspect_file(self, image_file):
+        """
+        Measure a file and identify its format from the first bytes.
+
+        Args:
+            image_file(file): Seekable file object.
+
+        Returns:
+            inspected(tuple): Size in bytes and Pillow format name or None.
+        """
+        image_file.seek(0)
+        image_format = sniff_format(image_file.read(SNIFF_BYTES))
+        image_file.seek(0, os.SEEK_END)
+        file_size = image_file.tell()
+        image_file.seek(0)
+        return file_size, image_format
+
     def create_new_image_instance(self, temporary_file, **kwargs):
         """
         Create new image instance.
 
+        The stored size and content type come from the file bytes, not from
+        its name or a client supplied header.
+
         Args:
             temporary_file(file): Temporary file containing an image.
 
@@ -111,18 +730,31 @@ class ImageHandlerMixin(object):
             image_object(models.Image): New instance of Image object.
         """
         parent_picture = kwargs.get('parent_object')
-        image_file = InMemoryUploadedFile(
-            temporary_file,
-            None,
-            temporary_file.name,
-            'image/jpeg',
-            None,
-            None,
-        )
+        file_size, image_format = self.inspect_file(temporary_file)
+        content_type = PILImage.MIME.get(image_format, '')
+        if isinstance(temporary_file, UploadedFile):
+            image_file = temporary_file
+        else:
+            image_file = InMemoryUploadedFile(
+                temporary_file,
+                None,
+                temporary_file.name,
+                content_type,
+                file_size,
+                None,
+            )
         if parent_picture:
             url = parent_picture.url
         else:
             url = kwargs.get('url')
-        image = Image(url=url, picture=image_file, parent_picture=parent_picture)
+        image = Image(
+            url=url,
+            picture=image_file,
+            picture_size=file_size,
+            content_type=content_type,
+            content_hash=kwargs.get('content_hash') or getattr(image_file, 'content_hash', ''),
+            parent_picture=parent_picture,
+        )
         image.save()
+        account_output(image.picture_size)
         return image
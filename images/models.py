@@ -1,11 +1,36 @@
+import mimetypes
+import os
+import re
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
 from django.db import models
-from PIL import Image as PILImage
+from django.utils import timezone
+from images.imaging import open_image
+
+PLAIN_RESIZE_KEY = re.compile(r'resize:\d+x\d+')
+ASPECT_RATIO_TOLERANCE = 0.01
 
 
 class Image(models.Model):
     url = models.TextField(blank=True, null=True)
     picture = models.ImageField(blank=False)
+    picture_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    picture_height = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    picture_size = models.PositiveBigIntegerField(blank=True, null=True, editable=False)
+    content_type = models.CharField(max_length=64, blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
     parent_picture = models.ForeignKey('self', blank=True, null=True, on_delete=models.SET_NULL)
+    variant_key = models.CharField(max_length=128, blank=True, editable=False)
+    last_accessed = models.DateTimeField(blank=True, null=True, db_index=True, editable=False)
+    optimized_at = models.DateTimeField(blank=True, null=True, editable=False)
+    bytes_saved = models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:  # Noqa: WPS306
+        indexes = [models.Index(fields=['parent_picture', 'variant_key'])]
 
     @property
     def name(self):
@@ -25,7 +50,7 @@ class Image(models.Model):
         Returns:
             width(int): Instance width.
         """
-        with PILImage.open(self.picture.file) as image:
+        with open_image(self.picture.file) as image:
             return image.width
 
     @property
@@ -36,9 +61,142 @@ class Image(models.Model):
         Returns:
             height(int): Instance height.
         """
-        with PILImage.open(self.picture.file) as image:
+        with open_image(self.picture.file) as image:
             return image.height
 
+    def get_root(self):
+        """
+        Walk up the `parent_picture` links to the original image of the variant tree.
+
+        Returns:
+            root(models.Image): Original image.
+        """
+        root = self
+        while root.parent_picture_id:
+            root = root.parent_picture
+        return root
+
+    @property
+    def is_plain_resize(self):
+        """
+        Check that the instance is a resize of its parent showing the whole picture.
+
+        Crops and other renderings are not, so they can't stand in for their
+        parent. Neither are resizes squeezed under a byte budget, whose quality
+        was lowered to fit it.
+
+        Returns:
+            is_plain_resize(bool): Whether the instance is a plain resize variant.
+        """
+        if self.parent_picture_id is None:
+            return False
+        return PLAIN_RESIZE_KEY.fullmatch(self.variant_key) is not None
+
+    def is_sufficient_source(self, root, width, height):
+        """
+        Check that the instance can replace `root` as a resize source.
+
+        Variants with another aspect ratio are distorted copies of the original,
+        so only the ones keeping the original proportions are accepted.
+
+        Args:
+            root(models.Image): Original of the variant tree.
+            width(int): Target width.
+            height(int): Target height.
+
+        Returns:
+            is_sufficient(bool): Whether the instance is big enough and undistorted.
+        """
+        dimensions = (
+            self.picture_width,
+            self.picture_height,
+            root.picture_width,
+            root.picture_height,
+        )
+        if not all(dimensions):
+            return False
+        if self.picture_width < width or self.picture_height < height:
+            return False
+        own_ratio = self.picture_width / self.picture_height
+        root_ratio = root.picture_width / root.picture_height
+        return abs(own_ratio - root_ratio) <= root_ratio * ASPECT_RATIO_TOLERANCE
+
+    def get_view_root(self):
+        """
+        Walk up plain resizes to the image showing the same picture at full size.
+
+        Returns:
+            root(models.Image): Original, crop or other rendering the instance resizes.
+        """
+        root = self
+        while root.is_plain_resize:
+            root = root.parent_picture
+        return root
+
+    def get_resize_variants(self):
+        """
+        Collect variants showing the whole picture of the instance.
+
+        Returns:
+            variants(list): Plain resizes, directly or through other plain resizes.
+        """
+        variants = []
+        whole_views = {self.pk}
+        for variant in self.get_descendants():
+            if variant.parent_picture_id in whole_views and variant.is_plain_resize:
+                whole_views.add(variant.pk)
+                variants.append(variant)
+        return variants
+
+    def get_descendants(self):
+        """
+        Collect all variants derived from the instance, level by level.
+
+        Returns:
+            descendants(list): Derived Image objects, shallowest first.
+        """
+        descendants = []
+        level = [self.pk]
+        while level:
+            children = list(Image.objects.filter(parent_picture__in=level).order_by('pk'))
+            descendants.extend(children)
+            level = [child.pk for child in children]
+        return descendants
+
+    def touch(self):
+        """
+        Record an access to a derived variant for the LRU eviction.
+
+        Originals are never evicted and are not tracked. The row is written
+        at most once per `IMAGES_VARIANT_TOUCH_INTERVAL`.
+        """
+        if self.parent_picture_id is None:
+            return
+        now = timezone.now()
+        interval = timedelta(seconds=settings.IMAGES_VARIANT_TOUCH_INTERVAL)
+        if self.last_accessed is None or self.last_accessed <= now - interval:
+            Image.objects.filter(pk=self.pk).update(last_accessed=now)
+            self.last_accessed = now
+
+    def save(self, *args, **kwargs):
+        """
+        Store picture dimensions, size and content type along with the instance.
+
+        Args:
+            args: Positional arguments of the inherited save method.
+            kwargs: Keyword arguments of the inherited save method.
+
+        Returns:
+            Inherited save method.
+        """
+        if self.picture and self.picture_width is None:
+            self.picture_width, self.picture_height = get_image_dimensions(self.picture)
+        if self.picture and self.picture_size is None:
+            self.picture_size = self.picture.size
+        if self.picture and not self.content_type:
+            self.content_type = mimetypes.guess_type(self.picture.name)[0] or ''
+        return super().save(*args, **kwargs)
+
     def delete(self):
         """
         Delete image from the disk.
@@ -47,4 +205,148 @@ class Image(models.Model):
             Inherited delete method.
         """
         self.picture.delete()
+        pyramid = TilePyramid.objects.filter(image=self).first()
+        if pyramid is not None:
+            pyramid.delete()
         return super().delete()
+
+
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # Noqa: A003
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    received_ranges = models.JSONField(default=list, editable=False)
+    overwritten = models.BooleanField(default=False, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def received_bytes(self):
+        """
+        Count bytes received so far.
+
+        Returns:
+            received_bytes(int): Received bytes.
+        """
+        return sum(end - start for start, end in self.received_ranges)
+
+    @property
+    def is_complete(self):
+        """
+        Check that every byte of the upload has been received.
+
+        Returns:
+            is_complete(bool): Whether the upload can be finalized.
+        """
+        return self.received_ranges == [[0, self.size]]
+
+
+class RemoteOrigin(models.Model):
+    url = models.TextField(unique=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64)
+    image = models.ForeignKey(Image, on_delete=models.CASCADE, related_name='origins')
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    def is_fresh(self):
+        """
+        Check whether the origin may be reused without asking the remote server.
+
+        Returns:
+            is_fresh(bool): Whether the last fetch is younger than `IMAGES_ORIGIN_CACHE_TTL`.
+        """
+        age = (timezone.now() - self.fetched_at).total_seconds()
+        return age < settings.IMAGES_ORIGIN_CACHE_TTL
+
+    def conditional_headers(self):
+        """
+        Build headers of a conditional request for the origin.
+
+        Returns:
+            headers(dict): `If-None-Match` and `If-Modified-Since` headers.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def revalidated(self, headers):
+        """
+        Record that the stored image still matches the remote resource.
+
+        Args:
+            headers(dict): Response headers of the revalidation request.
+
+        Returns:
+            image_object(models.Image): Stored image.
+        """
+        self.etag = headers.get('ETag', self.etag)
+        self.last_modified = headers.get('Last-Modified', self.last_modified)
+        self.fetched_at = timezone.now()
+        self.save(update_fields=['etag', 'last_modified', 'fetched_at'])
+        return self.image
+
+
+class TilePyramid(models.Model):
+    PENDING = 'pending'
+    BUILDING = 'building'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (BUILDING, 'Building'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+
+    image = models.OneToOneField(Image, on_delete=models.CASCADE, related_name='tile_pyramid')
+    status = models.CharField(max_length=16, choices=STATUSES, default=PENDING)
+    tile_size = models.PositiveIntegerField()
+    overlap = models.PositiveIntegerField()
+    tile_format = models.CharField(max_length=8, blank=True)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    levels_total = models.PositiveIntegerField(default=0)
+    levels_done = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def directory(self):
+        """
+        Define the directory holding the tiles.
+
+        Returns:
+            directory(str): Directory path.
+        """
+        return os.path.join(settings.IMAGES_TILES_DIR, str(self.image_id))
+
+    @property
+    def progress(self):
+        """
+        Share of the levels built so far.
+
+        Returns:
+            progress(float): Value from 0 to 1.
+        """
+        if not self.levels_total:
+            return 0
+        return self.levels_done / self.levels_total
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete tiles from the disk.
+
+        Args:
+            args: Positional arguments of the inherited delete method.
+            kwargs: Keyword arguments of the inherited delete method.
+
+        Returns:
+            Inherited delete method.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().delete(*args, **kwargs)
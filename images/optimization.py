@@ -0,0 +1,405 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+from django.db.models import F
+from django.utils import timezone
+from images import metrics
+from images.imaging import open_image, sniff_format
+from images.models import Image
+from PIL import Image as PILImage
+from PIL import PngImagePlugin
+
+logger = logging.getLogger(__name__)
+
+ORIENTATION_TAG = 0x0112
+JPEG_SOI = b'\xff\xd8'
+JPEG_SOS = 0xDA
+JPEG_COM = 0xFE
+JPEG_APP1 = 0xE1
+JPEG_APP_MARKERS = range(0xE0, 0xF0)
+JPEG_STANDALONE_MARKERS = frozenset((0x01, *range(0xD0, 0xD9)))
+JPEG_KEPT_APP_SEGMENTS = (
+    (0xE0, b'JFIF\x00'),
+    (0xE2, b'ICC_PROFILE\x00'),
+    (0xEE, b'Adobe'),
+)
+EXIF_HEADER = b'Exif\x00\x00'
+PNG_KEPT_INFO = ('icc_profile', 'transparency', 'dpi')
+PNG_FIXED_POINT = 100000
+OPTIMIZATION_BATCH_SIZE = 100
+
+
+class Throttle(object):
+    """Keep the average I/O rate under a bytes per second limit."""
+
+    def __init__(self, bytes_per_second):
+        """
+        Start measuring.
+
+        Args:
+            bytes_per_second(int): Rate limit, no limit if zero.
+        """
+        self.bytes_per_second = bytes_per_second
+        self.started = time.monotonic()
+        self.consumed = 0
+
+    def consume(self, amount):
+        """
+        Account `amount` bytes, sleeping while the rate is over the limit.
+
+        Args:
+            amount(int): Bytes read or written.
+        """
+        self.consumed += amount
+        if self.bytes_per_second <= 0:
+            return
+        delay = self.consumed / self.bytes_per_second - (time.monotonic() - self.started)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def orientation_exif(exif):
+    """
+    Build EXIF data holding only the orientation of `exif`.
+
+    Args:
+        exif(PIL.Image.Exif): Original EXIF data.
+
+    Returns:
+        data(bytes): EXIF data or None if the image is not rotated.
+    """
+    orientation = exif.get(ORIENTATION_TAG)
+    if orientation in {None, 1}:
+        return None
+    minimal = PILImage.Exif()
+    minimal[ORIENTATION_TAG] = orientation
+    return minimal.tobytes()
+
+
+def is_kept_jpeg_segment(marker, payload):
+    """
+    Check whether a JPEG segment is needed to decode or display the image.
+
+    Args:
+        marker(int): Segment marker.
+        payload(bytes): Segment data after the length field.
+
+    Returns:
+        kept(bool): True for coding segments, JFIF, ICC profile and Adobe ones.
+    """
+    if marker == JPEG_COM:
+        return False
+    if marker not in JPEG_APP_MARKERS:
+        return True
+    return any(
+        marker == kept_marker and payload.startswith(signature)
+        for kept_marker, signature in JPEG_KEPT_APP_SEGMENTS
+    )
+
+
+def jpeg_segment(marker, payload):
+    """
+    Encode a JPEG segment.
+
+    Args:
+        marker(int): Segment marker.
+        payload(bytes): Segment data.
+
+    Returns:
+        segment(bytes): Marker, length and data.
+    """
+    return bytes((0xFF, marker)) + (len(payload) + 2).to_bytes(2, 'big') + payload
+
+
+def strip_jpeg(content):
+    """
+    Drop metadata segments of a JPEG without touching its coded data.
+
+    EXIF, XMP, Photoshop blocks, embedded thumbnails and comments go away.
+    Orientation is kept in a minimal EXIF segment, ICC profile segments
+    are kept as is. Everything from the first scan on is copied verbatim.
+
+    Args:
+        content(bytes): JPEG file.
+
+    Returns:
+        content(bytes): Stripped JPEG file.
+
+    Raises:
+        ValueError: If the file structure is broken.
+    """
+    if not content.startswith(JPEG_SOI):
+        raise ValueError('Not a JPEG file.')
+    kept = (stripped_segment(*segment) for segment in jpeg_segments(content))
+    return JPEG_SOI + b''.join(kept)
+
+
+def jpeg_segments(content):
+    """
+    Walk the segments of a JPEG up to its first scan.
+
+    Args:
+        content(bytes): JPEG file.
+
+    Yields:
+        segment(tuple): Marker, whole segment and its payload. The scan
+        segment runs to the end of the file and has no separate payload.
+
+    Raises:
+        ValueError: If the file structure is broken.
+    """
+    position = len(JPEG_SOI)
+    while position < len(content):
+        if content[position] != 0xFF or position + 1 >= len(content):
+            raise ValueError('Broken JPEG segment at {0}.'.format(position))
+        marker = content[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker == JPEG_SOS:
+            yield marker, content[position:], b''
+            return
+        if marker in JPEG_STANDALONE_MARKERS:
+            end = position + 2
+        else:
+            end = position + 2 + int.from_bytes(content[position + 2:position + 4], 'big')
+        yield marker, content[position:end], content[position + 4:end]
+        position = end
+
+
+def stripped_segment(marker, segment, payload):
+    """
+    Decide what is left of a JPEG segment after stripping metadata.
+
+    Args:
+        marker(int): Segment marker.
+        segment(bytes): Whole segment.
+        payload(bytes): Segment data.
+
+    Returns:
+        segment(bytes): Kept segment, a minimal EXIF segment or nothing.
+    """
+    if marker == JPEG_SOS or marker in JPEG_STANDALONE_MARKERS:
+        return segment
+    if is_kept_jpeg_segment(marker, payload):
+        return segment
+    if marker == JPEG_APP1 and payload.startswith(EXIF_HEADER):
+        exif = PILImage.Exif()
+        exif.load(payload)
+        orientation = orientation_exif(exif)
+        if orientation:
+            return jpeg_segment(JPEG_APP1, EXIF_HEADER + orientation)
+    return b''
+
+
+def same_pixels(first, second):
+    """
+    Compare decoded pixels of two images.
+
+    Args:
+        first(PIL.Image.Image): Image.
+        second(PIL.Image.Image): Image.
+
+    Returns:
+        same(bool): True if both images look identical.
+    """
+    if first.size != second.size:
+        return False
+    if 'P' in {first.mode, second.mode}:
+        return first.convert('RGBA').tobytes() == second.convert('RGBA').tobytes()
+    return first.mode == second.mode and first.tobytes() == second.tobytes()
+
+
+def fixed_point(number):
+    """
+    Encode a PNG fixed point number.
+
+    Args:
+        number(float): Value with up to 5 decimal places.
+
+    Returns:
+        encoded(bytes): Unsigned 4 bytes big endian integer.
+    """
+    return round(number * PNG_FIXED_POINT).to_bytes(4, 'big')
+
+
+def png_color_info(info):
+    """
+    Rebuild the gamma, chromaticity and sRGB chunks Pillow reads but does not write.
+
+    Args:
+        info(dict): Info of the decoded PNG.
+
+    Returns:
+        png_info(PngInfo): Chunks to write before the image data.
+    """
+    png_info = PngImagePlugin.PngInfo()
+    if 'gamma' in info:
+        png_info.add(b'gAMA', fixed_point(info['gamma']))
+    if 'chromaticity' in info:
+        png_info.add(b'cHRM', b''.join(map(fixed_point, info['chromaticity'])))
+    if 'srgb' in info:
+        png_info.add(b'sRGB', bytes((info['srgb'],)))
+    return png_info
+
+
+def recompress_png(content):
+    """
+    Re-encode a PNG with the best compression, keeping only essential chunks.
+
+    Color space chunks, ICC profile, gamma, chromaticity and sRGB intent,
+    are kept, since dropping them changes how the pixels are displayed.
+
+    Animated images are skipped. The result is decoded back and compared
+    with the original, so a lossy round trip is never accepted.
+
+    Args:
+        content(bytes): PNG file.
+
+    Returns:
+        content(bytes): Recompressed PNG file or None if it can not be done losslessly.
+    """
+    with open_image(io.BytesIO(content)) as image:
+        if getattr(image, 'is_animated', False):
+            return None
+        image.load()
+        options = {key: image.info[key] for key in PNG_KEPT_INFO if key in image.info}
+        options['pnginfo'] = png_color_info(image.info)
+        orientation = orientation_exif(image.getexif())
+        if orientation:
+            options['exif'] = orientation
+        output = io.BytesIO()
+        image.save(output, 'PNG', optimize=True, **options)
+        with open_image(io.BytesIO(output.getvalue())) as optimized:
+            if not same_pixels(image, optimized):
+                return None
+    return output.getvalue()
+
+
+def optimize_content(content):
+    """
+    Losslessly shrink an encoded image.
+
+    Args:
+        content(bytes): Image file.
+
+    Returns:
+        content(bytes): Optimized file or None if the format is not supported.
+    """
+    fmt = sniff_format(content)
+    if fmt == 'JPEG':
+        return strip_jpeg(content)
+    if fmt == 'PNG':
+        return recompress_png(content)
+    return None
+
+
+def replace_content(storage, name, content):
+    """
+    Atomically replace a stored file.
+
+    The new content is written next to the old file and moved over it, so
+    readers see either the old or the new file, never a partial one.
+
+    Args:
+        storage(FileSystemStorage): File storage.
+        name(str): Stored file name.
+        content(bytes): New content.
+    """
+    full_path = storage.path(name)
+    directory, basename = os.path.split(full_path)
+    descriptor, temporary_path = tempfile.mkstemp(
+        prefix='.{0}.'.format(basename), suffix='.part', dir=directory,
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as temporary_file:
+            temporary_file.write(content)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        if storage.file_permissions_mode is not None:
+            os.chmod(temporary_path, storage.file_permissions_mode)
+        os.replace(temporary_path, full_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def optimize_image(image_object, throttle):
+    """
+    Optimize the stored file of an original and record the result.
+
+    The image is marked optimized even if nothing could be saved, so it is
+    not read again by later runs. A rewritten file gets its content hash
+    recomputed along with its size.
+
+    Args:
+        image_object(models.Image): Original image.
+        throttle(Throttle): I/O rate limit.
+
+    Returns:
+        saved(int): Bytes saved.
+    """
+    picture = image_object.picture
+    with picture.storage.open(picture.name, 'rb') as picture_file:
+        content = picture_file.read()
+    throttle.consume(len(content))
+    try:
+        optimized = optimize_content(content)
+    except (ValueError, OSError, SyntaxError):
+        logger.warning('Can not optimize image %s', image_object.pk, exc_info=True)
+        metrics.increment('optimize.failed')
+        optimized = None
+    saved = 0
+    stored = {}
+    if optimized is not None and len(optimized) < len(content):
+        replace_content(picture.storage, picture.name, optimized)
+        throttle.consume(len(optimized))
+        saved = len(content) - len(optimized)
+        stored['content_hash'] = hashlib.sha256(optimized).hexdigest()
+    Image.objects.filter(pk=image_object.pk).update(
+        picture_size=len(content) - saved,
+        bytes_saved=F('bytes_saved') + saved,
+        optimized_at=timezone.now(),
+        **stored,
+    )
+    metrics.increment('optimize.images')
+    metrics.increment('optimize.bytes_saved', saved)
+    return saved
+
+
+def optimize_originals(bytes_per_second, limit=None):
+    """
+    Optimize stored originals which were not optimized yet.
+
+    Each image is recorded as soon as it is done, so an interrupted run
+    resumes where it stopped.
+
+    Args:
+        bytes_per_second(int): I/O rate limit, no limit if zero.
+        limit(int): Maximum count of images to process, all if None.
+
+    Returns:
+        optimized(tuple): Count of processed images and total bytes saved.
+    """
+    throttle = Throttle(bytes_per_second)
+    processed = 0
+    saved = 0
+    while limit is None or processed < limit:
+        batch_size = OPTIMIZATION_BATCH_SIZE if limit is None else min(
+            OPTIMIZATION_BATCH_SIZE, limit - processed,
+        )
+        pending = list(
+            Image.objects.filter(
+                parent_picture__isnull=True, optimized_at__isnull=True,
+            ).exclude(picture='').order_by('pk')[:batch_size],
+        )
+        if not pending:
+            break
+        for image_object in pending:
+            saved += optimize_image(image_object, throttle)
+            processed += 1
+    return processed, saved
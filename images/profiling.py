@@ -0,0 +1,197 @@
+import cProfile
+import json
+import os
+import pstats
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from images.views import ImagesViewSet
+
+PROFILED_ACTIONS = frozenset(('create', 'resize', 'crop'))
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+SIGNING_SALT = 'images.profiling'
+SIGNED_VALUE = 'profile'
+PROFILE_EXTENSION = '.prof'
+METADATA_EXTENSION = '.json'
+
+
+class ProfilingMiddleware(object):
+    """
+    Profile `create`, `resize` and `crop` requests carrying a signed `X-Profile` header.
+
+    The middleware removes itself from the chain when profiling is disabled.
+    """
+
+    def __init__(self, get_response):
+        if not settings.IMAGES_PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """
+        Pass the request through.
+
+        Args:
+            request(HttpRequest): Request.
+
+        Returns:
+            response(HttpResponse): Response.
+        """
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Run the view under the profiler when the request asks for it.
+
+        Args:
+            request(HttpRequest): Request.
+            view_func(callable): Resolved view.
+            view_args(tuple): View positional arguments.
+            view_kwargs(dict): View keyword arguments.
+
+        Returns:
+            response(HttpResponse): View response, or None to run the view as usual.
+        """
+        action = get_profiled_action(request, view_func)
+        if action is None or not has_valid_token(request):
+            return None
+        profiler = cProfile.Profile()
+        started = time.time()
+        response = profiler.runcall(view_func, request, *view_args, **view_kwargs)
+        save_profile(profiler, {
+            'action': action,
+            'method': request.method,
+            'path': request.path,
+            'view_kwargs': view_kwargs,
+            'status_code': response.status_code,
+            'started_at': started,
+            'duration': time.time() - started,
+        })
+        return response
+
+
+def get_profiled_action(request, view_func):
+    """
+    Define the `ImagesViewSet` action served by `view_func`, if it is profiled.
+
+    Args:
+        request(HttpRequest): Request.
+        view_func(callable): Resolved view.
+
+    Returns:
+        action(str): Action name or None.
+    """
+    if getattr(view_func, 'cls', None) is not ImagesViewSet:
+        return None
+    action = view_func.actions.get(request.method.lower())
+    return action if action in PROFILED_ACTIONS else None
+
+
+def make_token():
+    """
+    Create a value for the `X-Profile` header.
+
+    Returns:
+        token(str): Signed token.
+    """
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(SIGNED_VALUE)
+
+
+def has_valid_token(request):
+    """
+    Check the `X-Profile` header of `request`.
+
+    Args:
+        request(HttpRequest): Request.
+
+    Returns:
+        is_valid(bool): Whether the header holds a fresh token signed with SECRET_KEY.
+    """
+    token = request.META.get(PROFILE_HEADER)
+    if not token:
+        return False
+    try:
+        signed_value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token, max_age=settings.IMAGES_PROFILING_TOKEN_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return False
+    return signed_value == SIGNED_VALUE
+
+
+def save_profile(profiler, metadata):
+    """
+    Save profiler stats with request metadata and rotate old profiles.
+
+    Args:
+        profiler(cProfile.Profile): Finished profiler.
+        metadata(dict): Request metadata.
+
+    Returns:
+        name(str): Profile name.
+    """
+    directory = settings.IMAGES_PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = '{0}-{1}-{2}'.format(
+        time.strftime('%Y%m%dT%H%M%S', time.gmtime(metadata['started_at'])),
+        metadata['action'],
+        uuid.uuid4().hex[:8],
+    )
+    profiler.dump_stats(os.path.join(directory, name + PROFILE_EXTENSION))
+    with open(os.path.join(directory, name + METADATA_EXTENSION), 'w') as metadata_file:
+        json.dump(metadata, metadata_file)
+    rotate_profiles(directory, settings.IMAGES_PROFILING_KEEP)
+    return name
+
+
+def list_profiles(directory):
+    """
+    List saved profiles, newest first.
+
+    Args:
+        directory(str): Profiles directory.
+
+    Returns:
+        profiles(list): Pairs of profile name and its metadata.
+    """
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in os.listdir(directory):
+        if filename.endswith(METADATA_EXTENSION):
+            with open(os.path.join(directory, filename)) as metadata_file:
+                profiles.append((filename[:-len(METADATA_EXTENSION)], json.load(metadata_file)))
+    return sorted(profiles, key=lambda profile: profile[1]['started_at'], reverse=True)
+
+
+def rotate_profiles(directory, keep):
+    """
+    Delete all but `keep` newest profiles.
+
+    Args:
+        directory(str): Profiles directory.
+        keep(int): Number of profiles to keep.
+    """
+    for name, _ in list_profiles(directory)[keep:]:
+        for extension in (PROFILE_EXTENSION, METADATA_EXTENSION):
+            path = os.path.join(directory, name + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def summarize_profile(directory, name, stream, limit, sort_by):
+    """
+    Write the top functions of a saved profile into `stream`.
+
+    Args:
+        directory(str): Profiles directory.
+        name(str): Profile name.
+        stream(file): Output stream.
+        limit(int): Number of functions to show.
+        sort_by(str): pstats sort key.
+    """
+    stats = pstats.Stats(os.path.join(directory, name + PROFILE_EXTENSION), stream=stream)
+    stats.strip_dirs().sort_stats(sort_by).print_stats(limit)
@@ -0,0 +1,141 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'images_primary_pin'
+
+_read_alias = ContextVar('images_read_alias', default=None)
+
+
+def choose_replica():
+    """
+    Pick a replica database for reads.
+
+    Returns:
+        alias(str): Replica alias or None if no replica is configured.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)  # Noqa: S311
+
+
+class ReplicaRouter(object):
+    """
+    Send reads of the current request to the replica it was assigned.
+
+    Requests are only assigned a replica by `ReplicaReadsMixin`, everything
+    else, including background threads, reads from the primary. Writes always
+    go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        """
+        Choose the database to read from.
+
+        Args:
+            model(Model): Read model.
+            hints: Router hints.
+
+        Returns:
+            alias(str): Assigned replica or None to fall back on the default.
+        """
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        """
+        Choose the database to write into.
+
+        Args:
+            model(Model): Written model.
+            hints: Router hints.
+
+        Returns:
+            alias(str): Primary alias, also for instances read from a replica.
+        """
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Allow relations between the primary and its replicas.
+
+        All configured databases are the primary and copies of it.
+
+        Args:
+            obj1(Model): First instance.
+            obj2(Model): Second instance.
+            hints: Router hints.
+
+        Returns:
+            allowed(bool): True if both instances come from configured databases.
+        """
+        aliases = settings.DATABASES.keys()
+        if obj1._state.db in aliases and obj2._state.db in aliases:  # Noqa: WPS437
+            return True
+        return None
+
+
+class ReplicaReadsMixin(object):
+    """
+    Route reads of `replica_actions` to a replica and keep clients on the primary after writes.
+
+    A successful unsafe request sets a cookie for `IMAGES_REPLICA_PIN_SECONDS`.
+    While it is present the client reads from the primary, so it sees its own
+    writes before they are replicated.
+    """
+
+    replica_actions = frozenset()
+    read_alias_token = None
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Handle the request, releasing its replica however it ends.
+
+        Args:
+            request(HttpRequest): Client request.
+            args: Positional arguments of the view.
+            kwargs: Keyword arguments of the view.
+
+        Returns:
+            response(Response): View response.
+        """
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.read_alias_token is not None:
+                _read_alias.reset(self.read_alias_token)
+                self.read_alias_token = None
+
+    def initial(self, request, *args, **kwargs):
+        """
+        Assign a replica to the request once it passed authentication and checks.
+
+        Args:
+            request(Request): Client request.
+            args: Positional arguments of the view.
+            kwargs: Keyword arguments of the view.
+        """
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and PIN_COOKIE not in request.COOKIES:
+            self.read_alias_token = _read_alias.set(choose_replica())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+        Pin the client to the primary after a write.
+
+        Args:
+            request(Request): Client request.
+            response(Response): View response.
+            args: Positional arguments of the view.
+            kwargs: Keyword arguments of the view.
+
+        Returns:
+            response(Response): Finalized response.
+        """
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.IMAGES_REPLICA_PIN_SECONDS, httponly=True,
+            )
+        return super().finalize_response(request, response, *args, **kwargs)
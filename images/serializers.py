@@ -1,20 +1,185 @@
+import os
 import tempfile
 
-import requests
+from django.conf import settings
+from django.utils.encoding import filepath_to_uri
+from django.utils.functional import cached_property
+from images.imaging import open_image
 from images.mixins import ImageHandlerMixin
-from images.models import Image
-from PIL import Image as PILImage
+from images.models import Image, TilePyramid, UploadSession
 from PIL import UnidentifiedImageError
 from rest_framework.exceptions import ValidationError
-from rest_framework.fields import CharField, ImageField, IntegerField
-from rest_framework.serializers import ModelSerializer, Serializer
+from rest_framework.fields import BooleanField, CharField, FloatField, ImageField, IntegerField
+from rest_framework.serializers import BaseSerializer, ModelSerializer, Serializer
+
+IMAGE_FIELDS = ('id', 'name', 'url', 'picture', 'width', 'height', 'parent_picture')
+IMAGE_ROW_FIELDS = ('id', 'url', 'picture', 'picture_width', 'picture_height', 'parent_picture')
+
+
+def parse_image_ids(ids, max_count):
+    """
+    Parse comma separated image ids, dropping repeated ones.
+
+    Args:
+        ids(str): Comma separated ids.
+        max_count(int): Maximum count of ids.
+
+    Returns:
+        ids(list): Unique ids in the given order.
+
+    Raises:
+        ValidationError: If an id is not a number or there are more than `max_count` of them.
+    """
+    try:
+        parsed = [int(image_id) for image_id in ids.split(',') if image_id.strip()]
+    except ValueError:
+        raise ValidationError('Ids must be comma separated numbers.')
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed or len(parsed) > max_count:
+        raise ValidationError('Pass between 1 and {0} ids.'.format(max_count))
+    return parsed
 
 
 class ImageSerializer(ModelSerializer):
 
     class Meta:  # Noqa: WPS306
         model = Image
-        fields = ['id', 'name', 'url', 'picture', 'width', 'height', 'parent_picture']
+        fields = list(IMAGE_FIELDS)
+
+
+class ImageRowSerializer(BaseSerializer):
+    """
+    Read only serializer of `Image.objects.values(*IMAGE_ROW_FIELDS)` rows.
+
+    The output is identical to `ImageSerializer`, but no model instances
+    are built, the picture URL prefix is resolved once per serializer and
+    dimensions come from the stored columns instead of opening the file.
+    Fields missing from `fields` are not computed at all.
+    """
+
+    def __init__(self, *args, fields=IMAGE_FIELDS, **kwargs):
+        """
+        Select the serialized fields.
+
+        Args:
+            args: Positional arguments of the inherited constructor.
+            fields(tuple): Names out of `IMAGE_FIELDS`, in output order.
+            kwargs: Keyword arguments of the inherited constructor.
+        """
+        self.selected_fields = fields
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def row(cls, image):
+        """
+        Convert an already loaded instance into a row.
+
+        Args:
+            image(models.Image): Image instance.
+
+        Returns:
+            row(dict): Values of `IMAGE_ROW_FIELDS`.
+        """
+        return {
+            'id': image.pk,
+            'url': image.url,
+            'picture': image.picture.name,
+            'picture_width': image.picture_width,
+            'picture_height': image.picture_height,
+            'parent_picture': image.parent_picture_id,
+        }
+
+    @cached_property
+    def picture_url_prefix(self):
+        """
+        Resolve the absolute URL of the picture storage root.
+
+        Returns:
+            prefix(str): URL every picture name is appended to.
+        """
+        base_url = Image._meta.get_field('picture').storage.base_url  # Noqa: WPS437
+        request = self.context.get('request')
+        if request is None:
+            return base_url
+        return request.build_absolute_uri(base_url)
+
+    def to_representation(self, row):
+        """
+        Serialize an image row.
+
+        Args:
+            row(dict): Values of `IMAGE_ROW_FIELDS`.
+
+        Returns:
+            representation(dict): Same fields as `ImageSerializer` gives.
+        """
+        fields = self.selected_fields
+        width = row['picture_width']
+        height = row['picture_height']
+        dimensions_needed = 'width' in fields or 'height' in fields
+        if dimensions_needed and (width is None or height is None):
+            image = Image(pk=row['id'], picture=row['picture'])
+            width, height = image.width, image.height
+        representation = {
+            'id': row['id'],
+            'name': os.path.basename(row['picture']),
+            'url': row['url'],
+            'picture': self.picture_url_prefix + filepath_to_uri(row['picture']),
+            'width': width,
+            'height': height,
+            'parent_picture': row['parent_picture'],
+        }
+        if fields is IMAGE_FIELDS:
+            return representation
+        return {field: representation[field] for field in fields}
+
+
+class SparseFieldsSerializer(Serializer):
+
+    fields = CharField(required=False)  # Noqa: WPS110
+    omit = CharField(required=False)
+
+    def parse_names(self, names, parameter):
+        """
+        Split a comma separated list of image field names.
+
+        Args:
+            names(str): Comma separated names.
+            parameter(str): Query parameter name for the error message.
+
+        Returns:
+            names(set): Field names.
+
+        Raises:
+            ValidationError: If a name is not an image field.
+        """
+        parsed = {name.strip() for name in names.split(',') if name.strip()}
+        unknown = parsed.difference(IMAGE_FIELDS)
+        if unknown:
+            raise ValidationError({parameter: ['Unknown fields: {0}. Choose from {1}.'.format(
+                ', '.join(sorted(unknown)), ', '.join(IMAGE_FIELDS),
+            )]})
+        return parsed
+
+    def validate(self, parameters):
+        """
+        Resolve the image fields to serialize.
+
+        Args:
+            parameters(dict): `fields` and `omit` query parameters.
+
+        Returns:
+            parameters(dict): Parameters with `selected_fields` in output order.
+        """
+        selected_fields = IMAGE_FIELDS
+        if 'fields' in parameters:
+            names = self.parse_names(parameters['fields'], 'fields')
+            selected_fields = tuple(field for field in IMAGE_FIELDS if field in names)
+        if 'omit' in parameters:
+            names = self.parse_names(parameters['omit'], 'omit')
+            selected_fields = tuple(field for field in selected_fields if field not in names)
+        parameters['selected_fields'] = selected_fields
+        return parameters
 
 
 class CreateImageSerializer(ImageHandlerMixin, Serializer):
@@ -35,13 +200,19 @@ class CreateImageSerializer(ImageHandlerMixin, Serializer):
         Raises:
             ValidationError: If `image_source` doesn't provide any source
                 or provides more than 1 source.
+
+        With `IMAGES_INGEST_PIPELINED` or `IMAGES_ORIGIN_CACHE_ENABLED` the url is
+        validated while it is fetched.
         """
         two_sources = image_source.get('url') and image_source.get('file')
         if not image_source or two_sources:
             raise ValidationError({'error': "You need to provide 'url' or 'file' parameter."})
         if not image_source or two_sources:
             raise ValidationError({'error': "You need to provide 'url' or 'file' parameter."})
-        if image_source.get('url'):
+        validated_on_fetch = (
+            settings.IMAGES_INGEST_PIPELINED or settings.IMAGES_ORIGIN_CACHE_ENABLED
+        )
+        if image_source.get('url') and not validated_on_fetch:
             self.url_validation(image_source.get('url'))
             self.file_from_url_validation(image_source.get('url'))
         return image_source
@@ -56,6 +227,8 @@ class CreateImageSerializer(ImageHandlerMixin, Serializer):
         Raises:
             ValidationError: If it's not possible to download an image from `url`.
         """
+        import requests  # Noqa: WPS433
+
         response = requests.get(url)
         message = {
             'error': "Can't download from this url. Download request returned {0} status code.".
@@ -84,7 +257,7 @@ class CreateImageSerializer(ImageHandlerMixin, Serializer):
         with tempfile.NamedTemporaryFile() as tmp_file:
             downloaded_file = self.download_from_url(url, tmp_file)
             try:
-                PILImage.open(downloaded_file)
+                open_image(downloaded_file)
             except UnidentifiedImageError:
                 raise ValidationError(message)
 
@@ -93,6 +266,7 @@ class ResizeImageSerializer(Serializer):
 
     width = IntegerField(required=False)
     height = IntegerField(required=False)
+    max_bytes = IntegerField(required=False, min_value=1)
 
     def validate(self, size_parameters):
         """
@@ -108,7 +282,7 @@ class ResizeImageSerializer(Serializer):
             ValidationError: If `size_parameters` doesn't provide any parameters.
             ValidationError: If `size_parameters` provides width or height less than 1.
         """
-        if not size_parameters:
+        if not size_parameters.keys() - {'max_bytes'}:
             message = {
                 'error': "You need to provide at least 'width' or 'height' parameter.",
             }
@@ -128,3 +302,124 @@ class ResizeImageSerializer(Serializer):
                 }
                 raise ValidationError(message)
         return size_parameters
+
+
+class UploadSessionSerializer(ModelSerializer):
+
+    received_bytes = IntegerField(read_only=True)
+    is_complete = BooleanField(read_only=True)
+
+    class Meta:  # Noqa: WPS306
+        model = UploadSession
+        fields = [
+            'id', 'filename', 'size', 'sha256', 'received_ranges', 'received_bytes', 'is_complete',
+            'created_at',
+        ]
+
+    def validate_size(self, size):
+        """
+        Validate declared upload size.
+
+        Args:
+            size(int): Upload size in bytes.
+
+        Returns:
+            size(int): Validated upload size.
+
+        Raises:
+            ValidationError: If `size` is 0 or exceeds `IMAGES_UPLOAD_MAX_SIZE`.
+        """
+        if not 0 < size <= settings.IMAGES_UPLOAD_MAX_SIZE:
+            raise ValidationError(
+                "'size' must be between 1 and {0} bytes.".format(settings.IMAGES_UPLOAD_MAX_SIZE),
+            )
+        return size
+
+
+class TilePyramidSerializer(ModelSerializer):
+
+    progress = FloatField(read_only=True)
+
+    class Meta:  # Noqa: WPS306
+        model = TilePyramid
+        fields = [
+            'status', 'progress', 'levels_done', 'levels_total', 'tile_size', 'overlap',
+            'tile_format', 'width', 'height', 'error',
+        ]
+
+
+class ExportImagesSerializer(SparseFieldsSerializer):
+
+    after = IntegerField(required=False, default=0, min_value=0)
+
+
+class DownloadImagesSerializer(Serializer):
+
+    ids = CharField()
+
+    def validate_ids(self, ids):
+        """
+        Parse comma separated image ids.
+
+        Args:
+            ids(str): Comma separated ids.
+
+        Returns:
+            ids(list): Unique ids in ascending order.
+        """
+        return sorted(parse_image_ids(ids, settings.IMAGES_DOWNLOAD_MAX_IMAGES))
+
+
+class SpriteSerializer(Serializer):
+
+    ids = CharField()
+    cell = IntegerField(
+        required=False,
+        default=settings.IMAGES_SPRITE_CELL_SIZE,
+        min_value=1,
+        max_value=settings.IMAGES_SPRITE_MAX_CELL_SIZE,
+    )
+    version = CharField(required=False)
+
+    def validate_ids(self, ids):
+        """
+        Parse comma separated image ids.
+
+        Args:
+            ids(str): Comma separated ids.
+
+        Returns:
+            ids(list): Unique ids in the given order.
+        """
+        return parse_image_ids(ids, settings.IMAGES_SPRITE_MAX_IMAGES)
+
+
+class CropImageSerializer(Serializer):
+
+    left = IntegerField(min_value=0)
+    top = IntegerField(min_value=0)
+    right = IntegerField(min_value=1)
+    bottom = IntegerField(min_value=1)
+    width = IntegerField(required=False, min_value=1)
+    height = IntegerField(required=False, min_value=1)
+
+    def validate(self, crop_parameters):
+        """
+        Validate crop box.
+
+        Args:
+            crop_parameters(dict): Crop box and optional output size.
+
+        Returns:
+            crop_parameters(dict): Validated crop parameters.
+
+        Raises:
+            ValidationError: If the box is empty.
+        """
+        empty_width = crop_parameters['right'] <= crop_parameters['left']
+        if empty_width or crop_parameters['bottom'] <= crop_parameters['top']:
+            message = {
+                'error': "'right' and 'bottom' must be greater than 'left' and 'top'.",
+            }
+            raise ValidationError(message)
+        return crop_parameters
@@ -0,0 +1,104 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from images import metrics
+
+LOCK_KEY_PREFIX = 'images:render'
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def redis_client():
+    """
+    Get the Redis client behind the default cache.
+
+    Returns:
+        client(redis.Redis): Master client or None if the cache is not Redis.
+    """
+    get_master_client = getattr(cache, 'get_master_client', None)
+    if get_master_client is None:
+        return None
+    return get_master_client()
+
+
+class RenderLock(object):
+    """
+    Lock in the default cache backend shared by all workers and nodes.
+
+    The lock expires after `IMAGES_RENDER_LOCK_TTL`, so a crashed holder
+    can't block a variant forever. Every holder gets a unique token and
+    releases the lock only while it still holds it.
+
+    On Redis the token is compared and deleted in one script. Other backends
+    get and delete in two steps, so a lock expiring in between could release
+    another worker's lock: there `IMAGES_RENDER_LOCK_TTL` must exceed the
+    longest render.
+    """
+
+    def __init__(self, *key_parts):
+        self.key = ':'.join((LOCK_KEY_PREFIX, *map(str, key_parts)))
+        self.token = uuid.uuid4().hex
+
+    def acquire(self):
+        """
+        Try to take the lock without waiting.
+
+        Returns:
+            acquired(bool): Whether the lock is taken.
+        """
+        client = redis_client()
+        if client is None:
+            return cache.add(self.key, self.token, settings.IMAGES_RENDER_LOCK_TTL)
+        return bool(client.set(
+            str(cache.make_key(self.key)), self.token, nx=True, ex=settings.IMAGES_RENDER_LOCK_TTL,
+        ))
+
+    def release(self):
+        """Release the lock unless it has expired and been taken by another worker."""
+        client = redis_client()
+        if client is not None:
+            client.eval(RELEASE_SCRIPT, 1, str(cache.make_key(self.key)), self.token)
+        elif cache.get(self.key) == self.token:
+            cache.delete(self.key)
+
+
+def single_flight(lock, render, find_result):
+    """
+    Run `render` in one worker at a time, letting the others reuse its result.
+
+    A worker which doesn't get the lock polls `find_result` until the lock
+    holder is done. If nothing appears within `IMAGES_RENDER_LOCK_WAIT`, or the
+    lock is freed without a result, the worker renders on its own.
+
+    Args:
+        lock(RenderLock): Lock of the rendered result.
+        render(callable): Callback rendering the result.
+        find_result(callable): Callback returning the rendered result or None.
+
+    Returns:
+        result: Rendered or reused result.
+    """
+    deadline = time.monotonic() + settings.IMAGES_RENDER_LOCK_WAIT
+    while not lock.acquire():
+        if time.monotonic() >= deadline:
+            metrics.increment('single_flight.timeouts')
+            return render()
+        time.sleep(settings.IMAGES_RENDER_LOCK_POLL_INTERVAL)
+        found = find_result()
+        if found is not None:
+            metrics.increment('single_flight.waited')
+            return found
+    try:
+        found = find_result()
+        if found is not None:
+            return found
+        metrics.increment('single_flight.rendered')
+        return render()
+    finally:
+        lock.release()
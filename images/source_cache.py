@@ -0,0 +1,219 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from images import metrics
+from images.imaging import open_image
+
+REDUCING_FACTORS = (8, 4, 2)
+WIDE_MODES = frozenset(('I', 'F', 'I;16', 'I;16B', 'I;16L'))
+
+
+class DecodedImageCache(object):
+    """LRU cache of decoded images bounded by the total size of their pixel buffers."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a cached image and mark it as recently used.
+
+        Args:
+            key(tuple): Cache key.
+
+        Returns:
+            entry(tuple): Decoded image and its format, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                metrics.increment('source_cache.misses')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        metrics.increment('source_cache.hits')
+        return entry[:2]
+
+    def put(self, key, image, image_format):
+        """
+        Cache a decoded image, evicting the least recently used ones to fit the budget.
+
+        Args:
+            key(tuple): Cache key.
+            image(PIL.Image.Image): Decoded image.
+            image_format(str): Format of the source file.
+        """
+        entry_size = pixel_bytes(image)
+        if entry_size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self._entries[key] = (image, image_format, entry_size)
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted[2]
+                self.evictions += 1
+                metrics.increment('source_cache.evictions')
+
+    def stats(self):
+        """
+        Describe the cache state.
+
+        Returns:
+            stats(dict): Hit, miss and eviction counters, entries count and size in bytes.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size': self.size,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        """Drop all cached images and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+source_cache = DecodedImageCache(settings.IMAGES_SOURCE_CACHE_MAX_BYTES)
+
+
+def pixel_bytes(image):
+    """
+    Estimate the size of the decoded pixel buffer of `image`.
+
+    Args:
+        image(PIL.Image.Image): Decoded image.
+
+    Returns:
+        size(int): Size in bytes.
+    """
+    bytes_per_band = 4 if image.mode in WIDE_MODES else 1
+    return image.width * image.height * len(image.getbands()) * bytes_per_band
+
+
+def define_reducing_factor(image_object, size):
+    """
+    Define how much the source may be shrunk before caching and still cover `size`.
+
+    Args:
+        image_object(models.Image): Source Image.
+        size(tuple): Target width and height.
+
+    Returns:
+        factor(int): Reducing factor, 1 means full size.
+    """
+    if not settings.IMAGES_SOURCE_CACHE_PREREDUCE or not image_object.picture_width:
+        return 1
+    width, height = size
+    for factor in REDUCING_FACTORS:
+        reduced_width = image_object.picture_width // factor
+        reduced_height = image_object.picture_height // factor
+        if reduced_width >= width and reduced_height >= height:
+            return factor
+    return 1
+
+
+def decode(image_object, factor):
+    """
+    Decode the picture of `image_object`, shrinking it by `factor`.
+
+    JPEG files are decoded straight at the reduced scale.
+
+    Args:
+        image_object(models.Image): Source Image.
+        factor(int): Reducing factor.
+
+    Returns:
+        source(tuple): Decoded image and format of the source file.
+    """
+    with image_object.picture.open('rb') as picture_file:
+        image = open_image(picture_file)
+        image_format = image.format
+        if factor > 1:
+            image.draft(image.mode, (image.width // factor, image.height // factor))
+        image.load()
+    if factor > 1:
+        remaining_factor = image.width // (image_object.picture_width // factor)
+        if remaining_factor > 1:
+            image = image.reduce(remaining_factor)
+    return image, image_format
+
+
+def cache_key(image_object, factor):
+    """
+    Define the cache key of the picture of `image_object` decoded with `factor`.
+
+    Args:
+        image_object(models.Image): Source Image.
+        factor(int): Reducing factor.
+
+    Returns:
+        key(tuple): Image id, file modification time and reducing factor.
+    """
+    storage = image_object.picture.storage
+    return (
+        image_object.pk,
+        storage.get_modified_time(image_object.picture.name).timestamp(),
+        factor,
+    )
+
+
+def seed(image_object, image, image_format):
+    """
+    Cache a picture decoded elsewhere, e.g. while it was being downloaded.
+
+    Args:
+        image_object(models.Image): Image the picture belongs to.
+        image(PIL.Image.Image): Full size decoded picture.
+        image_format(str): Format of the picture file.
+    """
+    if settings.IMAGES_SOURCE_CACHE_ENABLED:
+        source_cache.put(cache_key(image_object, 1), image, image_format)
+
+
+@contextmanager
+def open_source(image_object, size):
+    """
+    Open the picture of `image_object` for resizing to `size`.
+
+    When the cache is enabled decoded pictures are kept between calls, keyed by
+    image id, file modification time and reducing factor.
+
+    Args:
+        image_object(models.Image): Source Image.
+        size(tuple): Target width and height.
+
+    Yields:
+        source(tuple): PIL image and format of the source file.
+    """
+    if not settings.IMAGES_SOURCE_CACHE_ENABLED:
+        with open_image(image_object.picture.open('rb')) as image:
+            yield image, image.format
+        return
+    factor = define_reducing_factor(image_object, size)
+    key = cache_key(image_object, factor)
+    entry = source_cache.get(key)
+    if entry is None:
+        entry = decode(image_object, factor)
+        source_cache.put(key, *entry)
+    yield entry
@@ -0,0 +1,206 @@
+import hashlib
+import io
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from images import metrics
+from images.admission import pixel_budget
+from images.imaging import REDUCING_GAP, has_alpha
+from images.models import Image
+from images.source_cache import open_source
+from PIL import Image as PILImage
+from rest_framework.exceptions import ValidationError
+
+SPRITE_VERSION = 1
+
+
+def fit_size(width, height, cell):
+    """
+    Scale a picture down to fit into a square cell, keeping its proportions.
+
+    Args:
+        width(int): Picture width.
+        height(int): Picture height.
+        cell(int): Cell side.
+
+    Returns:
+        size(tuple): Thumbnail width and height, never upscaled.
+    """
+    scale = min(cell / width, cell / height, 1)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def grid(count):
+    """
+    Lay out `count` cells in a nearly square grid.
+
+    Args:
+        count(int): Cells count.
+
+    Returns:
+        grid(tuple): Columns and rows.
+    """
+    columns = math.ceil(math.sqrt(count))
+    return columns, math.ceil(count / columns)
+
+
+def sprite_version(images, cell):
+    """
+    Fingerprint a sprite sheet by its cells and the pictures they show.
+
+    Args:
+        images(list): Image objects in sheet order.
+        cell(int): Cell side.
+
+    Returns:
+        version(str): Hex digest changing with any input of the sheet.
+    """
+    digest = hashlib.sha256('{0}:{1}'.format(SPRITE_VERSION, cell).encode())
+    for image_object in images:
+        digest.update(';{0}:{1}:{2}:{3}'.format(
+            image_object.pk,
+            image_object.picture.name,
+            image_object.picture_size,
+            image_object.content_hash,
+        ).encode())
+    return digest.hexdigest()[:32]
+
+
+def sprite_cache_key(version):
+    """
+    Define the cache key of a rendered sprite sheet.
+
+    Args:
+        version(str): Sprite version.
+
+    Returns:
+        key(str): Cache key.
+    """
+    return 'images:sprite:{0}'.format(version)
+
+
+def compose_sprite(image_ids, cell):
+    """
+    Compose images into a sprite sheet, reusing a cached sheet when possible.
+
+    Args:
+        image_ids(list): Image ids in sheet order.
+        cell(int): Cell side.
+
+    Returns:
+        sprite(tuple): Sheet version and dict with encoded `content`, `format`,
+            sheet `width` and `height` and `cells` coordinates.
+
+    Raises:
+        ValidationError: If some ids don't exist.
+    """
+    found = Image.objects.in_bulk(image_ids)
+    missing = [image_id for image_id in image_ids if image_id not in found]
+    if missing:
+        raise ValidationError({'ids': ['Unknown image ids: {0}.'.format(
+            ', '.join(str(image_id) for image_id in missing),
+        )]})
+    images = [found[image_id] for image_id in image_ids]
+    version = sprite_version(images, cell)
+    sprite = cache.get(sprite_cache_key(version))
+    if sprite is not None:
+        metrics.increment('sprites.cached')
+        return version, sprite
+    sources = select_sprite_sources(images, cell)
+    pixels = sum(
+        (source.picture_width or cell) * (source.picture_height or cell) for source in sources
+    ) + len(images) * cell * cell
+    with pixel_budget.admit(pixels):
+        sprite = render_sprite(images, sources, cell)
+    cache.set(sprite_cache_key(version), sprite, settings.IMAGES_SPRITE_CACHE_TTL)
+    metrics.increment('sprites.rendered')
+    return version, sprite
+
+
+def select_sprite_sources(images, cell):
+    """
+    Pick the smallest stored picture of each image still covering its cell.
+
+    Only direct plain resizes are looked at, all of them with a single query.
+
+    Args:
+        images(list): Image objects in sheet order.
+        cell(int): Cell side.
+
+    Returns:
+        sources(list): Image objects to decode, in sheet order.
+    """
+    variants = {}
+    for variant in Image.objects.filter(parent_picture__in=[image.pk for image in images]):
+        if variant.is_plain_resize:
+            variants.setdefault(variant.parent_picture_id, []).append(variant)
+    sources = []
+    for image_object in images:
+        if not image_object.picture_width or not image_object.picture_height:
+            sources.append(image_object)
+            continue
+        size = fit_size(image_object.picture_width, image_object.picture_height, cell)
+        candidates = [
+            variant
+            for variant in variants.get(image_object.pk, [])
+            if variant.is_sufficient_source(image_object, *size)
+        ]
+        sources.append(min(
+            [image_object, *candidates],
+            key=lambda candidate: candidate.picture_width * candidate.picture_height,
+        ))
+    return sources
+
+
+def render_sprite(images, sources, cell):
+    """
+    Scale pictures into the cells of a sheet, row by row, and encode it.
+
+    Thumbnails are placed in the top left corner of their cells. The sheet
+    is a PNG if any picture is transparent and a JPEG otherwise.
+
+    Args:
+        images(list): Image objects in sheet order.
+        sources(list): Pictures to decode for `images`.
+        cell(int): Cell side.
+
+    Returns:
+        sprite(dict): Encoded sheet with its format, size and cells coordinates.
+    """
+    columns, rows = grid(len(images))
+    thumbnails = []
+    transparent = False
+    for image_object, source_object in zip(images, sources):
+        stored_size = (image_object.picture_width, image_object.picture_height)
+        size = fit_size(*stored_size, cell) if all(stored_size) else (cell, cell)
+        with open_source(source_object, size) as (image, _):
+            if not all(stored_size):
+                size = fit_size(image.width, image.height, cell)
+            transparent = transparent or has_alpha(image)
+            if image.mode not in {'RGB', 'RGBA'}:
+                image = image.convert('RGBA')
+            thumbnails.append(image.resize(size, reducing_gap=REDUCING_GAP))
+    sheet = PILImage.new('RGBA' if transparent else 'RGB', (columns * cell, rows * cell))
+    cells = []
+    for index, (image_object, thumbnail) in enumerate(zip(images, thumbnails)):
+        left = index % columns * cell
+        top = index // columns * cell
+        sheet.paste(thumbnail, (left, top))
+        cells.append({
+            'id': image_object.pk,
+            'x': left,
+            'y': top,
+            'width': thumbnail.width,
+            'height': thumbnail.height,
+        })
+    image_format = 'PNG' if transparent else 'JPEG'
+    output = io.BytesIO()
+    sheet.save(output, image_format, quality=settings.IMAGES_SPRITE_JPEG_QUALITY)
+    return {
+        'content': output.getvalue(),
+        'format': image_format,
+        'width': sheet.width,
+        'height': sheet.height,
+        'cells': cells,
+    }
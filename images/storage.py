@@ -0,0 +1,117 @@
+import os
+import tempfile
+
+from django.core.files.base import File
+
+TEMPORARY_SUFFIX = '.part'
+
+
+def save_encoded(storage, name, encode):
+    """
+    Encode a picture straight into `storage`.
+
+    With a local file system storage the picture is written once into a
+    temporary file next to its final location and renamed into place, so
+    nothing is copied afterwards. Other storages get a regular `save` call.
+
+    Args:
+        storage(Storage): Destination storage.
+        name(str): Desired file name.
+        encode(callable): Callback writing encoded picture into a file object.
+
+    Returns:
+        saved(tuple): Actual file name and size in bytes.
+    """
+    try:
+        storage.path(name)
+    except NotImplementedError:
+        return save_through_storage(storage, name, encode)
+    return save_in_place(storage, name, encode)
+
+
+def save_in_place(storage, name, encode):
+    """
+    Encode a picture into a temporary file next to its final path and rename it there.
+
+    Args:
+        storage(FileSystemStorage): Destination storage.
+        name(str): Desired file name.
+        encode(callable): Callback writing encoded picture into a file object.
+
+    Returns:
+        saved(tuple): Actual file name and size in bytes.
+    """
+    name, full_path = reserve_name(storage, name)
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(full_path),
+            prefix='.',
+            suffix=TEMPORARY_SUFFIX,
+            delete=False,
+        ) as tmp_file:
+            tmp_path = tmp_file.name
+            encode(tmp_file)
+        replace_file(storage, tmp_path, full_path)
+    except BaseException:
+        for path in filter(None, (tmp_path, full_path)):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return name, os.path.getsize(full_path)
+
+
+def save_through_storage(storage, name, encode):
+    """
+    Encode a picture into a spooled temporary file and hand it to `storage`.
+
+    Args:
+        storage(Storage): Destination storage without local paths.
+        name(str): Desired file name.
+        encode(callable): Callback writing encoded picture into a file object.
+
+    Returns:
+        saved(tuple): Actual file name and size in bytes.
+    """
+    with tempfile.SpooledTemporaryFile() as tmp_file:
+        encode(tmp_file)
+        tmp_file.seek(0)
+        name = storage.save(name, File(tmp_file, name=name))
+    return name, storage.size(name)
+
+
+def reserve_name(storage, name):
+    """
+    Atomically create an empty placeholder under a free name.
+
+    Args:
+        storage(FileSystemStorage): Destination storage.
+        name(str): Desired file name.
+
+    Returns:
+        reserved(tuple): Reserved file name and its full path.
+    """
+    directory = os.path.dirname(storage.path(name))
+    os.makedirs(directory, mode=storage.directory_permissions_mode or 0o777, exist_ok=True)
+    while True:
+        name = storage.get_available_name(name)
+        full_path = storage.path(name)
+        try:
+            os.close(os.open(full_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+        except FileExistsError:
+            continue
+        return name, full_path
+
+
+def replace_file(storage, source_path, full_path):
+    """
+    Atomically move `source_path` over `full_path` and apply storage permissions.
+
+    Args:
+        storage(FileSystemStorage): Destination storage.
+        source_path(str): File to move.
+        full_path(str): Destination path.
+    """
+    if storage.file_permissions_mode is not None:
+        os.chmod(source_path, storage.file_permissions_mode)
+    os.replace(source_path, full_path)
@@ -0,0 +1,89 @@
+import json
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from images import metrics
+from images.admission import MEGAPIXEL, PixelBudget, ServiceOverloaded, pixel_budget
+from images.factories import ImageFactory
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(
+    IMAGES_ADMISSION_MAX_MEGAPIXELS=1,
+    IMAGES_ADMISSION_QUEUE_SIZE=1,
+    IMAGES_ADMISSION_QUEUE_TIMEOUT=0.5,
+)
+class PixelBudgetTest(SimpleTestCase):
+    """Test PixelBudget."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        self.budget = PixelBudget()
+        metrics.reset()
+
+    def test_oversized_request_runs_alone(self):
+        """Test that a request bigger than the budget is admitted into an idle process."""
+        with self.budget.admit(5 * MEGAPIXEL):
+            self.assertEqual(self.budget.in_flight, 5 * MEGAPIXEL)
+        self.assertEqual(self.budget.in_flight, 0)
+
+    def test_queued_request_is_admitted_after_release(self):
+        """Test that a waiting request starts once the budget is released."""
+        self.budget.acquire(MEGAPIXEL)
+        threading.Timer(0.1, self.budget.release, args=(MEGAPIXEL,)).start()
+        with self.budget.admit(MEGAPIXEL):
+            self.assertEqual(self.budget.in_flight, MEGAPIXEL)
+        self.assertEqual(metrics.snapshot()['counters']['admission.queued'], 1)
+
+    @override_settings(IMAGES_ADMISSION_QUEUE_SIZE=0)
+    def test_full_queue_rejects(self):
+        """Test that requests are rejected when the queue is full."""
+        self.budget.acquire(MEGAPIXEL)
+        with self.assertRaises(ServiceOverloaded):
+            self.budget.acquire(1)
+        self.assertEqual(metrics.snapshot()['counters']['admission.rejected.queue_full'], 1)
+
+    def test_queue_timeout_rejects(self):
+        """Test that requests waiting too long are rejected."""
+        self.budget.acquire(MEGAPIXEL)
+        with self.assertRaises(ServiceOverloaded):
+            self.budget.acquire(1)
+        self.assertEqual(self.budget.waiting, 0)
+        self.assertEqual(metrics.snapshot()['counters']['admission.rejected.timeout'], 1)
+
+
+@override_settings(IMAGES_ADMISSION_MAX_MEGAPIXELS=1, IMAGES_ADMISSION_QUEUE_SIZE=0)
+class AdmissionViewTest(APITestCase):
+    """Test admission control of the resize endpoint."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        metrics.reset()
+        self.image = ImageFactory.create(picture__width=100, picture__height=100)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_overloaded_resize(self):
+        """Test that a resize over the budget gets 503 with Retry-After."""
+        pixel_budget.acquire(MEGAPIXEL)
+        try:
+            response = self.client.post(
+                reverse('images-resize', kwargs={'pk': self.image.id}),
+                data=json.dumps({'width': 10}),
+                content_type='application/json',
+            )
+        finally:
+            pixel_budget.release(MEGAPIXEL)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], str(settings.IMAGES_ADMISSION_RETRY_AFTER))
+        self.assertEqual(metrics.snapshot()['counters']['admission.rejected'], 1)
@@ -0,0 +1,116 @@
+import io
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.urls import reverse
+from images.animation import save_animated
+from images.factories import ImageFactory
+from images.models import Image
+from PIL import Image as PILImage
+from PIL import ImageSequence
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+DURATIONS = (100, 120, 140, 160)
+
+
+def make_animation(image_format):
+    """
+    Build an animation with distinct frame durations.
+
+    Args:
+        image_format(str): GIF or WEBP.
+
+    Returns:
+        animation(ContentFile): Encoded animation.
+    """
+    frames = [
+        PILImage.new('RGB', (80, 60), (index * 60, 0, 255 - index * 60))
+        for index in range(len(DURATIONS))
+    ]
+    output = io.BytesIO()
+    frames[0].save(
+        output,
+        image_format,
+        save_all=True,
+        append_images=frames[1:],
+        duration=list(DURATIONS),
+        loop=2,
+    )
+    return ContentFile(output.getvalue(), name='animation.{0}'.format(image_format.lower()))
+
+
+class AnimatedResizeTest(APITestCase):
+    """Test resizing animated images."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def resize(self, image, request_payload):
+        """
+        Send resize request.
+
+        Args:
+            image(models.Image): Image to resize.
+            request_payload(dict): Resize parameters.
+
+        Returns:
+            response(Response): Resize response.
+        """
+        return self.client.post(
+            reverse('images-resize', kwargs={'pk': image.id}),
+            data=json.dumps(request_payload),
+            content_type='application/json',
+        )
+
+    def test_animation_is_preserved(self):
+        """Test that all frames, durations and loop settings survive resizing."""
+        for image_format in ('GIF', 'WEBP'):
+            image = ImageFactory.create(picture=make_animation(image_format))
+            response = self.resize(image, {'width': 40, 'height': 30})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            resized_image = Image.objects.get(pk=response.data['id'])
+            with PILImage.open(resized_image.picture.file) as animation:
+                self.assertEqual(animation.format, image_format)
+                self.assertEqual(animation.size, (40, 30))
+                self.assertEqual(animation.info['loop'], 2)
+                durations = tuple(
+                    frame.convert('RGB') and frame.info['duration']
+                    for frame in ImageSequence.Iterator(animation)
+                )
+            self.assertEqual(durations, DURATIONS)
+
+    def test_webp_frames_round_trip(self):
+        """Test that resized WebP frames keep their order and durations."""
+        output = io.BytesIO()
+        with PILImage.open(make_animation('WEBP')) as source:
+            save_animated(source, (40, 30), output)
+        with PILImage.open(output) as animation:
+            self.assertEqual(animation.n_frames, len(DURATIONS))
+            frames = [
+                (frame.convert('RGB').getpixel((20, 15)), frame.info['duration'])
+                for frame in ImageSequence.Iterator(animation)
+            ]
+        for index, (pixel, duration) in enumerate(frames):
+            self.assertEqual(duration, DURATIONS[index])
+            self.assertAlmostEqual(pixel[0], index * 60, delta=8)
+            self.assertAlmostEqual(pixel[2], 255 - index * 60, delta=8)
+
+    @override_settings(IMAGES_ANIMATION_MAX_FRAMES=3)
+    def test_animation_budget(self):
+        """Test that animations over the frame budget are rejected."""
+        image = ImageFactory.create(picture=make_animation('GIF'))
+        response = self.resize(image, {'width': 40})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'][0], 'Animation is too large to resize.')
@@ -0,0 +1,126 @@
+import io
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from images import metrics
+from images.factories import ImageFactory
+from images.mixins import ImageHandlerMixin
+from images.models import Image
+from PIL import Image as PILImage
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class CropTest(APITestCase):
+    """Test crop action."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        metrics.reset()
+        self.image = ImageFactory.create(
+            picture__width=2000, picture__height=1600, picture__filename='photo.jpg',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def crop(self, image, **payload):
+        """
+        Crop `image`.
+
+        Args:
+            image(models.Image): Image to crop.
+            payload(dict): Crop parameters.
+
+        Returns:
+            response(Response): Server response.
+        """
+        return self.client.post(
+            reverse('images-crop', kwargs={'pk': image.id}),
+            data=json.dumps(payload),
+            content_type='application/json',
+        )
+
+    def test_crop_keeps_box_size(self):
+        """Test that a crop without output size keeps the box dimensions."""
+        response = self.crop(self.image, left=10, top=20, right=110, bottom=70)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        cropped = Image.objects.get(pk=response.data['id'])
+        self.assertEqual((cropped.width, cropped.height), (100, 50))
+        self.assertEqual(cropped.parent_picture, self.image)
+        self.assertRegex(cropped.picture.name, r'^photo(_\w+)?_crop_10_20_110_70_0_0(_\w+)?\.jpg$')
+
+    @override_settings(IMAGES_MEMORY_ACCOUNTING_ENABLED=True)
+    def test_avatar_decodes_reduced_scale(self):
+        """Test that a small avatar from a large JPEG is decoded at a reduced DCT scale."""
+        response = self.crop(
+            self.image, left=0, top=0, right=1600, bottom=1600, width=100, height=100,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        cropped = Image.objects.get(pk=response.data['id'])
+        self.assertEqual((cropped.width, cropped.height), (100, 100))
+        decoded = metrics.snapshot()['observations']['memory.crop.decoded_bytes']['sum']
+        self.assertLessEqual(decoded, (250 * 200 + 100 * 100) * 3)
+
+    def test_crop_uses_variant(self):
+        """Test that a sufficient same-ratio variant is decoded instead of the original."""
+        variant = ImageFactory.create(
+            picture__width=500, picture__height=400, picture__filename='photo_500.jpg',
+            parent_picture=self.image, variant_key='resize:500x400',
+        )
+        source = ImageHandlerMixin().select_crop_source(self.image, (0, 0, 1000, 800), (200, 160))
+        self.assertEqual(source, variant)
+        source = ImageHandlerMixin().select_crop_source(self.image, (0, 0, 100, 80), (200, 160))
+        self.assertEqual(source, self.image)
+
+    def test_resize_after_crop(self):
+        """Test that a crop is never used as the source of a resize of its parent."""
+        quadrants = PILImage.new('RGB', (1000, 800), 'blue')
+        quadrants.paste('red', (0, 0, 500, 400))
+        picture = io.BytesIO()
+        quadrants.save(picture, 'JPEG')
+        root = ImageFactory.create(picture__from_file=picture, picture__filename='quadrants.jpg')
+        response = self.crop(root, left=0, top=0, right=500, bottom=400, width=250, height=200)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        cropped = Image.objects.get(pk=response.data['id'])
+
+        response = self.client.post(
+            reverse('images-resize', kwargs={'pk': root.id}),
+            data=json.dumps({'width': 200, 'height': 160}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with PILImage.open(Image.objects.get(pk=response.data['id']).picture.path) as resized:
+            self.assertEqual(resized.size, (200, 160))
+            red, _, blue = resized.getpixel((150, 120))
+            self.assertGreater(blue, red)
+
+        response = self.client.post(
+            reverse('images-resize', kwargs={'pk': cropped.id}),
+            data=json.dumps({'width': 100, 'height': 80}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        crop_resize = Image.objects.get(pk=response.data['id'])
+        with PILImage.open(crop_resize.picture.path) as resized:
+            red, _, blue = resized.getpixel((75, 60))
+            self.assertGreater(red, blue)
+        mixin = ImageHandlerMixin()
+        self.assertEqual(mixin.select_crop_source(cropped, (0, 0, 125, 100), (50, 40)), crop_resize)
+        self.assertEqual(mixin.select_crop_source(cropped, (0, 0, 50, 40), (50, 40)), cropped)
+
+    def test_invalid_box(self):
+        """Test that empty and out of bounds boxes are refused."""
+        response = self.crop(self.image, left=10, top=10, right=10, bottom=20)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.crop(self.image, left=0, top=0, right=2001, bottom=20)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'][0], 'Crop box is out of the image bounds.')
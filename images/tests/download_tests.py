@@ -0,0 +1,102 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from images.factories import ImageFactory
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(IMAGES_DOWNLOAD_CHUNK_SIZE=1024)
+class ZipDownloadTest(APITestCase):
+    """Test streaming ZIP downloads of images."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        self.original = ImageFactory.create(
+            picture__width=300, picture__height=200, picture__filename='original.jpg',
+        )
+        self.variant = ImageFactory.create(
+            parent_picture=self.original, picture__filename='raw.bmp', picture__format='BMP',
+        )
+        self.nested = ImageFactory.create(parent_picture=self.variant)
+        self.unrelated = ImageFactory.create()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def download(self, url, params=None):
+        """
+        Download an archive.
+
+        Args:
+            url(str): Requested url.
+            params(dict): Query parameters.
+
+        Returns:
+            archive(zipfile.ZipFile): Downloaded archive.
+        """
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertIsNone(archive.testzip())
+        return archive
+
+    def assert_archived(self, archive, images):
+        """
+        Check that `archive` holds exactly the files of `images`.
+
+        Args:
+            archive(zipfile.ZipFile): Downloaded archive.
+            images(list): Expected images.
+        """
+        self.assertEqual(archive.namelist(), [image.picture.name for image in images])
+        for image in images:
+            with image.picture.open('rb') as picture:
+                self.assertEqual(archive.read(image.picture.name), picture.read())
+
+    def test_download_tree(self):
+        """Test that an image is archived with all its variants, JPEG stored as is."""
+        url = reverse('images-download', kwargs={'pk': self.original.pk})
+        archive = self.download(url)
+        self.assert_archived(archive, [self.original, self.variant, self.nested])
+        self.assertEqual(
+            archive.getinfo(self.original.picture.name).compress_type, zipfile.ZIP_STORED,
+        )
+        self.assertEqual(
+            archive.getinfo(self.variant.picture.name).compress_type, zipfile.ZIP_DEFLATED,
+        )
+
+    def test_download_set(self):
+        """Test that a list of ids is archived in id order, skipping missing files."""
+        os.remove(self.nested.picture.path)
+        with self.assertLogs('images.archive', 'WARNING'):
+            archive = self.download(reverse('images-download-set'), {
+                'ids': '{0},{1},{2}'.format(self.unrelated.pk, self.nested.pk, self.original.pk),
+            })
+        self.assert_archived(archive, [self.original, self.unrelated])
+
+    def test_download_set_rejects_bad_ids(self):
+        """Test that ids are validated."""
+        for ids in ('one,two', ','):
+            response = self.client.get(reverse('images-download-set'), {'ids': ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('ids', response.data)
+
+    def test_download_not_found(self):
+        """Test downloading a missing image."""
+        response = self.client.get(reverse('images-download', kwargs={'pk': 1488228}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,119 @@
+import io
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from django.urls import reverse
+from images import metrics
+from images.encoding import BudgetMissed, encode, encode_within_budget
+from images.factories import ImageFactory
+from images.models import Image
+from PIL import Image as PILImage
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class EncodeWithinBudgetTest(SimpleTestCase):
+    """Test encode_within_budget."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        metrics.reset()
+        self.image = PILImage.effect_noise((200, 200), 40).convert('RGB')
+
+    def observed(self, name):
+        """
+        Get the last observation sum of `name`.
+
+        Args:
+            name(str): Metric name.
+
+        Returns:
+            value(float): Observed value.
+        """
+        return metrics.snapshot()['observations'][name]['sum']
+
+    def test_best_quality_under_ceiling(self):
+        """Test that the highest fitting quality is chosen."""
+        content = encode_within_budget(self.image, 'JPEG', 12000)
+        quality = self.observed('encode.budget_quality')
+        self.assertLessEqual(len(content), 12000)
+        self.assertGreater(len(encode(self.image, 'JPEG', quality + 1)), 12000)
+        self.assertGreater(self.observed('encode.budget_attempts'), 1)
+
+    def test_maximum_quality_fits(self):
+        """Test that a generous ceiling costs a single attempt."""
+        encode_within_budget(self.image, 'WEBP', 10 ** 7)
+        self.assertEqual(self.observed('encode.budget_attempts'), 1)
+        self.assertEqual(self.observed('encode.budget_quality'), settings.IMAGES_BUDGET_MAX_QUALITY)
+
+    def test_unreachable_ceiling(self):
+        """Test that a ceiling under the smallest encoding is reported with that size."""
+        with self.assertRaises(BudgetMissed) as missed:
+            encode_within_budget(self.image, 'JPEG', 100)
+        smallest = encode(self.image, 'JPEG', settings.IMAGES_BUDGET_MIN_QUALITY)
+        self.assertEqual(missed.exception.smallest_size, len(smallest))
+        self.assertEqual(metrics.snapshot()['counters']['encode.budget_missed'], 1)
+
+
+class ResizeMaxBytesTest(APITestCase):
+    """Test resize with max_bytes."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def resize(self, image, **payload):
+        """
+        Resize `image`.
+
+        Args:
+            image(models.Image): Image to resize.
+            payload(dict): Resize parameters.
+
+        Returns:
+            response(Response): Server response.
+        """
+        return self.client.post(
+            reverse('images-resize', kwargs={'pk': image.id}),
+            data=json.dumps(payload),
+            content_type='application/json',
+        )
+
+    def test_variant_fits_ceiling(self):
+        """Test that the variant file fits into max_bytes and is a separate variant."""
+        noise = io.BytesIO()
+        PILImage.effect_noise((600, 400), 40).convert('RGB').save(noise, 'JPEG', quality=95)
+        image = ImageFactory.create(picture__from_file=noise, picture__filename='noise.jpg')
+        plain = self.resize(image, width=300, height=200).data['id']
+        self.assertGreater(Image.objects.get(pk=plain).picture.size, 8000)
+        response = self.resize(image, width=300, height=200, max_bytes=8000)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(response.data['id'], plain)
+        self.assertLessEqual(Image.objects.get(pk=response.data['id']).picture.size, 8000)
+
+    def test_unreachable_ceiling(self):
+        """Test that a ceiling no quality can meet is refused without storing a variant."""
+        image = ImageFactory.create(picture__width=400, picture__height=300)
+        response = self.resize(image, width=300, height=200, max_bytes=500)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('smallest variant takes', response.data['error'][0])
+        self.assertFalse(Image.objects.filter(parent_picture=image).exists())
+
+    def test_unsupported(self):
+        """Test that lossless formats and invalid ceilings are refused."""
+        image = ImageFactory.create(
+            picture__width=60, picture__height=40, picture__format='PNG', picture__filename='a.png',
+        )
+        response = self.resize(image, width=30, max_bytes=1000)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.resize(image, width=30, max_bytes=0)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,132 @@
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.utils import timezone
+from images import metrics
+from images.eviction import evict_variants, variants_disk_usage
+from images.factories import ImageFactory
+from images.mixins import ImageHandlerMixin
+from images.models import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class VariantEvictionTest(APITestCase):
+    """Test disk budget of derived variants."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        metrics.reset()
+        self.original = ImageFactory.create(picture__width=200, picture__height=100)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def resize(self, image, width, height):
+        """
+        Resize `image` through the API.
+
+        Args:
+            image(models.Image): Image to resize.
+            width(int): Target width.
+            height(int): Target height.
+
+        Returns:
+            image_id(int): Id of the returned variant.
+        """
+        response = self.client.post(
+            reverse('images-resize', kwargs={'pk': image.id}),
+            data=json.dumps({'width': width, 'height': height}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def make_variant(self, parent, size, minutes_ago):
+        """
+        Create a variant accessed `minutes_ago`.
+
+        Args:
+            parent(models.Image): Parent Image.
+            size(int): Recorded file size.
+            minutes_ago(int): Age of the last access.
+
+        Returns:
+            variant(models.Image): New variant.
+        """
+        variant = ImageFactory.create(
+            parent_picture=parent, picture__width=10, picture__height=10,
+        )
+        Image.objects.filter(pk=variant.pk).update(
+            picture_size=size, last_accessed=timezone.now() - timedelta(minutes=minutes_ago),
+        )
+        return variant
+
+    def test_resize_reuses_variant(self):
+        """Test that resizing twice returns the same variant and re-renders after eviction."""
+        first = self.resize(self.original, 50, 25)
+        self.assertEqual(self.resize(self.original, 50, 25), first)
+        self.assertNotEqual(self.resize(self.original, 40, 20), first)
+        evict_variants(0)
+        self.assertEqual(list(Image.objects.all()), [self.original])
+        second = self.resize(self.original, 50, 25)
+        self.assertNotEqual(second, first)
+        self.assertTrue(Image.objects.get(pk=second).picture.size)
+
+    def test_lru_order(self):
+        """Test that the coldest variants go first and the original stays."""
+        cold = self.make_variant(self.original, 100, 30)
+        warm = self.make_variant(self.original, 100, 20)
+        hot = self.make_variant(self.original, 100, 10)
+        self.client.get(reverse('images-detail', kwargs={'pk': warm.pk}))
+        self.assertEqual(evict_variants(150), (2, 200))
+        self.assertEqual(set(Image.objects.all()), {self.original, warm})
+        self.assertFalse(Image.objects.filter(pk__in=[cold.pk, hot.pk]).exists())
+        self.assertEqual(variants_disk_usage(), 100)
+
+    def test_parents_outlive_children(self):
+        """Test that a variant with its own variants is evicted only after them."""
+        parent = self.make_variant(self.original, 100, 30)
+        child = self.make_variant(parent, 100, 10)
+        self.assertEqual(evict_variants(100), (1, 100))
+        self.assertEqual(set(Image.objects.all()), {self.original, parent})
+        self.assertFalse(Image.objects.filter(pk=child.pk).exists())
+
+    def test_source_evicted_before_render(self):
+        """Test that a resize falls back on the original when its source variant is evicted."""
+        cached = Image.objects.get(pk=self.resize(self.original, 100, 50))
+        select_resize_source = ImageHandlerMixin.select_resize_source
+
+        def select_then_evict(viewset, *args):
+            source = select_resize_source(viewset, *args)
+            self.assertEqual(source, cached)
+            evict_variants(budget=0)
+            return source
+
+        with mock.patch.object(ImageHandlerMixin, 'select_resize_source', select_then_evict):
+            resized = Image.objects.get(pk=self.resize(self.original, 40, 20))
+        self.assertFalse(Image.objects.filter(pk=cached.pk).exists())
+        self.assertEqual(resized.parent_picture, self.original)
+        self.assertEqual((resized.picture_width, resized.picture_height), (40, 20))
+        self.assertEqual(metrics.snapshot()['counters']['resize.source_evicted'], 1)
+
+    def test_command(self):
+        """Test that the command enforces the passed budget."""
+        self.make_variant(self.original, 100, 10)
+        output = io.StringIO()
+        call_command('evict_variants', budget=1, stdout=output)
+        self.assertIn('Evicted 1 variants, 100 bytes.', output.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('evict_variants', budget=0)
@@ -0,0 +1,66 @@
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from images.export import NDJSON_CONTENT_TYPE
+from images.factories import ImageFactory
+from images.models import Image
+from images.serializers import ImageSerializer
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(IMAGES_EXPORT_CHUNK_SIZE=2)
+class CatalogExportTest(APITestCase):
+    """Test NDJSON export of all images."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        self.images = ImageFactory.create_batch(5)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def export(self, **params):
+        """
+        Export images and parse the lines.
+
+        Args:
+            params: Query parameters.
+
+        Returns:
+            exported(tuple): Response and parsed lines.
+        """
+        response = self.client.get(reverse('images-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], NDJSON_CONTENT_TYPE)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.endswith(b'\n'))
+        return response, [json.loads(line) for line in content.splitlines()]
+
+    def test_export_all(self):
+        """Test that every image is exported in id order as the API shows it."""
+        response, lines = self.export()
+        expected = ImageSerializer(
+            Image.objects.order_by('pk'), many=True, context={'request': response.wsgi_request},
+        ).data
+        self.assertEqual(lines, json.loads(json.dumps(expected)))
+
+    def test_export_resumes_after_id(self):
+        """Test that an interrupted export continues after the last received id."""
+        _, lines = self.export(after=self.images[1].pk)
+        self.assertEqual([line['id'] for line in lines], [image.pk for image in self.images[2:]])
+
+    def test_export_rejects_bad_resume_id(self):
+        """Test that the resume id is validated."""
+        response = self.client.get(reverse('images-export'), {'after': 'last'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('after', response.data)
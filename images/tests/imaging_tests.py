@@ -0,0 +1,71 @@
+import io
+import os
+import subprocess  # Noqa: S404
+import sys
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from images.imaging import open_image, preload_formats, sniff_format, whitelisted_formats
+from PIL import Image as PILImage
+from PIL import UnidentifiedImageError
+
+PRELOAD_CHECK = '''
+import sys
+import django
+django.setup()
+from images.imaging import open_image
+from PIL import UnidentifiedImageError
+try:
+    open_image(__import__('io').BytesIO(b'not an image'))
+except UnidentifiedImageError:
+    pass
+print(sorted(name for name in sys.modules if name.endswith('ImagePlugin')))
+'''
+
+
+class ImagingTest(SimpleTestCase):
+    """Test Pillow plugin preselection."""
+
+    def test_open_image_tries_only_whitelisted_formats(self):
+        """Test that formats out of the whitelist are not identified."""
+        output = io.BytesIO()
+        PILImage.new('RGB', (4, 4)).save(output, 'GIF')
+        with override_settings(IMAGES_PIL_FORMATS=('JPEG', 'PNG')):
+            with self.assertRaises(UnidentifiedImageError):
+                open_image(output)
+            self.assertIsNone(sniff_format(output.getvalue()))
+        self.assertEqual(open_image(output).format, 'GIF')
+
+    def test_whitelist_names(self):
+        """Test that format names are case insensitive and unknown ones are reported."""
+        with override_settings(IMAGES_PIL_FORMATS=('jpeg', ' png')):
+            self.assertEqual(whitelisted_formats(), ('JPEG', 'PNG'))
+        with override_settings(IMAGES_PIL_FORMATS=('JPEG', 'jpg')):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'JPG, valid names are BMP, GIF'):
+                preload_formats()
+        with override_settings(IMAGES_PIL_FORMATS=('JPEG', 'GIF')):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'must include PNG'):
+                preload_formats()
+
+    def test_preload_formats_skips_other_plugins(self):
+        """Test that a fresh worker loads only whitelisted plugins."""
+        environment = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='config.settings',
+            DEBUG='False',
+            IMAGES_PIL_FORMATS='JPEG,PNG,WEBP',
+        )
+        completed = subprocess.run(  # Noqa: S603
+            [sys.executable, '-c', PRELOAD_CHECK],
+            cwd=settings.BASE_DIR,
+            env=environment,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        loaded_plugins = completed.stdout.strip()
+        self.assertIn('PIL.JpegImagePlugin', loaded_plugins)
+        self.assertNotIn('PIL.TiffImagePlugin', loaded_plugins)
+        self.assertIn('PIL.WebPImagePlugin', loaded_plugins)
+        self.assertNotIn('PIL.IcoImagePlugin', loaded_plugins)
@@ -0,0 +1,115 @@
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from images import metrics
+from images.admission import pixel_budget
+from images.ingest import IncrementalDecoder
+from images.models import Image
+from images.source_cache import source_cache
+from images.tests.origin_stub import OriginStubMixin, render_image
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+
+
+class IncrementalDecoderTest(SimpleTestCase):
+    """Test IncrementalDecoder."""
+
+    def test_size_known_before_body_ends(self):
+        """Test that dimensions are parsed from the first chunk of a large image."""
+        content = render_image(2000, 1500, 'jpg')
+        with IncrementalDecoder() as decoder:
+            decoder.feed(content[:4096])
+            self.assertEqual(decoder.size, (2000, 1500))
+            self.assertEqual(decoder.image_format, 'JPEG')
+            decoder.feed(content[4096:])
+            image = decoder.close()
+        self.assertEqual(image.size, (2000, 1500))
+
+    def test_not_an_image_rejected_on_first_chunk(self):
+        """Test that a non-image is refused as soon as its header arrives."""
+        with self.assertRaises(ValidationError):
+            IncrementalDecoder().feed(b'SELECT 1; -- and so on, and so on')
+
+    def test_truncated_image(self):
+        """Test that an incomplete image is refused on close."""
+        decoder = IncrementalDecoder()
+        decoder.feed(render_image(10, 10, 'png')[:8])
+        with self.assertRaises(ValidationError):
+            decoder.close()
+
+    @override_settings(IMAGES_ADMISSION_MAX_MEGAPIXELS=256)
+    def test_budget_held_until_exit(self):
+        """Test that the pixel budget is acquired on the header and released on exit."""
+        with IncrementalDecoder() as decoder:
+            decoder.feed(render_image(100, 50, 'png'))
+            self.assertEqual(pixel_budget.in_flight, 5000)
+            decoder.close()
+        self.assertEqual(pixel_budget.in_flight, 0)
+
+
+@override_settings(IMAGES_INGEST_PIPELINED=True)
+class PipelinedIngestTest(OriginStubMixin, APITestCase):
+    """Test creating images with pipelined ingest."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        source_cache.clear()
+        metrics.reset()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create(self, path):
+        """
+        Create an image from the origin stub.
+
+        Args:
+            path(str): Origin path.
+
+        Returns:
+            response(Response): Server response.
+        """
+        return self.client.post(
+            reverse('images-list'),
+            data=json.dumps({'url': self.origin.url(path)}),
+            content_type='application/json',
+        )
+
+    @override_settings(IMAGES_SOURCE_CACHE_ENABLED=True)
+    def test_create_seeds_source_cache(self):
+        """Test that the image decoded during download is reused by the first resize."""
+        response = self.create('/images/640x480.jpg')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        image = Image.objects.get(pk=response.data['id'])
+        self.assertEqual((image.picture_width, image.picture_height), (640, 480))
+        self.assertEqual(source_cache.stats()['entries'], 1)
+        response = self.client.post(
+            reverse('images-resize', kwargs={'pk': image.pk}),
+            data=json.dumps({'width': 320}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(source_cache.stats()['hits'], 1)
+        self.assertEqual(metrics.snapshot()['observations']['ingest.header_bytes']['count'], 1)
+
+    def test_invalid_sources(self):
+        """Test that bad urls and non-images are refused with the usual messages."""
+        response = self.create('/text/SQL.txt')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data['error'][0],
+            'Upload a valid image. The uploaded file is not an image or is corrupted.',
+        )
+        response = self.create('/status/404')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('404', response.data['error'][0])
+        self.assertFalse(Image.objects.exists())
@@ -0,0 +1,83 @@
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from images import metrics
+from images.factories import ImageFactory
+from images.models import Image
+from images.tests.origin_stub import OriginStubMixin
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(IMAGES_MEMORY_ACCOUNTING_ENABLED=True)
+class MemoryAccountingTest(OriginStubMixin, APITestCase):
+    """Test per-request memory accounting."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        metrics.reset()
+        self.image = ImageFactory.create(picture__width=100, picture__height=50)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def resize(self):
+        """
+        Resize the test image to 40x20.
+
+        Returns:
+            response(Response): Resize response.
+        """
+        return self.client.post(
+            reverse('images-resize', kwargs={'pk': self.image.id}),
+            data=json.dumps({'width': 40, 'height': 20}),
+            content_type='application/json',
+        )
+
+    def test_resize_is_accounted(self):
+        """Test that decoded pixels and output size are exported as metrics."""
+        self.assertEqual(self.resize().status_code, status.HTTP_201_CREATED)
+        response = self.client.get(reverse('images-metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        observations = response.data['observations']
+        self.assertEqual(
+            observations['memory.resize.decoded_bytes']['sum'], (100 * 50 + 40 * 20) * 3,
+        )
+        self.assertGreater(observations['memory.resize.output_bytes']['sum'], 0)
+        self.assertEqual(observations['memory.resize.peak_rss_delta']['count'], 1)
+
+    def test_create_from_url_is_accounted(self):
+        """Test that an image created from a url accounts its pixels and stored size."""
+        response = self.client.post(
+            reverse('images-list'),
+            data=json.dumps({'url': self.origin.url('/images/64x48.png')}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        observations = metrics.snapshot()['observations']
+        self.assertEqual(observations['memory.create.decoded_bytes']['sum'], 64 * 48 * 3)
+        self.assertEqual(
+            observations['memory.create.output_bytes']['sum'],
+            Image.objects.get(pk=response.data['id']).picture_size,
+        )
+
+    @override_settings(IMAGES_MEMORY_WARNING_BYTES=1)
+    def test_heavy_request_warning(self):
+        """Test that requests over the threshold are logged and counted."""
+        with self.assertLogs('images.memory', level='WARNING'):
+            self.resize()
+        self.assertEqual(metrics.snapshot()['counters']['memory.resize.over_threshold'], 1)
+
+    @override_settings(IMAGES_MEMORY_ACCOUNTING_ENABLED=False)
+    def test_disabled_accounting(self):
+        """Test that nothing is recorded when accounting is off."""
+        self.resize()
+        self.assertEqual(metrics.snapshot()['observations'], {})
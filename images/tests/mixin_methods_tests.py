@@ -7,17 +7,18 @@ from django.test import TestCase
 from images.factories import ImageFactory
 from images.mixins import ImageHandlerMixin
 from images.models import Image
+from images.tests.origin_stub import OriginStubMixin
 from PIL import Image as PILImage
 
 
-class ImagesMixinMethodsTest(ImageHandlerMixin, TestCase):
+class ImagesMixinMethodsTest(OriginStubMixin, ImageHandlerMixin, TestCase):
     """Test ImageHandlerMixin methods."""
 
     def setUp(self):
         """Prepare data for tests."""
         settings.MEDIA_ROOT = tempfile.mkdtemp()
         self.image = ImageFactory.create()
-        self.url = 'https://i.ibb.co/sJHms9y/ricardo.jpg'
+        self.url = self.origin.url('/images/640x480.jpg')
 
     @classmethod
     def tearDownClass(cls):
@@ -32,6 +33,15 @@ class ImagesMixinMethodsTest(ImageHandlerMixin, TestCase):
             self.assertIsInstance(instance, Image)
             self.assertEqual(instance.url, self.url)
 
+    def test_new_image_size_and_type_from_content(self):
+        """Test that size and content type come from the bytes, not the file name."""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as tmp_file:
+            PILImage.new('RGB', (12, 8)).save(tmp_file, 'PNG')
+            instance = self.create_new_image_instance(tmp_file, url=self.url)
+            self.assertEqual(instance.picture_size, os.fstat(tmp_file.fileno()).st_size)
+        self.assertEqual(instance.content_type, 'image/png')
+        self.assertEqual(Image.objects.get(pk=instance.pk).picture_size, instance.picture_size)
+
     def test_save_image_method(self):
         """Test save_image method."""
         instance = self.save_image({'url': self.url})
@@ -63,3 +73,40 @@ class ImagesMixinMethodsTest(ImageHandlerMixin, TestCase):
         self.assertEqual(name_with_width_only, '{0}_{1}_0{2}'.format(name, width, ext))
         self.assertEqual(name_with_height_only, '{0}_0_{1}{2}'.format(name, height, ext))
         self.assertEqual(name_with_both, '{0}_{1}_{2}{3}'.format(name, width, height, ext))
+
+    def test_select_resize_source_method(self):  # Noqa: WPS210
+        """Test select_resize_source method."""
+        root = ImageFactory.create(
+            picture__filename='tree.jpg', picture__width=1000, picture__height=800,
+        )
+        medium = ImageFactory.create(
+            picture__filename='tree_500_400.jpg',
+            picture__width=500,
+            picture__height=400,
+            parent_picture=root,
+            variant_key='resize:500x400',
+        )
+        small = ImageFactory.create(
+            picture__filename='tree_250_200.jpg',
+            picture__width=250,
+            picture__height=200,
+            parent_picture=medium,
+            variant_key='resize:250x200',
+        )
+        ImageFactory.create(
+            picture__filename='tree_300_120.jpg',
+            picture__width=300,
+            picture__height=120,
+            parent_picture=root,
+            variant_key='resize:300x120',
+        )
+        ImageFactory.create(
+            picture__filename='tree_300_240.jpg',
+            picture__width=300,
+            picture__height=240,
+            parent_picture=root,
+            variant_key='resize:300x240:max2048',
+        )
+        self.assertEqual(self.select_resize_source(small, 300, 240), medium)
+        self.assertEqual(self.select_resize_source(root, 200, 100), small)
+        self.assertEqual(self.select_resize_source(small, 2000, 1600), root)
@@ -0,0 +1,132 @@
+import hashlib
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from images.factories import ImageFactory
+from images.models import Image
+from images.optimization import (
+    ORIENTATION_TAG,
+    optimize_originals,
+    recompress_png,
+    strip_jpeg,
+)
+from PIL import Image as PILImage
+from PIL import ImageCms, PngImagePlugin
+from rest_framework.test import APITestCase
+
+
+def jpeg_with_metadata():
+    """
+    Encode a JPEG carrying EXIF, a comment and an ICC profile.
+
+    Returns:
+        content(bytes): JPEG file.
+    """
+    exif = PILImage.Exif()
+    exif[ORIENTATION_TAG] = 6
+    exif[0x010F] = 'Camera maker'
+    exif[0x9286] = 'x' * 4000
+    icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    output = io.BytesIO()
+    PILImage.effect_noise((120, 80), 40).convert('RGB').save(
+        output, 'JPEG', exif=exif.tobytes(), comment=b'c' * 2000, icc_profile=icc_profile,
+    )
+    return output.getvalue()
+
+
+class OriginalOptimizationTest(APITestCase):
+    """Test lossless optimization of stored originals."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_strip_jpeg_keeps_pixels_orientation_and_icc(self):
+        """Test that metadata is dropped while decoded pixels stay the same."""
+        content = jpeg_with_metadata()
+        stripped = strip_jpeg(content)
+        self.assertLess(len(stripped), len(content) - 6000)
+        with PILImage.open(io.BytesIO(content)) as original:
+            with PILImage.open(io.BytesIO(stripped)) as image:
+                self.assertEqual(image.tobytes(), original.tobytes())
+                self.assertEqual(image.info['icc_profile'], original.info['icc_profile'])
+                self.assertNotIn('comment', image.info)
+                exif = image.getexif()
+                self.assertEqual(dict(exif), {ORIENTATION_TAG: 6})
+
+    def test_recompress_png_keeps_color_chunks(self):
+        """Test that gamma, chromaticity and sRGB intent survive recompression."""
+        png_info = PngImagePlugin.PngInfo()
+        png_info.add(b'gAMA', (45455).to_bytes(4, 'big'))
+        png_info.add(b'cHRM', b''.join(
+            value.to_bytes(4, 'big')
+            for value in (31270, 32900, 64000, 33000, 30000, 60000, 15000, 6000)
+        ))
+        png_info.add(b'sRGB', b'\x00')
+        output = io.BytesIO()
+        PILImage.new('RGB', (50, 50), 'orange').save(
+            output, 'PNG', compress_level=0, pnginfo=png_info,
+        )
+        recompressed = recompress_png(output.getvalue())
+        self.assertLess(len(recompressed), len(output.getvalue()))
+        with PILImage.open(io.BytesIO(output.getvalue())) as original:
+            with PILImage.open(io.BytesIO(recompressed)) as image:
+                for key in ('gamma', 'chromaticity', 'srgb'):
+                    self.assertEqual(image.info[key], original.info[key])
+
+    def test_strip_jpeg_rejects_broken_file(self):
+        """Test that a truncated segment list is reported."""
+        with self.assertRaises(ValueError):
+            strip_jpeg(b'\xff\xd8\x00\x00')
+
+    def test_optimize_originals(self):
+        """Test that originals shrink, savings are recorded and variants are left alone."""
+        jpeg = ImageFactory.create(
+            picture__from_file=io.BytesIO(jpeg_with_metadata()), picture__filename='photo.jpg',
+        )
+        raw_png = io.BytesIO()
+        PILImage.new('RGBA', (300, 300), (10, 200, 30, 128)).save(raw_png, 'PNG', compress_level=0)
+        png = ImageFactory.create(
+            picture__from_file=io.BytesIO(raw_png.getvalue()), picture__filename='flat.png',
+        )
+        variant = ImageFactory.create(parent_picture=jpeg)
+        variant_size = variant.picture.size
+
+        processed, saved = optimize_originals(bytes_per_second=0)
+
+        self.assertEqual(processed, 2)
+        jpeg.refresh_from_db()
+        png.refresh_from_db()
+        self.assertEqual(saved, jpeg.bytes_saved + png.bytes_saved)
+        self.assertGreater(jpeg.bytes_saved, 6000)
+        self.assertGreater(png.bytes_saved, 0)
+        self.assertEqual(png.picture.size, png.picture_size)
+        self.assertEqual(png.picture_size + png.bytes_saved, len(raw_png.getvalue()))
+        with png.picture.open('rb') as picture:
+            self.assertEqual(png.content_hash, hashlib.sha256(picture.read()).hexdigest())
+        with PILImage.open(png.picture.path) as image:
+            self.assertEqual(image.getpixel((5, 5)), (10, 200, 30, 128))
+        variant.refresh_from_db()
+        self.assertIsNone(variant.optimized_at)
+        self.assertEqual(variant.picture.size, variant_size)
+
+    def test_optimization_resumes(self):
+        """Test that runs skip already optimized originals."""
+        images = ImageFactory.create_batch(3)
+        self.assertEqual(optimize_originals(bytes_per_second=0, limit=2)[0], 2)
+        self.assertEqual(
+            list(Image.objects.filter(optimized_at__isnull=True).values_list('pk', flat=True)),
+            [images[2].pk],
+        )
+        call_command('optimize_originals', stdout=io.StringIO())
+        self.assertFalse(Image.objects.filter(optimized_at__isnull=True).exists())
+        self.assertEqual(optimize_originals(bytes_per_second=0), (0, 0))
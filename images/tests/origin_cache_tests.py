@@ -0,0 +1,102 @@
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from images import metrics
+from images.models import Image, RemoteOrigin
+from images.tests.origin_stub import OriginStubMixin
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(IMAGES_ORIGIN_CACHE_ENABLED=True)
+class OriginCacheTest(OriginStubMixin, APITestCase):
+    """Test reuse of images ingested from the same url."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        metrics.reset()
+        self.url = self.origin.url('/images/64x48.png')
+        self.origin.server.responses.clear()
+        self.first = self.create()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create(self, url=None):
+        """
+        Ingest `url` and check the response.
+
+        Args:
+            url(str): Image source, `self.url` by default.
+
+        Returns:
+            image_id(int): Id of the returned image.
+        """
+        response = self.client.post(
+            reverse('images-list'),
+            data=json.dumps({'url': url or self.url}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def test_first_ingest_is_remembered(self):
+        """Test that the first ingest records validators and content hash."""
+        origin = RemoteOrigin.objects.get(url=self.url)
+        self.assertEqual(origin.image_id, self.first)
+        self.assertTrue(origin.etag)
+        self.assertEqual(origin.content_hash, Image.objects.get(pk=self.first).content_hash)
+
+    def test_fresh_origin_is_reused_without_request(self):
+        """Test that a resubmission within the TTL doesn't touch the remote server."""
+        self.assertEqual(self.create(), self.first)
+        self.assertEqual(len(self.origin.server.responses), 1)
+        self.assertEqual(metrics.snapshot()['counters']['origin_cache.fresh'], 1)
+
+    @override_settings(IMAGES_ORIGIN_CACHE_TTL=0)
+    def test_not_modified(self):
+        """Test that a stale origin is revalidated and reused on 304."""
+        self.assertEqual(self.create(), self.first)
+        self.assertEqual(self.origin.server.responses[-1], ('/images/64x48.png', 304))
+        self.assertEqual(Image.objects.count(), 1)
+
+    @override_settings(IMAGES_ORIGIN_CACHE_TTL=0)
+    def test_same_content(self):
+        """Test that a stale origin without validators is reused when the hash matches."""
+        RemoteOrigin.objects.update(etag='', last_modified='')
+        self.assertEqual(self.create(), self.first)
+        self.assertEqual(self.origin.server.responses[-1], ('/images/64x48.png', 200))
+        self.assertEqual(metrics.snapshot()['counters']['origin_cache.same_content'], 1)
+        self.assertEqual(Image.objects.count(), 1)
+
+    @override_settings(IMAGES_ORIGIN_CACHE_TTL=0)
+    def test_changed_content(self):
+        """Test that a changed remote resource is ingested again."""
+        RemoteOrigin.objects.update(etag='', content_hash='0' * 64)
+        second = self.create()
+        self.assertNotEqual(second, self.first)
+        self.assertEqual(RemoteOrigin.objects.get(url=self.url).image_id, second)
+
+    def test_invalid_sources(self):
+        """Test that non-images and failed downloads are refused."""
+        response = self.client.post(
+            reverse('images-list'),
+            data=json.dumps({'url': self.origin.url('/text/SQL.txt')}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse('images-list'),
+            data=json.dumps({'url': self.origin.url('/status/500')}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(RemoteOrigin.objects.count(), 1)
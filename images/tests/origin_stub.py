@@ -0,0 +1,153 @@
+"""Local HTTP origin serving generated images, used by tests and the load-test harness."""
+import collections
+import functools
+import hashlib
+import io
+import re
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image as PILImage
+
+IMAGE_PATH = re.compile(r'^/images/(?P<width>\d+)x(?P<height>\d+)\.(?P<ext>jpg|png|gif|webp)$')
+STATUS_PATH = re.compile(r'^/status/(?P<status>\d{3})$')
+TEXT_PATH = re.compile(r'^/text/[\w.-]+\.txt$')
+FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+    'gif': ('GIF', 'image/gif'),
+    'webp': ('WEBP', 'image/webp'),
+}
+MAX_SIDE = 10000
+RESPONSES_LOG_SIZE = 1000
+
+
+@functools.lru_cache(maxsize=64)
+def render_image(width, height, ext):
+    """
+    Encode a gradient image of the requested size.
+
+    Args:
+        width(int): Image width.
+        height(int): Image height.
+        ext(str): File extension, one of FORMATS.
+
+    Returns:
+        content(bytes): Encoded image.
+    """
+    gradient = PILImage.linear_gradient('L').resize((width, height))
+    flipped = gradient.transpose(PILImage.FLIP_TOP_BOTTOM)
+    image = PILImage.merge('RGB', (gradient, flipped, gradient))
+    output = io.BytesIO()
+    image.save(output, FORMATS[ext][0])
+    return output.getvalue()
+
+
+class OriginRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serve `/images/<width>x<height>.<ext>`, `/text/<name>.txt` and `/status/<code>`.
+
+    Images carry an ETag and are answered with 304 when it matches `If-None-Match`.
+    """
+
+    def do_GET(self):  # Noqa: N802
+        """Respond to GET request."""
+        image_match = IMAGE_PATH.match(self.path)
+        status_match = STATUS_PATH.match(self.path)
+        if image_match:
+            width, height = int(image_match.group('width')), int(image_match.group('height'))
+            if not (0 < width <= MAX_SIDE and 0 < height <= MAX_SIDE):
+                self.respond(HTTPStatus.BAD_REQUEST, b'', 'text/plain')
+                return
+            ext = image_match.group('ext')
+            content = render_image(width, height, ext)
+            etag = '"{0}"'.format(hashlib.sha256(content).hexdigest()[:32])
+            if self.headers.get('If-None-Match') == etag:
+                self.respond(HTTPStatus.NOT_MODIFIED, b'', FORMATS[ext][1], etag)
+                return
+            self.respond(HTTPStatus.OK, content, FORMATS[ext][1], etag)
+        elif TEXT_PATH.match(self.path):
+            self.respond(HTTPStatus.OK, b'SELECT 1;\n', 'text/plain')
+        elif status_match:
+            self.respond(int(status_match.group('status')), b'', 'text/plain')
+        else:
+            self.respond(HTTPStatus.NOT_FOUND, b'', 'text/plain')
+
+    def respond(self, status, content, content_type, etag=None):
+        """
+        Write the whole response.
+
+        Args:
+            status(int): Response status code.
+            content(bytes): Response body.
+            content_type(str): Response content type.
+            etag(str): Entity tag, if any.
+        """
+        self.server.responses.append((self.path, status))
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if etag:
+            self.send_header('ETag', etag)
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):  # Noqa: WPS110
+        """Keep test and benchmark output clean."""
+
+
+class OriginStub(object):
+    """HTTP origin running in a background thread."""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.server = ThreadingHTTPServer((host, port), OriginRequestHandler)
+        self.server.daemon_threads = True
+        self.server.responses = collections.deque(maxlen=RESPONSES_LOG_SIZE)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        """
+        Start serving.
+
+        Returns:
+            origin(OriginStub): Started origin.
+        """
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def url(self, path):
+        """
+        Build absolute url of `path` on the origin.
+
+        Args:
+            path(str): Path starting with a slash.
+
+        Returns:
+            url(str): Absolute url.
+        """
+        host, port = self.server.server_address[:2]
+        return 'http://{0}:{1}{2}'.format(host, port, path)
+
+
+class OriginStubMixin(object):
+    """Start an origin stub for the whole test case."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the origin."""
+        super().setUpClass()
+        cls.origin = OriginStub().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the origin."""
+        cls.origin.stop()
+        super().tearDownClass()
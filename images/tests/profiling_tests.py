@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from images.factories import ImageFactory
+from images.profiling import ProfilingMiddleware, list_profiles, make_token
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+PROFILES_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    IMAGES_PROFILING_ENABLED=True, IMAGES_PROFILING_DIR=PROFILES_DIR, IMAGES_PROFILING_KEEP=2,
+)
+class ProfilingTest(APITestCase):
+    """Test request profiling."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        shutil.rmtree(PROFILES_DIR, ignore_errors=True)
+        self.image = ImageFactory.create()
+        self.url = reverse('images-resize', kwargs={'pk': self.image.id})
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directories in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(PROFILES_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def resize(self, **headers):
+        """
+        Send resize request.
+
+        Args:
+            headers: Request headers.
+
+        Returns:
+            response(Response): Resize response.
+        """
+        return self.client.post(
+            self.url,
+            data=json.dumps({'width': 10}),
+            content_type='application/json',
+            **headers,
+        )
+
+    def test_signed_request_is_profiled(self):
+        """Test that profiles are saved with metadata and rotated."""
+        for _ in range(3):
+            response = self.resize(HTTP_X_PROFILE=make_token())
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        profiles = list_profiles(PROFILES_DIR)
+        self.assertEqual(len(profiles), 2)
+        name, metadata = profiles[0]
+        self.assertEqual(metadata['action'], 'resize')
+        self.assertEqual(metadata['status_code'], status.HTTP_201_CREATED)
+        self.assertTrue(os.path.exists(os.path.join(PROFILES_DIR, name + '.prof')))
+        output = StringIO()
+        call_command('profiles', name, stdout=output)
+        self.assertIn('(resize_image)', output.getvalue())
+
+    def test_unsigned_requests_are_not_profiled(self):
+        """Test that requests without a valid token run as usual."""
+        self.resize()
+        self.resize(HTTP_X_PROFILE='profile:forged')
+        self.client.get(reverse('images-list'), HTTP_X_PROFILE=make_token())
+        self.assertEqual(list_profiles(PROFILES_DIR), [])
+
+    @override_settings(IMAGES_PROFILING_ENABLED=False)
+    def test_disabled_middleware_is_removed(self):
+        """Test that disabled profiling adds no middleware to the chain."""
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
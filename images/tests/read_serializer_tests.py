@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.urls import reverse
+from images.factories import ImageFactory
+from images.models import Image
+from images.serializers import IMAGE_ROW_FIELDS, ImageRowSerializer, ImageSerializer
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+
+class ImageRowSerializerTest(APITestCase):
+    """Test the values() based read path."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        self.original = ImageFactory.create(
+            picture__width=120, picture__height=80, picture__filename='holiday photo é.jpg',
+        )
+        ImageFactory.create(parent_picture=self.original, url=None)
+        legacy = ImageFactory.create(picture__width=30, picture__height=20)
+        Image.objects.filter(pk=legacy.pk).update(picture_width=None, picture_height=None)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_list_is_byte_identical(self):
+        """Test that the list renders exactly what ImageSerializer renders."""
+        response = self.client.get(reverse('images-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = ImageSerializer(
+            Image.objects.all(), many=True, context={'request': response.wsgi_request},
+        ).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+        self.assertEqual(response.data[2]['width'], 30)
+
+    def test_retrieve_is_byte_identical(self):
+        """Test that the detail view renders exactly what ImageSerializer renders."""
+        response = self.client.get(reverse('images-detail', kwargs={'pk': self.original.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = ImageSerializer(self.original, context={'request': response.wsgi_request}).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_rows_without_request(self):
+        """Test that relative picture URLs match too."""
+        rows = Image.objects.values(*IMAGE_ROW_FIELDS)
+        self.assertEqual(
+            ImageRowSerializer(rows, many=True).data,
+            ImageSerializer(Image.objects.all(), many=True).data,
+        )
+
+    def test_list_reads_no_files(self):
+        """Test that listing stored dimensions takes a single query and no file access."""
+        Image.objects.filter(picture_width__isnull=True).delete()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('images-list'))
+        self.assertEqual(response.data[0]['width'], 120)
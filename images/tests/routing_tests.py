@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from images.factories import ImageFactory
+from images.models import Image
+from images.routing import PIN_COOKIE, _read_alias  # Noqa: WPS450
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(APITestCase):
+    """Test reads routed to a replica, kept as a separate SQLite database."""
+
+    databases = frozenset(('default', 'replica'))
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        self.original = ImageFactory.create(picture__width=200, picture__height=100)
+        self.variant = ImageFactory.create(parent_picture=self.original)
+        self.original.save(using='replica')
+        self.variant.save(using='replica')
+        self.unreplicated = ImageFactory.create()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def listed_ids(self):
+        """
+        List images through the API.
+
+        Returns:
+            ids(list): Listed image ids.
+        """
+        response = self.client.get(reverse('images-list'), {'fields': 'id'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [image['id'] for image in response.data]
+
+    def test_reads_use_replica(self):
+        """Test that list, retrieve and tree only see replicated rows."""
+        self.assertEqual(self.listed_ids(), [self.original.pk, self.variant.pk])
+        response = self.client.get(reverse('images-detail', kwargs={'pk': self.unreplicated.pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(
+            reverse('images-tree', kwargs={'pk': self.variant.pk}), {'fields': 'id'},
+        )
+        self.assertEqual(
+            [image['id'] for image in response.data], [self.original.pk, self.variant.pk],
+        )
+
+    def test_writes_use_primary_and_pin_reads(self):
+        """Test that a write lands on the primary and the client reads it back from there."""
+        response = self.client.post(
+            reverse('images-resize', kwargs={'pk': self.unreplicated.pk}),
+            data=json.dumps({'width': 10, 'height': 10}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Image.objects.using('default').filter(pk=response.data['id']).exists())
+        self.assertFalse(Image.objects.using('replica').filter(pk=response.data['id']).exists())
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertIn(response.data['id'], self.listed_ids())
+
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertNotIn(response.data['id'], self.listed_ids())
+
+    def test_retrieve_touch_writes_primary(self):
+        """Test that access tracking of a replica read is written to the primary."""
+        response = self.client.get(reverse('images-detail', kwargs={'pk': self.variant.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(Image.objects.using('default').get(pk=self.variant.pk).last_accessed)
+        self.assertIsNone(Image.objects.using('replica').get(pk=self.variant.pk).last_accessed)
+
+    def test_failed_read_releases_replica(self):
+        """Test that a server error does not leave later requests on the replica."""
+        Image.objects.using('replica').filter(pk=self.variant.pk).update(picture_width=None)
+        os.remove(self.variant.picture.path)
+        with self.assertRaises(FileNotFoundError):
+            self.client.get(reverse('images-list'))
+        self.assertIsNone(_read_alias.get())
+        response = self.client.post(
+            reverse('images-resize', kwargs={'pk': self.unreplicated.pk}),
+            data=json.dumps({'width': 10, 'height': 10}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test that reads stay on the primary without replicas."""
+        self.assertEqual(
+            self.listed_ids(), [self.original.pk, self.variant.pk, self.unreplicated.pk],
+        )
@@ -0,0 +1,140 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from images import metrics
+from images.factories import ImageFactory
+from images.mixins import ImageHandlerMixin
+from images.models import Image
+from images.single_flight import RELEASE_SCRIPT, RenderLock, single_flight
+
+
+@override_settings(IMAGES_RENDER_LOCK_POLL_INTERVAL=0.01)
+class SingleFlightTest(SimpleTestCase):
+    """Test single_flight."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        cache.clear()
+        metrics.reset()
+        self.renders = []
+        self.result = None
+
+    def render(self):
+        """
+        Count the call and produce a result.
+
+        Returns:
+            result(str): Rendered result.
+        """
+        self.renders.append(threading.get_ident())
+        self.result = 'rendered'
+        return self.result
+
+    def run_single_flight(self):
+        """
+        Render under a lock of the same key as the other workers.
+
+        Returns:
+            result(str): Rendered or reused result.
+        """
+        return single_flight(RenderLock(1, 'resize:10x10', 'jpg'), self.render, lambda: self.result)
+
+    def test_waiter_reuses_result(self):
+        """Test that a worker waiting for the lock gets the holder's result."""
+        holder = RenderLock(1, 'resize:10x10', 'jpg')
+        self.assertTrue(holder.acquire())
+
+        def finish():
+            self.result = 'rendered by holder'
+            holder.release()
+        threading.Timer(0.1, finish).start()
+        found = self.run_single_flight()
+        self.assertEqual(found, 'rendered by holder')
+        self.assertEqual(self.renders, [])
+        self.assertEqual(metrics.snapshot()['counters']['single_flight.waited'], 1)
+
+    @override_settings(IMAGES_RENDER_LOCK_TTL=1, IMAGES_RENDER_LOCK_WAIT=5)
+    def test_stale_lock_expires(self):
+        """Test that a lock left by a crashed worker stops blocking after its TTL."""
+        self.assertTrue(RenderLock(1, 'resize:10x10', 'jpg').acquire())
+        started = time.monotonic()
+        found = self.run_single_flight()
+        self.assertEqual(found, 'rendered')
+        self.assertLess(time.monotonic() - started, 5)
+
+    @override_settings(IMAGES_RENDER_LOCK_WAIT=0.1)
+    def test_wait_timeout(self):
+        """Test that a waiter renders on its own when the holder takes too long."""
+        self.assertTrue(RenderLock(1, 'resize:10x10', 'jpg').acquire())
+        found = self.run_single_flight()
+        self.assertEqual(found, 'rendered')
+        self.assertEqual(metrics.snapshot()['counters']['single_flight.timeouts'], 1)
+
+    @override_settings(IMAGES_RENDER_LOCK_TTL=1)
+    def test_release_keeps_foreign_lock(self):
+        """Test that an expired holder doesn't release the lock taken over by another worker."""
+        expired = RenderLock(1, 'resize:10x10', 'jpg')
+        self.assertTrue(expired.acquire())
+        time.sleep(1.1)
+        current = RenderLock(1, 'resize:10x10', 'jpg')
+        self.assertTrue(current.acquire())
+        expired.release()
+        self.assertFalse(RenderLock(1, 'resize:10x10', 'jpg').acquire())
+
+    def test_redis_release_is_atomic(self):
+        """Test that on Redis the lock is taken with SET NX and released by a single script."""
+        client = mock.Mock()
+        lock = RenderLock(1, 'resize:10x10', 'jpg')
+        with mock.patch.object(cache, 'get_master_client', create=True, return_value=client):
+            self.assertTrue(lock.acquire())
+            lock.release()
+        key = cache.make_key(lock.key)
+        client.set.assert_called_once_with(
+            key, lock.token, nx=True, ex=settings.IMAGES_RENDER_LOCK_TTL,
+        )
+        client.eval.assert_called_once_with(RELEASE_SCRIPT, 1, key, lock.token)
+        self.assertIsNone(cache.get(lock.key))
+
+
+@override_settings(IMAGES_RENDER_LOCK_POLL_INTERVAL=0.01)
+class ConcurrentResizeTest(TransactionTestCase):
+    """Test concurrent resizes of the same image."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        cache.clear()
+        self.image = ImageFactory.create(picture__width=400, picture__height=200)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_one_render(self):
+        """Test that concurrent requests for the same size produce one variant."""
+        barrier = threading.Barrier(6)
+        results = []
+
+        def resize():
+            try:
+                barrier.wait()
+                payload = {'width': 50, 'height': 25}
+                results.append(ImageHandlerMixin().resize_image(payload, self.image))
+            finally:
+                connection.close()
+        threads = [threading.Thread(target=resize) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({variant.pk for variant in results}), 1)
+        self.assertEqual(Image.objects.filter(parent_picture=self.image).count(), 1)
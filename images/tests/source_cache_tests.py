@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from images.factories import ImageFactory
+from images.mixins import ImageHandlerMixin
+from images.source_cache import DecodedImageCache, open_source, source_cache
+from PIL import Image as PILImage
+
+
+class DecodedImageCacheTest(TestCase):
+    """Test DecodedImageCache."""
+
+    def test_lru_eviction_by_size(self):
+        """Test that least recently used images are evicted to fit the budget."""
+        cache = DecodedImageCache(max_bytes=3 * 10 * 10 * 3)
+        for key in ('first', 'second', 'third'):
+            cache.put(key, PILImage.new('RGB', (10, 10)), 'JPEG')
+        self.assertIsNotNone(cache.get('first'))
+        cache.put('fourth', PILImage.new('RGB', (10, 10)), 'JPEG')
+        self.assertIsNone(cache.get('second'))
+        self.assertIsNotNone(cache.get('first'))
+        self.assertEqual(
+            cache.stats(),
+            {
+                'hits': 2,
+                'misses': 1,
+                'evictions': 1,
+                'entries': 3,
+                'size': 900,
+                'max_bytes': 900,
+            },
+        )
+
+    def test_oversized_image_is_not_cached(self):
+        """Test that an image bigger than the whole budget is skipped."""
+        cache = DecodedImageCache(max_bytes=10)
+        cache.put('big', PILImage.new('RGB', (10, 10)), 'JPEG')
+        self.assertEqual(cache.stats()['entries'], 0)
+
+
+@override_settings(IMAGES_SOURCE_CACHE_ENABLED=True)
+class OpenSourceTest(ImageHandlerMixin, TestCase):
+    """Test open_source with enabled cache."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        source_cache.clear()
+        self.image = ImageFactory.create(picture__width=400, picture__height=200)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_repeated_resize_hits_cache(self):
+        """Test that the second resize of the same parent skips decode."""
+        self.resize_image({'width': 100, 'height': 50}, self.image)
+        self.resize_image({'width': 120, 'height': 60}, self.image)
+        self.assertEqual(source_cache.stats()['misses'], 1)
+        self.assertEqual(source_cache.stats()['hits'], 1)
+
+    @override_settings(IMAGES_SOURCE_CACHE_PREREDUCE=True)
+    def test_prereduced_source(self):
+        """Test that the cached source is shrunk as far as the target size allows."""
+        with open_source(self.image, (100, 50)) as (image, image_format):
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image_format, 'JPEG')
+        with open_source(self.image, (300, 150)) as (image, image_format):
+            self.assertEqual(image.size, (400, 200))
@@ -0,0 +1,85 @@
+import builtins
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.urls import reverse
+from images.factories import ImageFactory
+from images.models import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class SparseFieldsTest(APITestCase):
+    """Test `fields` and `omit` query parameters."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        self.images = ImageFactory.create_batch(3, picture__width=40, picture__height=30)
+        Image.objects.update(picture_width=None, picture_height=None)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get_counting_opens(self, url, params):
+        """
+        Request `url` and count opened media files.
+
+        Args:
+            url(str): Requested url.
+            params(dict): Query parameters.
+
+        Returns:
+            result(tuple): Response and count of media files opened.
+        """
+        with mock.patch.object(builtins, 'open', wraps=builtins.open) as opened:
+            response = self.client.get(url, params)
+        pictures = {image.picture.path for image in self.images}
+        media_opens = [call for call in opened.call_args_list if call.args[0] in pictures]
+        return response, len(media_opens)
+
+    def test_list_fields(self):
+        """Test that only requested fields are returned and no file is opened for them."""
+        response, opens = self.get_counting_opens(
+            reverse('images-list'), {'fields': 'picture,id'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(opens, 0)
+        self.assertEqual([list(item) for item in response.data], [['id', 'picture']] * 3)
+
+        response, opens = self.get_counting_opens(reverse('images-list'), {})
+        self.assertEqual(opens, 3)
+        self.assertEqual(response.data[0]['width'], 40)
+
+    def test_retrieve_omit(self):
+        """Test that omitted dimensions are not read from the file."""
+        url = reverse('images-detail', kwargs={'pk': self.images[0].pk})
+        response, opens = self.get_counting_opens(url, {'omit': 'width,height'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(opens, 0)
+        self.assertEqual(list(response.data), ['id', 'name', 'url', 'picture', 'parent_picture'])
+
+    def test_fields_and_omit(self):
+        """Test that `omit` applies after `fields`."""
+        url = reverse('images-detail', kwargs={'pk': self.images[0].pk})
+        response = self.client.get(url, {'fields': 'id,name,width', 'omit': 'width'})
+        self.assertEqual(response.data, {'id': self.images[0].pk, 'name': self.images[0].name})
+
+    def test_unknown_field(self):
+        """Test that unknown field names are rejected."""
+        response = self.client.get(reverse('images-list'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', response.data['fields'][0])
+
+    def test_export_fields(self):
+        """Test that the export honours `fields` too."""
+        response = self.client.get(reverse('images-export'), {'fields': 'id'})
+        self.assertEqual(
+            b''.join(response.streaming_content).splitlines(),
+            ['{{"id":{0}}}'.format(image.pk).encode() for image in self.images],
+        )
@@ -0,0 +1,134 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from images import metrics
+from images.factories import ImageFactory
+from images.sprites import select_sprite_sources
+from PIL import Image as PILImage
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class SpriteSheetTest(APITestCase):
+    """Test sprite sheets composed from several images."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        cache.clear()
+        metrics.reset()
+        self.wide = ImageFactory.create(
+            picture__width=300, picture__height=200, picture__color='red',
+            picture__filename='wide.jpg',
+        )
+        self.tall = ImageFactory.create(
+            picture__width=100, picture__height=300, picture__color='blue',
+            picture__filename='tall.jpg',
+        )
+        self.small = ImageFactory.create(
+            picture__width=50, picture__height=40, picture__color='green',
+            picture__filename='small.jpg',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get_sprite(self, images, cell=64):
+        """
+        Request the coordinate map of a sprite.
+
+        Args:
+            images(list): Images in sheet order.
+            cell(int): Cell side.
+
+        Returns:
+            response(Response): Sprite map response.
+        """
+        return self.client.get(reverse('images-sprite'), {
+            'ids': ','.join(str(image.pk) for image in images),
+            'cell': cell,
+        })
+
+    def test_sprite_map_and_sheet(self):
+        """Test that the sheet holds every thumbnail where the map says."""
+        response = self.get_sprite([self.wide, self.tall, self.small])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['format'], 'JPEG')
+        self.assertEqual((response.data['width'], response.data['height']), (128, 128))
+        self.assertEqual(response.data['cells'], [
+            {'id': self.wide.pk, 'x': 0, 'y': 0, 'width': 64, 'height': 43},
+            {'id': self.tall.pk, 'x': 64, 'y': 0, 'width': 21, 'height': 64},
+            {'id': self.small.pk, 'x': 0, 'y': 64, 'width': 50, 'height': 40},
+        ])
+
+        sheet_response = self.client.get(response.data['sheet'])
+        self.assertEqual(sheet_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sheet_response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', sheet_response['Cache-Control'])
+        with PILImage.open(io.BytesIO(sheet_response.content)) as sheet:
+            self.assertEqual(sheet.size, (128, 128))
+            for cell, (red, green, blue) in zip(
+                response.data['cells'], [(255, 0, 0), (0, 0, 255), (0, 128, 0)],
+            ):
+                pixel = sheet.getpixel((cell['x'] + cell['width'] // 2, cell['y'] + 10))
+                for channel, expected in zip(pixel, (red, green, blue)):
+                    self.assertAlmostEqual(channel, expected, delta=40)
+
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['sprites.rendered'], 1)
+        self.assertEqual(counters['sprites.cached'], 1)
+
+    def test_sprite_version_follows_ids(self):
+        """Test that another order or cell size is another cached sheet."""
+        first = self.get_sprite([self.wide, self.tall]).data['version']
+        self.assertEqual(self.get_sprite([self.wide, self.tall]).data['version'], first)
+        self.assertNotEqual(self.get_sprite([self.tall, self.wide]).data['version'], first)
+        self.assertNotEqual(self.get_sprite([self.wide, self.tall], cell=32).data['version'], first)
+        self.assertEqual(metrics.snapshot()['counters']['sprites.rendered'], 3)
+
+    def test_transparent_sprite(self):
+        """Test that transparent pictures make a PNG sheet."""
+        clear = io.BytesIO()
+        PILImage.new('RGBA', (20, 20)).save(clear, 'PNG')
+        transparent = ImageFactory.create(
+            picture__from_file=clear, picture__filename='clear.png',
+        )
+        response = self.get_sprite([self.wide, transparent])
+        self.assertEqual(response.data['format'], 'PNG')
+        sheet_response = self.client.get(response.data['sheet'])
+        self.assertEqual(sheet_response['Content-Type'], 'image/png')
+
+    def test_small_variant_is_used(self):
+        """Test that a stored variant covering the cell is decoded instead of the original."""
+        big = ImageFactory.create(picture__width=1000, picture__height=500)
+        for width, height in ((40, 20), (200, 50)):
+            ImageFactory.create(
+                parent_picture=big, picture__width=width, picture__height=height,
+                variant_key='resize:{0}x{1}'.format(width, height),
+            )
+        fitting = ImageFactory.create(
+            parent_picture=big, picture__width=100, picture__height=50,
+            variant_key='resize:100x50',
+        )
+        ImageFactory.create(
+            parent_picture=big, picture__width=80, picture__height=40,
+            variant_key='crop:0,0,600,300:80x40',
+        )
+        sources = select_sprite_sources([big, self.small], 64)
+        self.assertEqual(sources, [fitting, self.small])
+
+    def test_sprite_validation(self):
+        """Test that ids and cell size are validated."""
+        response = self.client.get(reverse('images-sprite'), {'ids': '1488228'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('1488228', response.data['ids'][0])
+        response = self.get_sprite([self.wide], cell=settings.IMAGES_SPRITE_MAX_CELL_SIZE + 1)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cell', response.data)
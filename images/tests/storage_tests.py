@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase
+from images.factories import ImageFactory
+from images.mixins import ImageHandlerMixin
+from images.storage import save_encoded
+
+
+class SaveEncodedTest(ImageHandlerMixin, TestCase):
+    """Test writing encoded pictures straight into the storage."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        self.storage = FileSystemStorage(location=settings.MEDIA_ROOT)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_save_encoded_leaves_only_final_files(self):
+        """Test that taken names are not overwritten and no temporary files remain."""
+        first_name, first_size = save_encoded(
+            self.storage, 'picture.jpg', lambda output: output.write(b'first'),
+        )
+        second_name, second_size = save_encoded(
+            self.storage, 'picture.jpg', lambda output: output.write(b'second'),
+        )
+        self.assertEqual(first_name, 'picture.jpg')
+        self.assertNotEqual(second_name, first_name)
+        self.assertEqual((first_size, second_size), (5, 6))
+        self.assertEqual(sorted(os.listdir(settings.MEDIA_ROOT)), sorted([first_name, second_name]))
+
+    def test_save_encoded_cleans_up_on_error(self):
+        """Test that a failed encode leaves nothing behind."""
+        def broken_encode(output):
+            output.write(b'partial')
+            raise ValueError('Encoder failed.')
+
+        with self.assertRaises(ValueError):
+            save_encoded(self.storage, 'broken.jpg', broken_encode)
+        self.assertEqual(os.listdir(settings.MEDIA_ROOT), [])
+
+    def test_resized_image_records_size_and_content_type(self):
+        """Test that resize records actual file size and content type."""
+        image = ImageFactory.create(picture__filename='picture.png', picture__format='PNG')
+        resized_image = self.resize_image({'width': 10, 'height': 20}, image)
+        self.assertEqual(resized_image.picture_size, os.path.getsize(resized_image.picture.path))
+        self.assertEqual(resized_image.content_type, 'image/png')
+        self.assertEqual((resized_image.picture_width, resized_image.picture_height), (10, 20))
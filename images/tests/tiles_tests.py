@@ -0,0 +1,149 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from images.factories import ImageFactory
+from images.models import TilePyramid
+from images.tiles import build_pyramid, count_levels, read_tile, tile_box
+from PIL import Image as PILImage
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+BUILD_TIMEOUT = 10
+
+
+class TileGeometryTest(SimpleTestCase):
+    """Test Deep Zoom geometry."""
+
+    def test_count_levels(self):
+        """Test that levels go from a single pixel up to the full size."""
+        self.assertEqual(count_levels(1, 1), 1)
+        self.assertEqual(count_levels(600, 400), 11)
+        self.assertEqual(count_levels(1024, 3), 11)
+
+    def test_tile_box(self):
+        """Test that tiles overlap only with existing neighbours."""
+        self.assertEqual(tile_box(0, 0, 600, 400, 254, 1), (0, 0, 255, 255))
+        self.assertEqual(tile_box(1, 1, 600, 400, 254, 1), (253, 253, 509, 400))
+        self.assertEqual(tile_box(2, 0, 600, 400, 254, 1), (507, 0, 600, 255))
+
+
+class BuildPyramidTest(TestCase):
+    """Test pyramid building."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        settings.IMAGES_TILES_DIR = tempfile.mkdtemp()
+        image = ImageFactory.create(picture__width=600, picture__height=400)
+        self.pyramid = TilePyramid.objects.create(image=image, tile_size=254, overlap=1)
+        build_pyramid(self.pyramid)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directories in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(settings.IMAGES_TILES_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def tile_size(self, level, column, row):
+        """
+        Decode a tile.
+
+        Args:
+            level(int): Level number.
+            column(int): Tile column.
+            row(int): Tile row.
+
+        Returns:
+            size(tuple): Tile width and height.
+        """
+        content = read_tile(self.pyramid, level, column, row)
+        return PILImage.open(io.BytesIO(content)).size
+
+    def test_levels(self):
+        """Test that every level is packed into two files and tiles keep DZI geometry."""
+        self.pyramid.refresh_from_db()
+        self.assertEqual(self.pyramid.status, TilePyramid.READY)
+        self.assertEqual(self.pyramid.levels_done, 11)
+        self.assertEqual(self.pyramid.tile_format, 'JPEG')
+        self.assertEqual(len(os.listdir(self.pyramid.directory)), 22)
+        self.assertEqual(self.tile_size(10, 0, 0), (255, 255))
+        self.assertEqual(self.tile_size(10, 2, 1), (93, 147))
+        self.assertEqual(self.tile_size(9, 1, 0), (47, 200))
+        self.assertEqual(self.tile_size(0, 0, 0), (1, 1))
+
+    def test_missing_tiles(self):
+        """Test that tiles outside of the grid are not found."""
+        self.assertIsNone(read_tile(self.pyramid, 10, 3, 0))
+        self.assertIsNone(read_tile(self.pyramid, 9, 0, 1))
+        self.assertIsNone(read_tile(self.pyramid, 11, 0, 0))
+
+
+class TilesViewTest(APITransactionTestCase):
+    """Test tiles endpoints with the background builder."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        settings.IMAGES_TILES_DIR = tempfile.mkdtemp()
+        self.image = ImageFactory.create(picture__width=300, picture__height=200)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directories in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(settings.IMAGES_TILES_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def wait_for_build(self):
+        """
+        Poll the pyramid state until the build ends.
+
+        Returns:
+            state(dict): Final pyramid state.
+        """
+        deadline = time.monotonic() + BUILD_TIMEOUT
+        while time.monotonic() < deadline:
+            response = self.client.get(reverse('images-tiles', kwargs={'pk': self.image.id}))
+            if response.status_code == status.HTTP_200_OK:
+                return response.data
+            time.sleep(0.05)
+        self.fail('Pyramid was not built in time.')
+
+    def test_build_and_serve(self):
+        """Test that a scheduled build reports progress and its tiles are served."""
+        response = self.client.post(reverse('images-tiles', kwargs={'pk': self.image.id}))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        state = self.wait_for_build()
+        self.assertEqual(state['status'], TilePyramid.READY)
+        self.assertEqual(state['progress'], 1)
+        self.assertEqual((state['width'], state['height']), (300, 200))
+        response = self.client.get(
+            reverse('images-tile', kwargs={'pk': self.image.id, 'level': 9, 'column': 1, 'row': 0}),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(PILImage.open(io.BytesIO(response.content)).size, (47, 200))
+        response = self.client.get(
+            reverse('images-tile', kwargs={'pk': self.image.id, 'level': 9, 'column': 2, 'row': 0}),
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        directory = TilePyramid.objects.get(image=self.image).directory
+        self.client.delete(reverse('images-detail', kwargs={'pk': self.image.id}))
+        self.assertFalse(os.path.exists(directory))
+
+    def test_state_before_build(self):
+        """Test that there is no pyramid state and no tiles before a build is requested."""
+        response = self.client.get(reverse('images-tiles', kwargs={'pk': self.image.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(
+            reverse('images-tile', kwargs={'pk': self.image.id, 'level': 0, 'column': 0, 'row': 0}),
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,128 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from images.mixins import ImageHandlerMixin
+from images.models import Image
+from images.upload_handlers import ImageUploadHandler, expire_spool, spool_directory
+from PIL import Image as PILImage
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+
+
+def make_png():
+    """
+    Encode a small PNG.
+
+    Returns:
+        content(bytes): Encoded picture.
+    """
+    output = io.BytesIO()
+    PILImage.effect_noise((32, 24), 64).save(output, 'PNG')
+    return output.getvalue()
+
+
+class ImageUploadHandlerTest(APITestCase):
+    """Test ImageUploadHandler."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        settings.IMAGES_UPLOAD_SPOOL_DIR = tempfile.mkdtemp()
+        self.content = make_png()
+
+    def tearDown(self):
+        """Destroy the spool directory."""
+        shutil.rmtree(settings.IMAGES_UPLOAD_SPOOL_DIR, ignore_errors=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directory in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def spool(self, chunks):
+        """
+        Feed `chunks` through a new handler.
+
+        Args:
+            chunks(list): File content split into chunks.
+
+        Returns:
+            uploaded_file(SpooledImageFile): Spooled file.
+        """
+        handler = ImageUploadHandler()
+        handler.new_file('file', 'noise.png', 'image/png', None)
+        for chunk in chunks:
+            handler.receive_data_chunk(chunk, 0)
+        return handler.file_complete(sum(len(chunk) for chunk in chunks))
+
+    def test_upload(self):
+        """Test that an uploaded image gets its hash and leaves nothing in the spool."""
+        response = self.client.post(
+            reverse('images-list'), data={'file': SimpleUploadedFile('noise.png', self.content)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        image = Image.objects.get(pk=response.data['id'])
+        self.assertEqual(image.content_hash, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(image.picture.read(), self.content)
+        self.assertEqual(os.listdir(spool_directory()), [])
+
+    def test_saving_is_rename(self):
+        """Test that the spooled file becomes the stored picture without a copy."""
+        uploaded_file = self.spool([self.content[:10], self.content[10:]])
+        inode = os.stat(uploaded_file.temporary_file_path()).st_ino
+        image = ImageHandlerMixin().create_new_image_instance(uploaded_file)
+        uploaded_file.close()
+        self.assertEqual(os.stat(image.picture.path).st_ino, inode)
+
+    def test_not_an_image_rejected_on_first_chunk(self):
+        """Test that a non-image is refused as soon as its header arrives."""
+        with self.assertRaises(ValidationError):
+            self.spool([b'Salam, brat. Not an image at all.'])
+        self.assertEqual(os.listdir(spool_directory()), [])
+
+    @override_settings(IMAGES_UPLOAD_FORMAT_MAX_SIZES={'PNG': 100})
+    def test_format_size_cap(self):
+        """Test that the size cap of the sniffed format is enforced while receiving."""
+        response = self.client.post(
+            reverse('images-list'), data={'file': SimpleUploadedFile('noise.png', self.content)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('PNG', response.data['file'][0])
+        self.assertFalse(Image.objects.exists())
+
+    def test_spool_is_not_served(self):
+        """Test that files being received are spooled outside of MEDIA_ROOT."""
+        uploaded_file = self.spool([self.content])
+        spooled_path = uploaded_file.temporary_file_path()
+        self.assertEqual(os.path.dirname(spooled_path), settings.IMAGES_UPLOAD_SPOOL_DIR)
+        self.assertFalse(spooled_path.startswith(settings.MEDIA_ROOT))
+        uploaded_file.close()
+
+    def test_stale_spool_files_expire(self):
+        """Test that files left in the spool by dead workers are removed."""
+        stale_path = os.path.join(spool_directory(), 'stale.upload.png')
+        fresh_path = os.path.join(spool_directory(), 'fresh.upload.png')
+        for path in (stale_path, fresh_path):
+            with open(path, 'wb') as spooled_file:
+                spooled_file.write(self.content)
+        stale_time = time.time() - settings.IMAGES_UPLOAD_SESSION_TTL - 1
+        os.utime(stale_path, (stale_time, stale_time))
+        self.assertEqual(expire_spool(), 1)
+        self.assertEqual(os.listdir(spool_directory()), ['fresh.upload.png'])
+
+        os.utime(fresh_path, (stale_time, stale_time))
+        output = io.StringIO()
+        call_command('expire_uploads', stdout=output)
+        self.assertIn('Removed 1 stale spooled files.', output.getvalue())
+        self.assertEqual(os.listdir(spool_directory()), [])
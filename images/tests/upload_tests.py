@@ -0,0 +1,244 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from images import uploads
+from images.models import Image, UploadSession
+from images.uploads import merge_range, session_path
+from PIL import Image as PILImage
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+def make_png(width=64, height=48):
+    """
+    Encode a noisy PNG so that it spans several chunks.
+
+    Args:
+        width(int): Picture width.
+        height(int): Picture height.
+
+    Returns:
+        content(bytes): Encoded picture.
+    """
+    output = io.BytesIO()
+    PILImage.effect_noise((width, height), 64).save(output, 'PNG')
+    return output.getvalue()
+
+
+@override_settings(IMAGES_UPLOAD_MAX_CHUNK_SIZE=1024)
+class UploadSessionTest(APITestCase):
+    """Test resumable uploads."""
+
+    def setUp(self):
+        """Prepare data for tests."""
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        settings.IMAGES_UPLOAD_SESSION_DIR = tempfile.mkdtemp()
+        self.content = make_png()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Destroy directories in which files will upload during testing."""
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(settings.IMAGES_UPLOAD_SESSION_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def start(self, **payload):
+        """
+        Create an upload session for `self.content`.
+
+        Args:
+            payload(dict): Extra session fields.
+
+        Returns:
+            session_id(str): Upload session id.
+        """
+        payload = {'filename': 'large.png', 'size': len(self.content), **payload}
+        response = self.client.post(
+            reverse('uploads-list'), data=json.dumps(payload), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def put_chunk(self, session_id, start, end):
+        """
+        Upload `self.content[start:end]`.
+
+        Args:
+            session_id(str): Upload session id.
+            start(int): Chunk start offset.
+            end(int): Chunk exclusive end offset.
+
+        Returns:
+            response(Response): Server response.
+        """
+        return self.client.put(
+            reverse('uploads-detail', kwargs={'pk': session_id}),
+            data=self.content[start:end],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE='bytes {0}-{1}/{2}'.format(start, end - 1, len(self.content)),
+        )
+
+    def put_all(self, session_id, reverse_order=False):
+        """
+        Upload `self.content` in 1000 bytes chunks.
+
+        Args:
+            session_id(str): Upload session id.
+            reverse_order(bool): Whether to send the last chunk first.
+
+        Returns:
+            responses(list): Server responses.
+        """
+        offsets = range(0, len(self.content), 1000)
+        if reverse_order:
+            offsets = reversed(offsets)
+        return [
+            self.put_chunk(session_id, start, min(start + 1000, len(self.content)))
+            for start in offsets
+        ]
+
+    def finalize(self, session_id):
+        """
+        Finalize an upload session.
+
+        Args:
+            session_id(str): Upload session id.
+
+        Returns:
+            response(Response): Server response.
+        """
+        return self.client.post(reverse('uploads-finalize', kwargs={'pk': session_id}))
+
+    def test_out_of_order_chunks(self):
+        """Test that chunks sent in any order assemble into a normal image."""
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        session_id = self.start(sha256=sha256)
+        for response in self.put_all(session_id, reverse_order=True):
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_complete'])
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        image = Image.objects.get(pk=response.data['id'])
+        self.assertEqual(image.content_hash, sha256)
+        self.assertEqual((image.picture_width, image.picture_height), (64, 48))
+        self.assertEqual(image.picture.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_finalize_moves_session_file(self):
+        """Test that finalize validates the session file from disk and moves it into storage."""
+        session_id = self.start()
+        self.put_all(session_id)
+        session_inode = os.stat(session_path(UploadSession.objects.get(pk=session_id))).st_ino
+        with mock.patch('django.forms.fields.BytesIO', wraps=io.BytesIO) as buffered:
+            response = self.finalize(session_id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        buffered.assert_not_called()
+        image = Image.objects.get(pk=response.data['id'])
+        self.assertEqual(os.stat(image.picture.path).st_ino, session_inode)
+        self.assertEqual(image.picture.read(), self.content)
+
+    def test_overwritten_range_is_rehashed(self):
+        """Test that bytes sent again over a hashed range are what finalize checks."""
+        content = self.content
+        session_id = self.start(sha256=hashlib.sha256(content).hexdigest())
+        self.content = content[:8] + bytes(992) + content[1000:]
+        self.put_all(session_id)
+        self.content = content
+        self.assertEqual(self.put_chunk(session_id, 0, 1000).status_code, status.HTTP_200_OK)
+        self.assertTrue(UploadSession.objects.get(pk=session_id).overwritten)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Image.objects.get(pk=response.data['id']).picture.read(), content)
+
+    def test_incomplete_upload(self):
+        """Test that an incomplete upload can't be finalized and reports missing ranges."""
+        session_id = self.start()
+        self.put_chunk(session_id, 0, 500)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['received_ranges'], [[0, 500]])
+
+    def test_hash_mismatch(self):
+        """Test that finalize rejects content not matching the declared sha256."""
+        session_id = self.start(sha256='0' * 64)
+        self.put_all(session_id)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Image.objects.exists())
+
+    def test_not_an_image(self):
+        """Test that finalized uploads pass through the usual image validation."""
+        self.content = b'not an image' * 10
+        session_id = self.start()
+        self.put_chunk(session_id, 0, len(self.content))
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_chunks(self):
+        """Test that chunks with a bad range or over the size limit are refused."""
+        session_id = self.start()
+        response = self.client.put(
+            reverse('uploads-detail', kwargs={'pk': session_id}),
+            data=b'x',
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE='bytes 0-0/1',
+        )
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response = self.put_chunk(session_id, 0, 2000)
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_abort(self):
+        """Test that deleting a session removes its file."""
+        session_id = self.start()
+        path = session_path(UploadSession.objects.get(pk=session_id))
+        response = self.client.delete(reverse('uploads-detail', kwargs={'pk': session_id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(UploadSession.objects.exists())
+        with self.assertRaises(FileNotFoundError):
+            open(path, 'rb')  # Noqa: WPS515
+
+    def test_abandoned_session_expires(self):
+        """Test that idle sessions stop accepting chunks and are cleaned up with their state."""
+        session_id = self.start()
+        self.put_chunk(session_id, 0, 500)
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertIn(session.pk, uploads._hashers)  # Noqa: WPS437
+        idle_since = timezone.now() - timedelta(seconds=settings.IMAGES_UPLOAD_SESSION_TTL + 1)
+        UploadSession.objects.filter(pk=session_id).update(updated_at=idle_since)
+        response = self.put_chunk(session_id, 500, 1000)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        output = io.StringIO()
+        call_command('expire_uploads', stdout=output)
+        self.assertIn('Expired 1 upload sessions.', output.getvalue())
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertNotIn(session.pk, uploads._hashers)  # Noqa: WPS437
+        with self.assertRaises(FileNotFoundError):
+            open(session_path(session), 'rb')  # Noqa: WPS515
+
+    @override_settings(IMAGES_UPLOAD_SESSION_TTL=0)
+    def test_idle_hash_states_are_pruned(self):
+        """Test that hash states of other idle sessions are dropped by this worker."""
+        first = UploadSession.objects.get(pk=self.start())
+        uploads.advance_hash(first)
+        second = UploadSession.objects.get(pk=self.start())
+        uploads.advance_hash(second)
+        self.assertNotIn(first.pk, uploads._hashers)  # Noqa: WPS437
+        self.assertIn(second.pk, uploads._hashers)  # Noqa: WPS437
+
+    def test_merge_range(self):
+        """Test that received ranges are kept sorted and merged."""
+        ranges = merge_range([[0, 10], [20, 30]], 10, 20)
+        self.assertEqual(ranges, [[0, 30]])
+        self.assertEqual(merge_range([[20, 30]], 0, 5), [[0, 5], [20, 30]])
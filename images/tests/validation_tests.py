@@ -6,12 +6,13 @@ import requests
 from django.conf import settings
 from django.urls import reverse
 from images.factories import ImageFactory
+from images.tests.origin_stub import OriginStubMixin
 from mock import patch
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 
-class ImagesValidationTest(APITestCase):
+class ImagesValidationTest(OriginStubMixin, APITestCase):
     """Test validation."""
 
     def setUp(self):
@@ -83,7 +84,7 @@ class ImagesValidationTest(APITestCase):
 
     def test_file_validation(self):
         """Test file validation."""
-        url = 'https://file38.gofile.io/download/a9d85056-1ac6-47a4-bf1a-df575d5e4cec/SQL.txt'
+        url = self.origin.url('/text/SQL.txt')
         response_with_url = self.client.post(
             reverse('images-list'),
             data=json.dumps({'url': url}),
@@ -8,12 +8,13 @@ from django.conf import settings
 from django.urls import reverse
 from images.factories import ImageFactory
 from images.models import Image
+from images.tests.origin_stub import OriginStubMixin
 from PIL import Image as PILImage
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 
-class ImagesTest(APITestCase):
+class ImagesTest(OriginStubMixin, APITestCase):
     """Test ModelViewSet."""
 
     def setUp(self):
@@ -21,7 +22,7 @@ class ImagesTest(APITestCase):
         settings.MEDIA_ROOT = tempfile.mkdtemp()
         factory.create_batch(ImageFactory, 3)
         self.image = ImageFactory.create()
-        self.download_from_url = 'https://i.ibb.co/sJHms9y/ricardo.jpg'
+        self.download_from_url = self.origin.url('/images/640x480.jpg')
 
     @classmethod
     def tearDownClass(cls):
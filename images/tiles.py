@@ -0,0 +1,235 @@
+import logging
+import math
+import os
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from images import metrics
+from images.imaging import has_alpha, open_image
+from images.models import TilePyramid
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPECODE = 'Q'
+INDEX_ITEM_SIZE = array(INDEX_TYPECODE).itemsize
+PACK_SUFFIX = '.pack'
+INDEX_SUFFIX = '.idx'
+TEMPORARY_SUFFIX = '.part'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def count_levels(width, height):
+    """
+    Count Deep Zoom levels of an image, level 0 being a single pixel.
+
+    Args:
+        width(int): Image width.
+        height(int): Image height.
+
+    Returns:
+        levels(int): Levels count.
+    """
+    return math.ceil(math.log2(max(width, height, 1))) + 1
+
+
+def count_tiles(width, height, tile_size):
+    """
+    Count tile columns and rows of a level.
+
+    Args:
+        width(int): Level width.
+        height(int): Level height.
+        tile_size(int): Tile side without overlap.
+
+    Returns:
+        grid(tuple): Columns and rows.
+    """
+    return math.ceil(width / tile_size), math.ceil(height / tile_size)
+
+
+def tile_box(column, row, width, height, tile_size, overlap):
+    """
+    Define the box of a tile including its overlap with the neighbours.
+
+    Args:
+        column(int): Tile column.
+        row(int): Tile row.
+        width(int): Level width.
+        height(int): Level height.
+        tile_size(int): Tile side without overlap.
+        overlap(int): Overlap with neighbour tiles.
+
+    Returns:
+        box(tuple): Left, top, right and bottom of the tile.
+    """
+    left = column * tile_size - (overlap if column else 0)
+    top = row * tile_size - (overlap if row else 0)
+    right = min((column + 1) * tile_size + overlap, width)
+    bottom = min((row + 1) * tile_size + overlap, height)
+    return left, top, right, bottom
+
+
+def level_path(pyramid, level, suffix):
+    """
+    Define the path of a level file.
+
+    Args:
+        pyramid(models.TilePyramid): Tile pyramid.
+        level(int): Level number.
+        suffix(str): `PACK_SUFFIX` or `INDEX_SUFFIX`.
+
+    Returns:
+        path(str): File path.
+    """
+    return os.path.join(pyramid.directory, '{0}{1}'.format(level, suffix))
+
+
+def write_level(pyramid, level, image):
+    """
+    Encode all tiles of a level into a pack file and its offsets index.
+
+    Tiles are stored row by row. The index holds one offset per tile plus
+    the end of the pack, so tile `n` spans `index[n]:index[n + 1]`.
+
+    Args:
+        pyramid(models.TilePyramid): Tile pyramid.
+        level(int): Level number.
+        image(PIL.Image.Image): Decoded level.
+    """
+    columns, rows = count_tiles(image.width, image.height, pyramid.tile_size)
+    offsets = array(INDEX_TYPECODE, [0])
+    pack_path = level_path(pyramid, level, PACK_SUFFIX)
+    index_path = level_path(pyramid, level, INDEX_SUFFIX)
+    with open(pack_path + TEMPORARY_SUFFIX, 'wb') as pack_file:
+        for row in range(rows):
+            for column in range(columns):
+                box = tile_box(
+                    column, row, image.width, image.height, pyramid.tile_size, pyramid.overlap,
+                )
+                image.crop(box).save(
+                    pack_file, pyramid.tile_format, quality=settings.IMAGES_TILES_JPEG_QUALITY,
+                )
+                offsets.append(pack_file.tell())
+    with open(index_path + TEMPORARY_SUFFIX, 'wb') as index_file:
+        offsets.tofile(index_file)
+    os.replace(pack_path + TEMPORARY_SUFFIX, pack_path)
+    os.replace(index_path + TEMPORARY_SUFFIX, index_path)
+    metrics.increment('tiles.written', columns * rows)
+
+
+def build_pyramid(pyramid):
+    """
+    Build all levels of `pyramid`, from the full size one down to a single pixel.
+
+    The original is decoded once. Each next level is reduced from the
+    previous one, so at most two levels are held in memory.
+
+    Args:
+        pyramid(models.TilePyramid): Tile pyramid.
+    """
+    with open_image(pyramid.image.picture.open('rb')) as source:
+        source.seek(0)
+        transparent = has_alpha(source)
+        image = source.convert('RGBA' if transparent else 'RGB')
+    pyramid.tile_format = 'PNG' if transparent else 'JPEG'
+    pyramid.width, pyramid.height = image.size
+    pyramid.levels_total = count_levels(*image.size)
+    pyramid.levels_done = 0
+    pyramid.status = TilePyramid.BUILDING
+    pyramid.save()
+    os.makedirs(pyramid.directory, exist_ok=True)
+    for level in reversed(range(pyramid.levels_total)):
+        write_level(pyramid, level, image)
+        pyramid.levels_done += 1
+        pyramid.save(update_fields=['levels_done', 'updated_at'])
+        if level:
+            image = image.reduce(2)
+    pyramid.status = TilePyramid.READY
+    pyramid.save(update_fields=['status', 'updated_at'])
+
+
+def run_build(pyramid_id):
+    """
+    Build a pyramid in a worker thread, recording a failure instead of raising.
+
+    Args:
+        pyramid_id(int): Tile pyramid id.
+    """
+    close_old_connections()
+    pyramid = TilePyramid.objects.select_related('image').get(pk=pyramid_id)
+    try:
+        build_pyramid(pyramid)
+    except Exception as error:
+        logger.exception('Tile pyramid %s failed', pyramid_id)
+        pyramid.status = TilePyramid.FAILED
+        pyramid.error = str(error)
+        pyramid.save(update_fields=['status', 'error', 'updated_at'])
+    finally:
+        connection.close()
+
+
+def start_build(image_object):
+    """
+    Schedule a pyramid build for `image_object` unless it is built or building.
+
+    Args:
+        image_object(models.Image): Image to tile.
+
+    Returns:
+        pyramid(models.TilePyramid): Scheduled, building or ready pyramid.
+    """
+    global _executor  # Noqa: WPS420
+    pyramid, created = TilePyramid.objects.get_or_create(
+        image=image_object,
+        defaults={
+            'tile_size': settings.IMAGES_TILES_SIZE,
+            'overlap': settings.IMAGES_TILES_OVERLAP,
+        },
+    )
+    if not created and pyramid.status != TilePyramid.FAILED:
+        return pyramid
+    pyramid.status = TilePyramid.PENDING
+    pyramid.error = ''
+    pyramid.save(update_fields=['status', 'error', 'updated_at'])
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(  # Noqa: WPS122
+                max_workers=settings.IMAGES_TILES_WORKERS, thread_name_prefix='tiles',
+            )
+    _executor.submit(run_build, pyramid.pk)
+    return pyramid
+
+
+def read_tile(pyramid, level, column, row):
+    """
+    Read an encoded tile from its level pack.
+
+    Args:
+        pyramid(models.TilePyramid): Built tile pyramid.
+        level(int): Level number.
+        column(int): Tile column.
+        row(int): Tile row.
+
+    Returns:
+        content(bytes): Encoded tile or None if there is no such tile.
+    """
+    if level >= pyramid.levels_total:
+        return None
+    scale = 2 ** (pyramid.levels_total - 1 - level)
+    columns, rows = count_tiles(
+        math.ceil(pyramid.width / scale), math.ceil(pyramid.height / scale), pyramid.tile_size,
+    )
+    if column >= columns or row >= rows:
+        return None
+    offsets = array(INDEX_TYPECODE)
+    with open(level_path(pyramid, level, INDEX_SUFFIX), 'rb') as index_file:
+        index_file.seek((row * columns + column) * INDEX_ITEM_SIZE)
+        offsets.fromfile(index_file, 2)
+    with open(level_path(pyramid, level, PACK_SUFFIX), 'rb') as pack_file:
+        pack_file.seek(offsets[0])
+        return pack_file.read(offsets[1] - offsets[0])
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from images.imaging import SNIFF_BYTES, sniff_format
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import ImageField
+
+
+class SpooledImageFile(TemporaryUploadedFile):
+    """
+    Uploaded file spooled into a temporary file inside the given directory.
+
+    An already spooled file can be passed as `spool_file` instead, its path
+    is then what validation reads from and what storage moves into place.
+    """
+
+    def __init__(
+        self, name, content_type, size, charset, directory=None, content_type_extra=None,
+        spool_file=None,
+    ):
+        if spool_file is None:
+            _, ext = os.path.splitext(name)
+            spool_file = tempfile.NamedTemporaryFile(
+                suffix='.upload{0}'.format(ext), dir=directory,
+            )
+        super(TemporaryUploadedFile, self).__init__(  # Noqa: WPS608
+            spool_file, name, content_type, size, charset, content_type_extra,
+        )
+        self.content_hash = ''
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Validate, hash and spool uploaded images while they are being received.
+
+    The format is sniffed from the first bytes, so anything that is not an
+    image is refused before the rest of the body is read, and the size cap of
+    the sniffed format is enforced as chunks arrive. The file is spooled into
+    `IMAGES_UPLOAD_SPOOL_DIR`, which is kept on the picture storage file system
+    so saving it afterwards is a rename.
+    """
+
+    def new_file(self, *args, **kwargs):
+        """
+        Start spooling a new file.
+
+        Args:
+            args: Positional arguments of the inherited method.
+            kwargs: Keyword arguments of the inherited method.
+
+        Raises:
+            ValidationError: If the declared file length exceeds every size cap.
+        """
+        super().new_file(*args, **kwargs)
+        if self.content_length and self.content_length > settings.IMAGES_UPLOAD_MAX_SIZE:
+            self.reject('Uploaded file is too large.')
+        self.file = SpooledImageFile(  # Noqa: WPS110
+            self.file_name, self.content_type, 0, self.charset, spool_directory(),
+            self.content_type_extra,
+        )
+        self.hasher = hashlib.sha256()
+        self.prefix = b''
+        self.image_format = None
+        self.max_size = settings.IMAGES_UPLOAD_MAX_SIZE
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        """
+        Sniff, hash and spool a chunk.
+
+        Args:
+            raw_data(bytes): Chunk content.
+            start(int): Chunk offset.
+
+        Raises:
+            ValidationError: If the file is not an image or is too large for its format.
+        """
+        if self.image_format is None and len(self.prefix) < SNIFF_BYTES:
+            self.prefix += raw_data[:SNIFF_BYTES - len(self.prefix)]
+            if len(self.prefix) == SNIFF_BYTES:
+                self.identify()
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.reject('Uploaded {0} file is larger than {1} bytes.'.format(
+                self.image_format or 'image', self.max_size,
+            ))
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        """
+        Finish spooling.
+
+        Args:
+            file_size(int): Received bytes.
+
+        Returns:
+            uploaded_file(SpooledImageFile): Spooled file.
+
+        Raises:
+            ValidationError: If the file is too short to be identified as an image.
+        """
+        if self.image_format is None:
+            self.identify()
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_hash = self.hasher.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        """Drop the spooled file of an aborted upload."""
+        if hasattr(self, 'file'):
+            self.file.close()
+
+    def identify(self):
+        """
+        Sniff the image format and pick its size cap.
+
+        Raises:
+            ValidationError: If the prefix doesn't belong to any known image format.
+        """
+        self.image_format = sniff_format(self.prefix)
+        if self.image_format is None:
+            self.reject(ImageField.default_error_messages['invalid_image'])
+        self.max_size = settings.IMAGES_UPLOAD_FORMAT_MAX_SIZES.get(
+            self.image_format, settings.IMAGES_UPLOAD_MAX_SIZE,
+        )
+
+    def reject(self, message):
+        """
+        Discard the upload.
+
+        Args:
+            message(str): Error message.
+
+        Raises:
+            ValidationError: Always, reported under the file field like `ImageField` errors.
+        """
+        self.upload_interrupted()
+        raise ValidationError({self.field_name: [message]})
+
+
+def spool_directory():
+    """
+    Define the directory to spool uploads into.
+
+    Returns:
+        directory(str): `IMAGES_UPLOAD_SPOOL_DIR`, created if missing.
+    """
+    os.makedirs(settings.IMAGES_UPLOAD_SPOOL_DIR, exist_ok=True)
+    return settings.IMAGES_UPLOAD_SPOOL_DIR
+
+
+def expire_spool():
+    """
+    Delete spooled files left behind by workers which died during an upload.
+
+    Files untouched for longer than `IMAGES_UPLOAD_SESSION_TTL` are considered stale.
+
+    Returns:
+        expired_count(int): Number of deleted files.
+    """
+    oldest = time.time() - settings.IMAGES_UPLOAD_SESSION_TTL
+    expired_count = 0
+    with os.scandir(spool_directory()) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < oldest:
+                os.remove(entry.path)
+                expired_count += 1
+    return expired_count
@@ -0,0 +1,228 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from images.models import UploadSession
+
+BLOCK_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<size>\d+)$')
+
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def session_path(session):
+    """
+    Define the path of the file assembled by `session`.
+
+    Args:
+        session(models.UploadSession): Upload session.
+
+    Returns:
+        path(str): File path.
+    """
+    return os.path.join(settings.IMAGES_UPLOAD_SESSION_DIR, '{0}.part'.format(session.pk))
+
+
+def preallocate(session):
+    """
+    Create the file of `session` with its final size.
+
+    Args:
+        session(models.UploadSession): Upload session.
+    """
+    os.makedirs(settings.IMAGES_UPLOAD_SESSION_DIR, exist_ok=True)
+    with open(session_path(session), 'wb') as session_file:
+        if session.size and hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(session_file.fileno(), 0, session.size)
+        else:
+            session_file.truncate(session.size)
+
+
+def parse_content_range(header, size):
+    """
+    Parse `Content-Range: bytes <start>-<end>/<size>` of a chunk.
+
+    Args:
+        header(str): Header value.
+        size(int): Expected total size.
+
+    Returns:
+        chunk_range(tuple): Start and exclusive end of the chunk, or None if invalid.
+    """
+    match = CONTENT_RANGE.match(header or '')
+    if match is None:
+        return None
+    start, last = int(match.group('start')), int(match.group('end'))
+    if int(match.group('size')) != size or start > last or last >= size:
+        return None
+    return start, last + 1
+
+
+def write_chunk(session, start, end, stream):
+    """
+    Write a chunk into the session file and record it as received.
+
+    Args:
+        session(models.UploadSession): Upload session.
+        start(int): Chunk start offset.
+        end(int): Chunk exclusive end offset.
+        stream(file): Request body.
+
+    Writing over bytes received before marks the session as overwritten, so
+    its hash is computed again from the file when it is finalized.
+
+    Returns:
+        session(models.UploadSession): Updated upload session.
+
+    Raises:
+        ValueError: If the body is shorter than the declared range.
+    """
+    received = UploadSession.objects.get(pk=session.pk).received_ranges
+    if overlaps(received, start, end):
+        UploadSession.objects.filter(pk=session.pk).update(overwritten=True)
+    with open(session_path(session), 'r+b') as session_file:
+        session_file.seek(start)
+        remaining = end - start
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                raise ValueError('Chunk body is shorter than its Content-Range.')
+            session_file.write(block)
+            remaining -= len(block)
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if overlaps(session.received_ranges, start, end):
+            session.overwritten = True
+        session.received_ranges = merge_range(session.received_ranges, start, end)
+        session.save(update_fields=['received_ranges', 'overwritten', 'updated_at'])
+    advance_hash(session)
+    return session
+
+
+def overlaps(ranges, start, end):
+    """
+    Check whether `[start, end)` touches bytes of already received ranges.
+
+    Args:
+        ranges(list): Received ranges.
+        start(int): Range start.
+        end(int): Range exclusive end.
+
+    Returns:
+        overlaps(bool): True if any byte is received again.
+    """
+    return any(range_start < end and start < range_end for range_start, range_end in ranges)
+
+
+def merge_range(ranges, start, end):
+    """
+    Add `[start, end)` to sorted disjoint ranges, merging touching ones.
+
+    Args:
+        ranges(list): Received ranges.
+        start(int): Range start.
+        end(int): Range exclusive end.
+
+    Returns:
+        ranges(list): Merged ranges.
+    """
+    merged = []
+    for range_start, range_end in sorted([*ranges, [start, end]]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+
+
+def advance_hash(session, rehash=False):
+    """
+    Feed the contiguous received prefix of the file into the session hash.
+
+    The hash state lives in the worker process. A worker which did not see the
+    beginning of the upload hashes the prefix from scratch. States idle for
+    longer than `IMAGES_UPLOAD_SESSION_TTL` are dropped on the way.
+
+    Args:
+        session(models.UploadSession): Upload session.
+        rehash(bool): Whether to drop the hash state and read the prefix again,
+            e.g. because already hashed bytes were overwritten.
+
+    Returns:
+        hasher(hashlib.sha256): Hash of the received prefix.
+    """
+    received = session.received_ranges
+    prefix_end = received[0][1] if received and received[0][0] == 0 else 0
+    with _hashers_lock:
+        prune_hashers()
+        if rehash:
+            _hashers.pop(session.pk, None)
+        hasher_lock, hasher, hashed_bytes, _ = _hashers.get(
+            session.pk, (threading.Lock(), hashlib.sha256(), 0, None),
+        )
+        _hashers[session.pk] = (hasher_lock, hasher, hashed_bytes, time.monotonic())
+    with hasher_lock:
+        hasher, hashed_bytes = _hashers[session.pk][1:3]
+        if hashed_bytes < prefix_end:
+            with open(session_path(session), 'rb') as session_file:
+                session_file.seek(hashed_bytes)
+                while hashed_bytes < prefix_end:
+                    block = session_file.read(min(BLOCK_SIZE, prefix_end - hashed_bytes))
+                    hasher.update(block)
+                    hashed_bytes += len(block)
+            _hashers[session.pk] = (hasher_lock, hasher, hashed_bytes, time.monotonic())
+        return hasher.copy()
+
+
+def prune_hashers():
+    """Forget hash states idle for longer than the session TTL. Call with `_hashers_lock` held."""
+    oldest = time.monotonic() - settings.IMAGES_UPLOAD_SESSION_TTL
+    for session_id, (_, _, _, touched_at) in list(_hashers.items()):
+        if touched_at < oldest:
+            _hashers.pop(session_id)
+
+
+def expiry_cutoff():
+    """
+    Define the last activity time of sessions which are still alive.
+
+    Returns:
+        cutoff(datetime): Sessions not updated since are expired.
+    """
+    return timezone.now() - timedelta(seconds=settings.IMAGES_UPLOAD_SESSION_TTL)
+
+
+def expire_sessions():
+    """
+    Delete sessions idle for longer than `IMAGES_UPLOAD_SESSION_TTL` along with their files.
+
+    Returns:
+        expired_count(int): Number of deleted sessions.
+    """
+    expired = UploadSession.objects.filter(updated_at__lt=expiry_cutoff())
+    expired_count = 0
+    for session in expired.iterator():
+        discard(session)
+        session.delete()
+        expired_count += 1
+    return expired_count
+
+
+def discard(session):
+    """
+    Remove the session file and forget its hash state.
+
+    Args:
+        session(models.UploadSession): Upload session.
+    """
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+    if os.path.exists(session_path(session)):
+        os.remove(session_path(session))
@@ -1,19 +1,56 @@
+import itertools
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from images import metrics, uploads
+from images.archive import ZIP_CONTENT_TYPE, zip_chunks
+from images.export import NDJSON_CONTENT_TYPE, export_rows, ndjson_lines
+from images.memory import track_memory
 from images.mixins import ImageHandlerMixin
-from images.models import Image
-from images.serializers import CreateImageSerializer, ImageSerializer, ResizeImageSerializer
-from rest_framework import status
+from images.models import Image, TilePyramid, UploadSession
+from images.routing import ReplicaReadsMixin
+from images.serializers import (
+    IMAGE_ROW_FIELDS,
+    CreateImageSerializer,
+    CropImageSerializer,
+    DownloadImagesSerializer,
+    ExportImagesSerializer,
+    ImageRowSerializer,
+    ImageSerializer,
+    ResizeImageSerializer,
+    SparseFieldsSerializer,
+    SpriteSerializer,
+    TilePyramidSerializer,
+    UploadSessionSerializer,
+)
+from images.source_cache import source_cache
+from images.sprites import compose_sprite
+from images.tiles import read_tile, start_build
+from images.upload_handlers import ImageUploadHandler, SpooledImageFile
+from PIL import Image as PILImage
+from rest_framework import mixins, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
 
-class ImagesViewSet(ImageHandlerMixin, ModelViewSet):
+class ImagesViewSet(ReplicaReadsMixin, ImageHandlerMixin, ModelViewSet):
     """Image ModelViewSet."""
 
     queryset = Image.objects.all()
     serializer_class = ImageSerializer
+    replica_actions = frozenset(('list', 'retrieve', 'tree'))
+
+    def initialize_request(self, request, *args, **kwargs):
+        request = super().initialize_request(request, *args, **kwargs)
+        if self.action == 'create':
+            request.upload_handlers = [ImageUploadHandler(request)]
+        return request
 
+    @track_memory
     def create(self, request, *args, **kwargs):
         serializer = CreateImageSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -24,11 +61,60 @@ class ImagesViewSet(ImageHandlerMixin, ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    def list(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).values(*IMAGE_ROW_FIELDS)
+        page = self.paginate_queryset(rows)
+        serializer = ImageRowSerializer(
+            rows if page is None else page,
+            many=True,
+            fields=self.selected_fields(request),
+            context=self.get_serializer_context(),
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        image = self.get_object()
+        image.touch()
+        serializer = ImageRowSerializer(
+            ImageRowSerializer.row(image),
+            fields=self.selected_fields(request),
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
+    @action(methods=['GET'], detail=True, name='tree')
+    def tree(self, request, pk=None, *args, **kwargs):
+        root = self.get_object().get_root()
+        serializer = ImageRowSerializer(
+            [ImageRowSerializer.row(image) for image in [root, *root.get_descendants()]],
+            many=True,
+            fields=self.selected_fields(request),
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
+    def selected_fields(self, request):
+        """
+        Resolve `fields` and `omit` query parameters.
+
+        Args:
+            request(Request): Client request.
+
+        Returns:
+            fields(tuple): Image fields to serialize.
+        """
+        serializer = SparseFieldsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['selected_fields']
+
     def update(self, request, *args, **kwargs):
         response = {'message': 'Method is not allowed.'}
         return Response(response, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
     @action(methods=['POST'], detail=True, name='resize_image')
+    @track_memory
     def resize(self, request, pk=None, *args, **kwargs):
         serializer = ResizeImageSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -37,3 +123,206 @@ class ImagesViewSet(ImageHandlerMixin, ModelViewSet):
         serializer = ImageSerializer(resized_image, context={'request': request})
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    @action(methods=['POST'], detail=True, name='crop_image')
+    @track_memory
+    def crop(self, request, pk=None, *args, **kwargs):
+        serializer = CropImageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        parent_object = get_object_or_404(Image, pk=pk)
+        cropped_image = self.crop_image(serializer.validated_data, parent_object)
+        serializer = ImageSerializer(cropped_image, context={'request': request})
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    @action(methods=['GET', 'POST'], detail=True, name='tiles')
+    def tiles(self, request, pk=None, *args, **kwargs):
+        image = get_object_or_404(Image, pk=pk)
+        if request.method == 'POST':
+            pyramid = start_build(image)
+        else:
+            pyramid = get_object_or_404(TilePyramid, image=image)
+        response_status = status.HTTP_200_OK
+        if pyramid.status in {TilePyramid.PENDING, TilePyramid.BUILDING}:
+            response_status = status.HTTP_202_ACCEPTED
+        return Response(TilePyramidSerializer(pyramid).data, status=response_status)
+
+    @action(
+        methods=['GET'],
+        detail=True,
+        url_path=r'tiles/(?P<level>\d+)/(?P<column>\d+)_(?P<row>\d+)',
+        url_name='tile',
+        name='tile',
+    )
+    def tile(self, request, pk=None, level=None, column=None, row=None, *args, **kwargs):
+        pyramid = get_object_or_404(TilePyramid, image_id=pk, status=TilePyramid.READY)
+        content = read_tile(pyramid, int(level), int(column), int(row))
+        if content is None:
+            return Response({'message': 'Tile not found.'}, status=status.HTTP_404_NOT_FOUND)
+        response = HttpResponse(content, content_type=PILImage.MIME[pyramid.tile_format])
+        response['Cache-Control'] = 'public, max-age={0}, immutable'.format(
+            settings.IMAGES_TILES_CACHE_MAX_AGE,
+        )
+        return response
+
+    @action(methods=['GET'], detail=False, name='export')
+    def export(self, request, *args, **kwargs):
+        serializer = ExportImagesSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        lines = ndjson_lines(
+            export_rows(serializer.validated_data['after']),
+            ImageRowSerializer(
+                fields=serializer.validated_data['selected_fields'],
+                context=self.get_serializer_context(),
+            ),
+        )
+        return StreamingHttpResponse(lines, content_type=NDJSON_CONTENT_TYPE)
+
+    @action(methods=['GET'], detail=True, name='download')
+    def download(self, request, pk=None, *args, **kwargs):
+        image = get_object_or_404(Image, pk=pk)
+        return self.zip_response(
+            itertools.chain([image], image.get_descendants()), 'image-{0}.zip'.format(image.pk),
+        )
+
+    @action(
+        methods=['GET'], detail=False, url_path='download', url_name='download-set',
+        name='download_set',
+    )
+    def download_set(self, request, *args, **kwargs):
+        serializer = DownloadImagesSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        images = Image.objects.filter(pk__in=serializer.validated_data['ids']).order_by('pk')
+        return self.zip_response(images.iterator(), 'images.zip')
+
+    def zip_response(self, images, filename):
+        """
+        Stream a ZIP archive of image files as an attachment.
+
+        Args:
+            images(iterable): Image objects to archive.
+            filename(str): Suggested archive name.
+
+        Returns:
+            response(StreamingHttpResponse): Archive response.
+        """
+        response = StreamingHttpResponse(zip_chunks(images), content_type=ZIP_CONTENT_TYPE)
+        response['Content-Disposition'] = 'attachment; filename="{0}"'.format(filename)
+        return response
+
+    @action(methods=['GET'], detail=False, name='sprite')
+    def sprite(self, request, *args, **kwargs):
+        serializer = SpriteSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        image_ids = serializer.validated_data['ids']
+        cell = serializer.validated_data['cell']
+        version, sprite = compose_sprite(image_ids, cell)
+        query = urlencode({
+            'ids': ','.join(str(image_id) for image_id in image_ids),
+            'cell': cell,
+            'version': version,
+        })
+        return Response({
+            'version': version,
+            'sheet': request.build_absolute_uri(
+                '{0}?{1}'.format(reverse('images-sprite-sheet'), query),
+            ),
+            'format': sprite['format'],
+            'width': sprite['width'],
+            'height': sprite['height'],
+            'cell': cell,
+            'cells': sprite['cells'],
+        })
+
+    @action(
+        methods=['GET'], detail=False, url_path='sprite/sheet', url_name='sprite-sheet',
+        name='sprite_sheet',
+    )
+    def sprite_sheet(self, request, *args, **kwargs):
+        serializer = SpriteSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        version, sprite = compose_sprite(
+            serializer.validated_data['ids'], serializer.validated_data['cell'],
+        )
+        response = HttpResponse(sprite['content'], content_type=PILImage.MIME[sprite['format']])
+        if serializer.validated_data.get('version') == version:
+            response['Cache-Control'] = 'public, max-age={0}, immutable'.format(
+                settings.IMAGES_SPRITE_CACHE_MAX_AGE,
+            )
+        return response
+
+    @action(methods=['GET'], detail=False, url_path='metrics', url_name='metrics', name='metrics')
+    def process_metrics(self, request, *args, **kwargs):
+        response = metrics.snapshot()
+        response['source_cache'] = source_cache.stats()
+        return Response(response, status=status.HTTP_200_OK)
+
+
+class UploadsViewSet(  # Noqa: WPS215
+    ReplicaReadsMixin,
+    ImageHandlerMixin,
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    GenericViewSet,
+):
+    """Resumable upload sessions: create, PUT chunks in any order, finalize."""
+
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+
+    def get_queryset(self):
+        return super().get_queryset().filter(updated_at__gte=uploads.expiry_cutoff())
+
+    def perform_create(self, serializer):
+        uploads.preallocate(serializer.save())
+
+    def perform_destroy(self, instance):
+        uploads.discard(instance)
+        instance.delete()
+
+    def update(self, request, *args, **kwargs):
+        session = self.get_object()
+        chunk_range = uploads.parse_content_range(
+            request.META.get('HTTP_CONTENT_RANGE'), session.size,
+        )
+        if chunk_range is None:
+            response = {'error': ["Provide a valid 'Content-Range: bytes <start>-<end>/<size>'."]}
+            return Response(response, status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        start, end = chunk_range
+        max_chunk_size = settings.IMAGES_UPLOAD_MAX_CHUNK_SIZE
+        if end - start > max_chunk_size:
+            response = {'error': ['Chunk is larger than {0} bytes.'.format(max_chunk_size)]}
+            return Response(response, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        try:
+            session = uploads.write_chunk(session, start, end, request.stream)
+        except ValueError as error:
+            return Response({'error': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(session).data, status=status.HTTP_200_OK)
+
+    @action(methods=['POST'], detail=True, name='finalize_upload')
+    def finalize(self, request, pk=None, *args, **kwargs):
+        session = self.get_object()
+        if not session.is_complete:
+            response = {
+                'error': ['Upload is incomplete.'],
+                'received_ranges': session.received_ranges,
+            }
+            return Response(response, status=status.HTTP_409_CONFLICT)
+        content_hash = uploads.advance_hash(session, rehash=session.overwritten).hexdigest()
+        if session.sha256 and session.sha256.lower() != content_hash:
+            response = {'error': ['Uploaded content does not match the declared sha256.']}
+            return Response(response, status=status.HTTP_400_BAD_REQUEST)
+        with open(uploads.session_path(session), 'rb') as session_file:
+            uploaded_file = SpooledImageFile(
+                session.filename, '', session.size, None, spool_file=session_file,
+            )
+            uploaded_file.content_hash = content_hash
+            serializer = CreateImageSerializer(data={'file': uploaded_file})
+            serializer.is_valid(raise_exception=True)
+            image = self.save_image({**serializer.validated_data, 'content_hash': content_hash})
+        uploads.discard(session)
+        session.delete()
+        serializer = ImageSerializer(image, context={'request': request})
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)